@@ -0,0 +1,135 @@
+import gc
+import math
+import statistics
+import time
+import tracemalloc
+
+# Factor of the 95% confidence interval of a median, the notch of a box plot
+NOTCH = 1.57
+
+
+def calibrate(function, min_time: float = 0.05, max_number: int = 1_000_000) -> int:
+    '''
+        Number of calls per sample so that one sample takes at least min_time seconds;
+        short functions are timed in loops so that the timer resolution does not matter
+
+        Arguments:
+            function: callable without arguments
+            min_time (float): minimum duration of a sample in seconds
+            max_number (int): maximum number of calls per sample
+    '''
+    number = 1
+    while number < max_number:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 10
+    return min(number, max_number)
+
+
+def time_function(function, repeat: int = 10, number: int = None, warmup: int = 1, min_time: float = 0.05) -> tuple:
+    '''
+        Seconds per call of every sample, and the number of calls per sample
+
+        Arguments:
+            function: callable without arguments
+            repeat (int): number of samples
+            number (int): calls per sample, calibrated when None
+            warmup (int): calls made before timing, to fill caches and open connections
+            min_time (float): minimum duration of a sample when calibrating
+    '''
+    for _ in range(warmup):
+        function()
+    if number is None:
+        number = calibrate(function, min_time)
+    samples = []
+    # The garbage collector runs between samples, not inside of them
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            samples.append((time.perf_counter() - start) / number)
+            gc.collect()
+    finally:
+        if enabled:
+            gc.enable()
+    return samples, number
+
+
+def peak_memory(function) -> int:
+    '''
+        Peak number of bytes allocated while a function runs, NumPy buffers included.
+        It is measured in a separate call since tracing slows the allocations down.
+
+        Arguments:
+            function: callable without arguments
+    '''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(samples: list) -> dict:
+    '''
+        Robust statistics of timing samples: the median with its 95% confidence interval and
+        the interquartile range are used, since timings have long tails caused by the machine
+
+        Arguments:
+            samples (list): seconds per call of every sample
+    '''
+    ordered = sorted(samples)
+    median = statistics.median(ordered)
+    if len(ordered) >= 4:
+        quartiles = statistics.quantiles(ordered, n=4)
+        iqr = quartiles[2] - quartiles[0]
+    else:
+        iqr = ordered[-1] - ordered[0]
+    half_width = NOTCH * iqr / math.sqrt(len(ordered))
+    return {
+        "median_s": median,
+        "mean_s": statistics.fmean(ordered),
+        "stdev_s": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        "min_s": ordered[0],
+        "max_s": ordered[-1],
+        "iqr_s": iqr,
+        "ci_low_s": median - half_width,
+        "ci_high_s": median + half_width,
+        "samples": len(ordered),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.1) -> dict:
+    '''
+        Compare results with a baseline; a benchmark regressed when its median is slower by more
+        than the threshold and the confidence intervals of the medians do not overlap, so that
+        noise alone does not flag it
+
+        Arguments:
+            results (dict): summaries by benchmark name
+            baseline (dict): summaries of the baseline by benchmark name
+            threshold (float): relative slowdown tolerated, e.g. 0.1 for 10%
+    '''
+    comparison = {}
+    for name, result in results.items():
+        # Benchmarks skipped here or when the baseline was recorded have nothing to compare
+        if "median_s" not in result or "median_s" not in baseline.get(name, {}):
+            continue
+        reference = baseline[name]
+        ratio = result["median_s"] / reference["median_s"] if reference["median_s"] else math.inf
+        if ratio > 1 + threshold and result["ci_low_s"] > reference["ci_high_s"]:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold) and result["ci_high_s"] < reference["ci_low_s"]:
+            status = "improvement"
+        else:
+            status = "unchanged"
+        comparison[name] = {"ratio": round(ratio, 3), "status": status}
+    return comparison
@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must not be loaded by importing the package, they are loaded when first used
+HEAVY_MODULES = ["owslib", "numpy", "lxml", "PIL"]
+
+
+def run_python(code: str) -> str:
+    '''
+        Run code in a fresh interpreter with the package modules importable, return its output
+
+        Arguments:
+            code (str): Python code
+    '''
+    environment = dict(os.environ, PYTHONPATH=os.path.join(ROOT, "wdc"))
+    result = subprocess.run([sys.executable, "-c", code], env=environment, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def imported_modules(module: str) -> list:
+    '''
+        Top-level names of the modules loaded by importing a module in a fresh interpreter
+
+        Arguments:
+            module (str): module to import, e.g. "DBC"
+    '''
+    output = run_python(f"import sys, json\nimport {module}\nprint(json.dumps(sorted(sys.modules)))")
+    return sorted({name.split(".")[0] for name in json.loads(output)})
+
+
+def measure(module: str, repeat: int = 10) -> list:
+    '''
+        Seconds taken by importing a module, measured in fresh interpreters
+
+        Arguments:
+            module (str): module to import
+            repeat (int): number of interpreters
+    '''
+    code = f"import time\nstart = time.perf_counter()\nimport {module}\nprint(time.perf_counter() - start)"
+    return [float(run_python(code)) for _ in range(repeat)]
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Measure the import time of the wdc modules")
+    parser.add_argument("--modules", nargs="+", default=["DBC", "DCO"])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, help="fail if a median import time exceeds this")
+    options = parser.parse_args(arguments)
+
+    report, failed = {}, False
+    for module in options.modules:
+        times = measure(module, options.repeat)
+        heavy = [name for name in HEAVY_MODULES if name in imported_modules(module)]
+        median = statistics.median(times) * 1000
+        report[module] = {"median_ms": round(median, 2), "min_ms": round(min(times) * 1000, 2), "heavy_modules": heavy}
+        failed |= bool(heavy) or (options.max_ms is not None and median > options.max_ms)
+    print(json.dumps(report, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
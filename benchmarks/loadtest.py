@@ -0,0 +1,271 @@
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from DBC import DBC
+from slowlog import percentile
+
+# One sent query; times are seconds since the start of the run. Open-loop latencies are
+# measured from the scheduled time, so a server falling behind is not hidden by queueing.
+Sample = namedtuple("Sample", ["label", "scheduled", "started", "finished", "ok", "bytes"])
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def load_workload(path: str) -> list:
+    '''
+        Queries of a JSONL workload, one object with a "query" per line; "label", "priority" and
+        "deadline" are optional. Blank lines and objects without a query are skipped.
+
+        Arguments:
+            path (str): path of the workload, "-" for the standard input
+    '''
+    file = sys.stdin if path == "-" else open(path)
+    try:
+        entries = []
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if isinstance(entry, dict) and entry.get("query"):
+                entries.append(entry)
+        return entries
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+def latency_summary(samples: list) -> dict:
+    '''
+        Latency percentiles in milliseconds of the successful samples
+    '''
+    latencies = sorted((sample.finished - sample.scheduled) * 1000 for sample in samples if sample.ok)
+    summary = {f"p{percent}_ms": percentile(latencies, percent) for percent in PERCENTILES}
+    summary["max_ms"] = latencies[-1] if latencies else None
+    summary["mean_ms"] = sum(latencies) / len(latencies) if latencies else None
+    return summary
+
+
+class LoadReport:
+    '''
+        LoadReport summarizes the samples of a run: latency percentiles, throughput, error rate
+        and bytes received, overall, per workload label and per time interval
+    '''
+
+    def __init__(self, samples: list, duration: float, mode: str):
+        self.samples = sorted(samples, key=lambda sample: sample.scheduled)
+        self.duration = duration
+        self.mode = mode
+
+    def summary(self) -> dict:
+        '''
+            Summary of the whole run
+
+            Arguments:
+                self: self@LoadReport
+        '''
+        errors = sum(not sample.ok for sample in self.samples)
+        received = sum(sample.bytes for sample in self.samples)
+        summary = {
+            "mode": self.mode,
+            "requests": len(self.samples),
+            "errors": errors,
+            "error_rate": errors / len(self.samples) if self.samples else 0.0,
+            "duration_s": self.duration,
+            "throughput_per_s": (len(self.samples) - errors) / self.duration if self.duration else 0.0,
+            "bytes": received,
+            "bytes_per_s": received / self.duration if self.duration else 0.0,
+            "latency": latency_summary(self.samples),
+        }
+        labels = sorted({sample.label for sample in self.samples})
+        if len(labels) > 1:
+            summary["labels"] = {}
+            for label in labels:
+                samples = [sample for sample in self.samples if sample.label == label]
+                summary["labels"][label] = {"requests": len(samples), "errors": sum(not sample.ok for sample in samples),
+                                            "latency": latency_summary(samples)}
+        return summary
+
+    def timeline(self, interval: float = 1.0) -> list:
+        '''
+            Requests, errors, bytes and latencies per time interval, by the time requests finished
+
+            Arguments:
+                self: self@LoadReport
+                interval (float): length of an interval in seconds
+        '''
+        buckets = {}
+        for sample in self.samples:
+            buckets.setdefault(int(sample.finished // interval), []).append(sample)
+        timeline = []
+        for index in range(int(self.duration // interval) + 1 if self.samples else 0):
+            samples = buckets.get(index, [])
+            latency = latency_summary(samples)
+            timeline.append({"start_s": index * interval, "requests": len(samples),
+                             "errors": sum(not sample.ok for sample in samples),
+                             "bytes": sum(sample.bytes for sample in samples),
+                             "p50_ms": latency["p50_ms"], "p99_ms": latency["p99_ms"]})
+        return timeline
+
+
+class LoadGenerator:
+    '''
+        LoadGenerator replays a workload of WCPS queries against a connector, either open-loop
+        (requests arrive at a fixed or Poisson rate whatever the server does) or closed-loop
+        (a fixed number of clients each sending the next query when the previous one returned)
+    '''
+
+    def __init__(self, dbc, workload: list):
+        '''
+            Initialization of the generator
+
+            Arguments:
+                self: self@LoadGenerator
+                dbc: database connector the queries are sent through
+                workload (list): workload entries, see load_workload
+        '''
+        if not workload:
+            raise ValueError("The workload has no queries")
+        self.dbc = dbc
+        self.workload = workload
+
+    def __entries(self, requests: int, duration: float):
+        # Without limits the workload is replayed once, with limits it is repeated
+        if requests is None and duration is None:
+            return iter(self.workload)
+        entries = itertools.cycle(self.workload)
+        return entries if requests is None else itertools.islice(entries, requests)
+
+    def __send(self, entry: dict, scheduled: float, origin: float) -> Sample:
+        started = time.perf_counter() - origin
+        result = None
+        try:
+            result = self.dbc.execute_query(entry["query"], priority=entry.get("priority"),
+                                            deadline=entry.get("deadline"))
+        except TimeoutError:
+            pass
+        finished = time.perf_counter() - origin
+        return Sample(entry.get("label", ""), scheduled, started, finished, result is not None,
+                      len(result) if result is not None else 0)
+
+    def open_loop(self, rate: float, duration: float = None, requests: int = None, arrival: str = "fixed",
+                  seed: int = 0, max_in_flight: int = 64) -> LoadReport:
+        '''
+            Send queries at a given arrival rate, independently of the responses
+
+            Arguments:
+                self: self@LoadGenerator
+                rate (float): queries per second
+                duration (float): seconds during which queries are sent
+                requests (int): number of queries to send; without limits the workload is sent once
+                arrival (str): "fixed" for evenly spaced queries, "poisson" for exponential gaps
+                seed (int): seed of the Poisson arrivals
+                max_in_flight (int): queries sent at the same time; later ones wait and their
+                                     waiting counts in their latency
+        '''
+        if arrival not in ("fixed", "poisson"):
+            raise ValueError("Arrival must be one of: fixed, poisson")
+        generator = random.Random(seed)
+        futures = []
+        origin = time.perf_counter()
+        scheduled = 0.0
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            for entry in self.__entries(requests, duration):
+                if duration is not None and scheduled >= duration:
+                    break
+                delay = scheduled - (time.perf_counter() - origin)
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(executor.submit(self.__send, entry, scheduled, origin))
+                scheduled += generator.expovariate(rate) if arrival == "poisson" else 1 / rate
+            wait(futures)
+        samples = [future.result() for future in futures]
+        return LoadReport(samples, time.perf_counter() - origin, f"open-{arrival}")
+
+    def closed_loop(self, concurrency: int, duration: float = None, requests: int = None) -> LoadReport:
+        '''
+            Send queries from a fixed number of clients, each waiting for its previous response
+
+            Arguments:
+                self: self@LoadGenerator
+                concurrency (int): number of clients
+                duration (float): seconds after which no new query is sent
+                requests (int): number of queries to send; without limits the workload is sent once
+        '''
+        entries = self.__entries(requests, duration)
+        lock = threading.Lock()
+        samples = []
+        origin = time.perf_counter()
+
+        def client():
+            while True:
+                now = time.perf_counter() - origin
+                if duration is not None and now >= duration:
+                    return
+                with lock:
+                    entry = next(entries, None)
+                if entry is None:
+                    return
+                sample = self.__send(entry, now, origin)
+                with lock:
+                    samples.append(sample)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return LoadReport(samples, time.perf_counter() - origin, "closed")
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Replay a JSONL workload of WCPS queries against an endpoint")
+    parser.add_argument("workload", help='JSONL file with one {"query": ...} per line, "-" for stdin')
+    parser.add_argument("--endpoint", help="endpoint of the server; a local stand-in is started when omitted")
+    parser.add_argument("--mode", choices=["open", "closed"], default="closed")
+    parser.add_argument("--rate", type=float, default=10.0, help="queries per second of the open loop")
+    parser.add_argument("--arrival", choices=["fixed", "poisson"], default="fixed")
+    parser.add_argument("--concurrency", type=int, default=4, help="clients of the closed loop")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="concurrent queries of the open loop")
+    parser.add_argument("--duration", type=float, help="seconds to send queries for")
+    parser.add_argument("--requests", type=int, help="number of queries to send")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds per timeline interval")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="latency of the local stand-in")
+    parser.add_argument("--output", help="write the report to this file instead of printing it")
+    options = parser.parse_args(arguments)
+
+    server = None
+    endpoint = options.endpoint
+    if endpoint is None:
+        from standin import StandInServer
+        server = StandInServer(latency=options.latency).start()
+        endpoint = server.url
+    try:
+        generator = LoadGenerator(DBC(endpoint), load_workload(options.workload))
+        if options.mode == "open":
+            report = generator.open_loop(options.rate, options.duration, options.requests, options.arrival,
+                                         options.seed, options.max_in_flight)
+        else:
+            report = generator.closed_loop(options.concurrency, options.duration, options.requests)
+    finally:
+        if server is not None:
+            server.stop()
+
+    text = json.dumps({"summary": report.summary(), "timeline": report.timeline(options.interval)}, indent=2)
+    if options.output:
+        with open(options.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
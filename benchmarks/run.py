@@ -0,0 +1,100 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+from benchmarks.harness import compare, peak_memory, summarize, time_function
+from benchmarks.import_time import ROOT
+from benchmarks.suite import BENCHMARKS, GROUPS, Context, Unavailable
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+def run(names: list, context: Context, repeat: int = 10, min_time: float = 0.05, memory: bool = True) -> dict:
+    '''
+        Run benchmarks and summarize their timings and peak memory
+
+        Arguments:
+            names (list): names of the benchmarks
+            context (Context): shared stand-in server and resources
+            repeat (int): number of timing samples per benchmark
+            min_time (float): minimum duration of a sample
+            memory (bool): whether the peak memory is measured
+    '''
+    results = {}
+    for name in names:
+        benchmark = BENCHMARKS[name]
+        try:
+            function = benchmark.setup(context)
+        except Unavailable as e:
+            results[name] = {"group": benchmark.group, "skipped": str(e)}
+            continue
+        samples, number = time_function(function, repeat=repeat, min_time=min_time)
+        result = {"group": benchmark.group, "operations": benchmark.operations, "number": number}
+        result.update(summarize(samples))
+        result["per_operation_s"] = result["median_s"] / benchmark.operations
+        result["operations_per_s"] = benchmark.operations / result["median_s"]
+        if memory:
+            result["peak_bytes"] = peak_memory(function)
+        results[name] = result
+    return results
+
+
+def metadata(options) -> dict:
+    import numpy
+    return {
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "repeat": options.repeat,
+        "latency": options.latency,
+    }
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmark query building, transport, decoding and "
+                                                 "end-to-end scenarios against a local stand-in server")
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument("--filter", default="", help="run only the benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=10, help="timing samples per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per sample")
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds the stand-in waits per request")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory measurement")
+    parser.add_argument("--output", help="write the report to this file instead of printing it")
+    parser.add_argument("--baseline", default=BASELINE, help="report to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown flagged as a regression")
+    options = parser.parse_args(arguments)
+
+    names = [name for name, benchmark in BENCHMARKS.items()
+             if benchmark.group in options.groups and options.filter in name]
+    with Context(latency=options.latency) as context:
+        results = run(names, context, options.repeat, options.min_time, not options.no_memory)
+    report = {"metadata": metadata(options), "results": results}
+
+    if os.path.exists(options.baseline) and not options.save_baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)
+        report["comparison"] = compare(results, baseline["results"], options.threshold)
+        report["regressions"] = sorted(name for name, entry in report["comparison"].items()
+                                       if entry["status"] == "regression")
+
+    text = json.dumps(report, indent=2)
+    if options.save_baseline:
+        # A benchmark skipped on this machine is left out rather than stored without timings
+        measured = {name: result for name, result in results.items() if "skipped" not in result}
+        with open(options.baseline, "w") as file:
+            file.write(json.dumps({**report, "results": measured}, indent=2) + "\n")
+    if options.output:
+        with open(options.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import os
+import subprocess
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.import_time import ROOT
+
+# The benchmarks import the modules by their flat names, like the modules import each other
+from DBC import DBC
+from DCO import AxisSubset, DCO
+from builder import QueryBuilder
+from decoders import decode_csv, decode_json
+from render import Style
+from lazy import lazy_import
+
+np = lazy_import("numpy", globals(), "np")
+
+Benchmark = namedtuple("Benchmark", ["name", "group", "operations", "setup"])
+
+# Registered benchmarks by name, in the order they are run
+BENCHMARKS = {}
+
+GROUPS = ["query", "transport", "decode", "scenario"]
+
+# Number of queries sent by one sample of the transport benchmarks
+QUERIES = 32
+
+MONTHS = [f"{year}-{month:02d}" for year in range(2000, 2016) for month in range(1, 13)]
+
+POLYGON = [(-12.3829, 132.0117), (-33.4314, 120.4102), (-18.8127, 148.5352), (-22.7559, 118.4766), (-36.3151, 143.7891)]
+
+
+class Unavailable(Exception):
+    '''
+        Raised by the setup of a benchmark needing an optional dependency that is not installed
+    '''
+
+
+def benchmark(name: str, group: str, operations: int = 1):
+    '''
+        Register a benchmark; the decorated setup receives the Context and returns the
+        callable without arguments that is timed
+
+        Arguments:
+            name (str): benchmark name, "<group>.<case>"
+            group (str): group of the benchmark, see GROUPS
+            operations (int): operations done by one call, used for the time per operation
+    '''
+    def register(setup):
+        BENCHMARKS[name] = Benchmark(name, group, operations, setup)
+        return setup
+    return register
+
+
+class Context:
+    '''
+        Context holds what the benchmarks share: the stand-in server, started in its own
+        process when first needed so it does not compete with the client for the interpreter
+    '''
+
+    def __init__(self, latency: float = 0.01, bandwidth: float = None):
+        '''
+            Initialization of the context
+
+            Arguments:
+                self: self@Context
+                latency (float): seconds the stand-in waits before answering, stands for the network
+                bandwidth (float): bytes per second of the stand-in responses, None for no limit
+        '''
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.__process = None
+        self.__url = None
+        self.__closers = []
+
+    @property
+    def url(self) -> str:
+        if self.__url is None:
+            command = [sys.executable, os.path.join(ROOT, "wdc", "standin.py"), "--port", "0",
+                       "--latency", str(self.latency)]
+            if self.bandwidth:
+                command += ["--bandwidth", str(self.bandwidth)]
+            self.__process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True,
+                                              env=dict(os.environ, PYTHONPATH=os.path.join(ROOT, "wdc")))
+            line = self.__process.stdout.readline()
+            if " at " not in line:
+                self.close()
+                raise RuntimeError("The stand-in server could not be started")
+            self.__url = line.rsplit(" at ", 1)[1].strip()
+        return self.__url
+
+    def dbc(self) -> DBC:
+        return DBC(self.url)
+
+    def defer(self, callback):
+        '''
+            Run a callback when the context is closed, e.g. shutting down a thread pool
+
+            Arguments:
+                self: self@Context
+                callback: callable without arguments
+        '''
+        self.__closers.append(callback)
+
+    def close(self):
+        for callback in reversed(self.__closers):
+            callback()
+        self.__closers = []
+        if self.__process is not None:
+            self.__process.terminate()
+            self.__process.wait()
+            self.__process = None
+            self.__url = None
+
+    def __enter__(self) -> 'Context':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Query construction
+
+@benchmark("query.axis_subsets", "query", operations=1000)
+def axis_subsets(context):
+    def run():
+        for index in range(250):
+            AxisSubset("ansi", MONTHS[index % len(MONTHS)])
+            AxisSubset("Lat", -90 + index % 180, -89 + index % 180)
+            AxisSubset("Long", index % 360 - 180)
+            AxisSubset('Lat:"CRS:1"', index, index + 10)
+    return run
+
+
+@benchmark("query.dco_build", "query", operations=1000)
+def dco_build(context):
+    def run():
+        for index in range(1000):
+            dco = DCO(None).select("$c", ["AvgLandTemp"])
+            dco.subset("$c", [AxisSubset("ansi", MONTHS[index % len(MONTHS)]), AxisSubset("Lat", 25, 90),
+                              AxisSubset("Long", -30, 55)])
+            dco.avg().build_query()
+    return run
+
+
+@benchmark("query.builder_variants", "query", operations=1000)
+def builder_variants(context):
+    base = QueryBuilder(None).select("$c", ["AvgLandTemp"]).set_format("text/csv")
+    spatial = [AxisSubset("Lat", 25, 90), AxisSubset("Long", -30, 55)]
+
+    def run():
+        for index in range(1000):
+            base.subset([AxisSubset("ansi", MONTHS[index % len(MONTHS)])] + spatial).max().build_query()
+    return run
+
+
+# Transport
+
+def execute_queries(context, concurrency: int):
+    dbc = context.dbc()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    context.defer(executor.shutdown)
+    queries = [f'for $c in (AvgLandTemp) return avg($c[ansi("{MONTHS[index]}"), Lat(25:30), Long(0:5)])'
+               for index in range(QUERIES)]
+
+    def run():
+        results = list(executor.map(dbc.execute_query, queries))
+        if any(result is None for result in results):
+            raise RuntimeError("A query failed")
+    return run
+
+
+for concurrency in (1, 4, 16):
+    benchmark(f"transport.execute_query[{concurrency}]", "transport", QUERIES)(
+        lambda context, concurrency=concurrency: execute_queries(context, concurrency))
+
+
+# Decoding
+
+def encoded_map(format: str) -> bytes:
+    from standin import default_coverages, encode
+    values = default_coverages()[0].read([(184, 184), (0, 179), (0, 359)])[0]
+    return encode(values, format).payload
+
+
+@benchmark("decode.csv", "decode")
+def decode_csv_map(context):
+    payload = encoded_map("text/csv")
+    return lambda: decode_csv(payload)
+
+
+@benchmark("decode.json", "decode")
+def decode_json_map(context):
+    payload = encoded_map("application/json")
+    return lambda: decode_json(payload)
+
+
+@benchmark("decode.binary", "decode")
+def decode_binary_map(context):
+    payload = encoded_map("application/octet-stream")
+    return lambda: np.frombuffer(payload, dtype=np.float32).reshape(180, 360)
+
+
+@benchmark("decode.png", "decode")
+def decode_png_map(context):
+    try:
+        import io
+        from PIL import Image
+    except ImportError:
+        raise Unavailable("Pillow is not installed")
+    payload = encoded_map("image/png")
+    return lambda: np.asarray(Image.open(io.BytesIO(payload)))
+
+
+# Scenarios of main.py
+
+def checked(result):
+    if result is None:
+        raise RuntimeError("The query failed")
+    return result
+
+
+@benchmark("scenario.png_month", "scenario")
+def png_month(context):
+    dbc = context.dbc()
+    dco = DCO(dbc).select("$c", ["AvgLandTemp"]).subset("$c", [AxisSubset("ansi", "2015-05")]).set_format("image/png")
+    return lambda: checked(dco.execute())
+
+
+@benchmark("scenario.custom_colormap", "scenario")
+def custom_colormap(context):
+    dco = DCO(context.dbc()).select("$c", ["AvgLandTemp"])
+    dco.custom_encode('''
+        switch
+            case $c = 99999
+                return {red: 255; green: 255; blue: 255}
+            case 18 > $c
+                return {red: 0; green: 0; blue: 255}
+            case 23 > $c
+                return {red: 255; green: 255; blue: 0}
+            case 30 > $c
+                return {red: 255; green: 140; blue: 0}
+            default return {red: 255; green: 255; blue: 255}''')
+    dco.subset("$c", [AxisSubset("ansi", "2015-05"), AxisSubset("Lat", 25, 90), AxisSubset("Long", -30, 55)])
+    dco.set_format("image/png")
+    return lambda: checked(dco.execute())
+
+
+@benchmark("scenario.local_style", "scenario")
+def local_style(context):
+    dco = DCO(context.dbc()).select("$c", ["AvgLandTemp"])
+    dco.subset("$c", [AxisSubset("ansi", "2015-05"), AxisSubset("Lat", 25, 90), AxisSubset("Long", -30, 55)])
+    style = Style(breaks=[18, 23, 30], colors=[(0, 0, 255), (255, 255, 0), (255, 140, 0), (255, 255, 255)],
+                  nodata=99999, nodata_color=(255, 255, 255))
+    return lambda: checked(dco.fetch_layer()).to_png(style)
+
+
+@benchmark("scenario.count_months", "scenario")
+def count_months(context):
+    dco = DCO(context.dbc()).select("$c", ["AvgLandTemp"]).count()
+    dco.subset("$c", [AxisSubset("ansi", "2013-07", "2015-04"), AxisSubset("Lat", 54.08), AxisSubset("Long", 8.80)])
+    return lambda: checked(dco.execute())
+
+
+@benchmark("scenario.yearly_series", "scenario")
+def yearly_series(context):
+    dco = DCO(context.dbc()).select("$c", ["AvgLandTemp"])
+    dco.subset("$c", [AxisSubset("Lat", 54.08), AxisSubset("Long", 8.80), AxisSubset("ansi", "2000-01", "2015-12")])
+    dco.group_by_time("year", "avg")
+    return lambda: checked(dco.execute_series())
+
+
+@benchmark("scenario.clip_polygon", "scenario")
+def clip_polygon(context):
+    dco = DCO(context.dbc()).select("$c", ["mean_summer_airtemp"])
+    return lambda: checked(dco.clip_with_polygon("mean_summer_airtemp", POLYGON))
+
+
+@benchmark("scenario.greater_than", "scenario")
+def greater_than(context):
+    dco = DCO(context.dbc()).select("$c", ["AvgLandTemp"])
+    subsets = [AxisSubset("Lat", 53.08), AxisSubset("Long", 8.80), AxisSubset("ansi", "2014-01", "2014-12")]
+    return lambda: checked(dco.greater_than_query("$c", subsets, 15))
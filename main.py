@@ -1,5 +1,6 @@
 from wdc.DBC import DBC
 from wdc.DCO import DCO, AxisSubset
+from wdc.render import Style
 from matplotlib import pyplot as plt
 from matplotlib import colors
 import numpy as np
@@ -56,6 +57,17 @@ if __name__ == "__main__":
     img2 = Image.open(io.BytesIO(output2))
     img2.show()
 
+    # The same colormap can be applied locally: the raw subset is fetched once
+    # and restyling it does not need a new query
+    layer = DCO(dbc).select("$c", ["AvgLandTemp"]).subset(variable="$c", axis_subsets=[AxisSubset('ansi', '2015-05'),
+                                                                                      AxisSubset('Lat', 25, 90),
+                                                                                      AxisSubset('Long', -30, 55)]).fetch_layer()
+    style = Style(breaks=[18, 23, 30],
+                  colors=[(0, 0, 255), (255, 255, 0), (255, 140, 0), (255, 255, 255)],
+                  nodata=99999, nodata_color=(255, 255, 255))
+    img2_local = Image.open(io.BytesIO(layer.to_png(style)))
+    img2_local.show()
+
     # Create a third DCO instance to count data points within a given time range
     dco3 = DCO(dbc)
     dco3.select("$c", ["AvgLandTemp"])
@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import MagicMock
+from wdc.DCO import AxisSubset, DCO
+from wdc.approximate import estimate
+
+# One axis without georeferencing, so a trim counts its 1000 cells
+DESCRIPTION = {"axis_labels": ["ansi"], "low_limits": ["0"], "high_limits": ["999"]}
+
+class TestApproximateAggregates(unittest.TestCase):
+    def setUp(self):
+        # Create a MagicMock to simulate database behavior
+        self.mock_dbc = MagicMock()
+        self.mock_dbc.describe_coverage.return_value = DESCRIPTION
+        self.dco = DCO(self.mock_dbc)
+        self.dco.select("$c", ["AvgLandTemp"]).subset("$c", [AxisSubset('ansi', '2000-01', '2015-12')])
+
+    def test_sample_statistics_in_one_query(self):
+        self.mock_dbc.execute_query.return_value = b"100,1100,10"
+        estimates = list(self.dco.avg().execute_approximate(factors=[0.1]))
+        query = self.mock_dbc.execute_query.call_args[0][0]
+        self.assertIn('case $i = 0 return sum(scale($c[ansi("2000-01":"2015-12")], 0.1))', query)
+        # Only the subsample is read, the size of the subset comes from the coverage description
+        self.assertIn('default return cellCount(scale($c[ansi("2000-01":"2015-12")], 0.1))', query)
+        self.assertNotIn('cellCount($c[', query)
+        self.assertEqual(len(estimates), 1)
+        self.assertEqual(estimates[0].value, 10.0)
+        self.assertLess(estimates[0].low, 10.0)
+        self.assertGreater(estimates[0].high, 10.0)
+        self.assertFalse(estimates[0].exact)
+
+    def test_progressive_refinement_stops_when_exact(self):
+        self.mock_dbc.execute_query.side_effect = [b"100,1100,10", b"1000,11000,1000"]
+        estimates = list(self.dco.sum().execute_approximate(factors=[0.1, 1, 1]))
+        self.assertEqual(self.mock_dbc.execute_query.call_count, 2)
+        # The exact value has no uncertainty left
+        self.assertTrue(estimates[-1].exact)
+        self.assertEqual(estimates[-1].low, estimates[-1].high)
+        self.assertEqual(estimates[-1].value, 1000.0)
+
+    def test_budget_stops_refinement(self):
+        self.mock_dbc.execute_query.return_value = b"100,1100,10"
+        estimates = list(self.dco.avg().execute_approximate(factors=[0.1, 0.5, 1], budget=0))
+        self.assertEqual(len(estimates), 1)
+
+    def test_interval_narrows_with_sample_size(self):
+        small = estimate("avg", [100, 1100, 10], 10000, 0.1)
+        large = estimate("avg", [10000, 110000, 1000], 10000, 0.5)
+        self.assertLess(large.high - large.low, small.high - small.low)
+
+    def test_requires_estimable_operation(self):
+        with self.assertRaises(ValueError):
+            list(self.dco.max().execute_approximate())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+from benchmarks.harness import compare, peak_memory, summarize, time_function
+from benchmarks.run import main, run
+from benchmarks.suite import BENCHMARKS, Context
+
+class TestHarness(unittest.TestCase):
+    def test_summarize(self):
+        summary = summarize([1.0, 1.1, 0.9, 1.0, 5.0])
+        # The outlier moves the mean, not the median
+        self.assertEqual(summary["median_s"], 1.0)
+        self.assertGreater(summary["mean_s"], 1.5)
+        self.assertLess(summary["ci_low_s"], 1.0)
+        self.assertGreater(summary["ci_high_s"], 1.0)
+
+    def test_compare_needs_significant_slowdown(self):
+        baseline = {"a": summarize([1.0, 1.01, 0.99, 1.0]), "b": summarize([1.0, 1.01, 0.99, 1.0])}
+        results = {"a": summarize([1.5, 1.51, 1.49, 1.5]), "b": summarize([1.05, 1.06, 1.04, 1.05])}
+        comparison = compare(results, baseline, threshold=0.1)
+        self.assertEqual(comparison["a"]["status"], "regression")
+        self.assertEqual(comparison["b"]["status"], "unchanged")
+        # Noisy samples whose intervals overlap are not flagged
+        noisy = {"a": summarize([0.5, 2.5, 1.2, 3.0])}
+        self.assertEqual(compare(noisy, baseline)["a"]["status"], "unchanged")
+        # A benchmark skipped when the baseline was recorded is not compared
+        skipped = {"a": {"group": "decode", "skipped": "Pillow is not installed"}}
+        self.assertEqual(compare(results, skipped), {})
+
+    def test_time_and_memory(self):
+        samples, number = time_function(lambda: sum(range(100)), repeat=3, min_time=0.001)
+        self.assertEqual(len(samples), 3)
+        self.assertGreaterEqual(number, 1)
+        self.assertGreaterEqual(peak_memory(lambda: bytearray(1 << 20)), 1 << 20)
+
+class TestSuite(unittest.TestCase):
+    def test_groups_registered(self):
+        groups = {benchmark.group for benchmark in BENCHMARKS.values()}
+        self.assertEqual(groups, {"query", "transport", "decode", "scenario"})
+
+    def test_run_against_stand_in(self):
+        with Context(latency=0) as context:
+            results = run(["query.dco_build", "scenario.count_months"], context, repeat=2, min_time=0)
+        self.assertEqual(results["query.dco_build"]["operations"], 1000)
+        self.assertGreater(results["scenario.count_months"]["median_s"], 0)
+        self.assertIn("peak_bytes", results["scenario.count_months"])
+
+    def test_baseline_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            arguments = ["--groups", "query", "--filter", "axis", "--repeat", "3", "--no-memory",
+                         "--baseline", baseline]
+            self.assertEqual(main(arguments + ["--save-baseline", "--output", os.path.join(directory, "a.json")]), 0)
+            output = os.path.join(directory, "b.json")
+            main(arguments + ["--output", output])
+            with open(output) as file:
+                report = json.load(file)
+            self.assertIn("query.axis_subsets", report["comparison"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+from wdc.DCO import AxisSubset, DCO
+from wdc.builder import QueryBuilder
+
+class TestQueryBuilder(unittest.TestCase):
+    def setUp(self):
+        # Create a MagicMock to simulate database behavior
+        self.mock_dbc = MagicMock()
+        self.base = QueryBuilder(self.mock_dbc).select("$c", ["AvgLandTemp"]).set_format("image/png")
+
+    def test_matches_dco_queries(self):
+        subsets = [AxisSubset('ansi', '2015-05'), AxisSubset('Lat', 25, 90)]
+        dco = DCO(self.mock_dbc).select("$c", ["AvgLandTemp"]).set_format("image/png").subset("$c", subsets)
+        self.assertEqual(self.base.subset(subsets).build_query(), dco.build_query())
+        self.assertEqual(self.base.subset(subsets).avg().build_query(), dco.avg().build_query())
+
+    def test_variants_share_the_base(self):
+        monthly = self.base.subset([AxisSubset('ansi', '2015-05')])
+        average = monthly.avg()
+        # The parent is unchanged and unchanged parts are shared, not copied
+        self.assertEqual(monthly.operation, "")
+        self.assertEqual(average.operation, "avg(0)")
+        self.assertIs(average.for_queries, monthly.for_queries)
+        self.assertIs(average.axis_subsets, monthly.axis_subsets)
+        self.assertFalse(hasattr(average, "__dict__"))
+        with self.assertRaises(AttributeError):
+            average.format = "text/csv"
+
+    def test_select_again_does_not_repeat_clause(self):
+        builder = self.base.select("$c", ["AvgTemperatureColorScaled"])
+        self.assertEqual(builder.for_queries, ("$c in (AvgTemperatureColorScaled)",))
+        dco = DCO(self.mock_dbc).select("$c", ["AvgLandTemp"]).select("$c", ["AvgLandTemp"])
+        self.assertEqual(dco._DCO__for_queries, ["$c in (AvgLandTemp)"])
+
+    def test_fan_out_across_threads(self):
+        months = [f"20{year:02d}-{month:02d}" for year in range(10, 16) for month in range(1, 13)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            queries = list(executor.map(lambda month: self.base.subset([AxisSubset('ansi', month)]).max().build_query(),
+                                        months))
+        self.assertEqual(len(set(queries)), len(months))
+        self.assertIn('return max($c[ansi("2015-12")])', queries[-1])
+
+    def test_freeze_dco(self):
+        dco = DCO(self.mock_dbc).select("$c", ["AvgLandTemp"]).subset("$c", [AxisSubset('ansi', '2015-05')]).sum()
+        frozen = dco.freeze()
+        self.assertEqual(frozen.build_query(), dco.build_query())
+        frozen.execute()
+        self.assertEqual(self.mock_dbc.execute_query.call_args[0][0], dco.build_query())
+
+    def test_aggregate_already_pending(self):
+        with self.assertRaises(ValueError):
+            self.base.subset([AxisSubset('ansi', '2015-05')]).avg().max()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import time
+import unittest
+from wdc.DBC import DBC
+from wdc.cassette import Cassette, CassetteMiss, ReplayTransport
+from wdc.standin import StandInServer
+
+QUERY = 'for $c in (AvgLandTemp) return avg($c[ansi("2015-05"), Lat(25:30), Long(0:5)])'
+CSV = 'for $c in (AvgLandTemp) return encode($c[ansi("2015-05"), Lat(25:26), Long(0:2)], "text/csv")'
+PARTS = 'for $c in (AvgLandTemp, mean_summer_airtemp) return encode(avg($c), "text/csv")'
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "session")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_record_then_replay_without_server(self):
+        with StandInServer(latency=0.05) as server:
+            dbc = DBC(server.url)
+            cassette = dbc.enable_recording(self.path)
+            expected = [dbc.execute_query(QUERY), dbc.execute_query(CSV, deadline=5),
+                        list(dbc.execute_query_parts(PARTS, ["AvgLandTemp", "mean_summer_airtemp"]))]
+            cassette.close()
+            self.assertEqual(server.requests, 3)
+
+        replay = DBC(server.url)
+        cassette = replay.enable_replay(self.path)
+        self.assertEqual(len(cassette), 3)
+        started = time.perf_counter()
+        self.assertEqual(replay.execute_query(QUERY), expected[0])
+        self.assertEqual(replay.execute_query(CSV, deadline=5), expected[1])
+        self.assertEqual(list(replay.execute_query_parts(PARTS, ["AvgLandTemp", "mean_summer_airtemp"])),
+                         expected[2])
+        # Without timing emulation the recorded latency is not waited for
+        self.assertLess(time.perf_counter() - started, 0.1)
+        # A query that was not recorded fails like an unreachable server
+        self.assertIsNone(replay.execute_query("for $c in (AvgLandTemp) return 1"))
+        cassette.close()
+
+    def test_timing_emulation(self):
+        with StandInServer(latency=0.1) as server:
+            dbc = DBC(server.url)
+            dbc.enable_recording(self.path)
+            dbc.execute_query(QUERY)
+            dbc.transport.cassette.close()
+
+        cassette = Cassette(self.path)
+        started = time.perf_counter()
+        ReplayTransport(cassette, timing=True).post(server.url, data={'query': QUERY}).content
+        self.assertGreaterEqual(time.perf_counter() - started, 0.09)
+        started = time.perf_counter()
+        ReplayTransport(cassette, timing=True, speed=10).post(server.url, data={'query': QUERY}).content
+        self.assertLess(time.perf_counter() - started, 0.05)
+        # A deadline shorter than the recorded latency times out
+        replay = DBC(server.url)
+        replay.transport = ReplayTransport(cassette, timing=True)
+        with self.assertRaises(TimeoutError):
+            replay.execute_query(QUERY, deadline=0.02)
+        with self.assertRaises(CassetteMiss):
+            cassette.lookup("post", server.url, {"query": "missing"})
+        cassette.close()
+
+    def test_first_byte_recorded_apart_from_transfer(self):
+        query = 'for $c in (AvgLandTemp) return encode($c[ansi("2015-05"), Lat(0:40), Long(0:40)], "application/octet-stream")'
+        with StandInServer(latency=0.05, bandwidth=100000) as server:
+            dbc = DBC(server.url)
+            cassette = dbc.enable_recording(self.path)
+            self.assertEqual(len(dbc.execute_query(query)), 81 * 81 * 4)
+            cassette.close()
+
+        entry = Cassette(self.path).lookup("post", server.url, {"query": query})
+        # About 0.26s of the exchange is the transfer of the body, not the wait for the first byte
+        self.assertGreaterEqual(entry.first_byte, 0.05)
+        self.assertGreater(entry.elapsed - entry.first_byte, 0.15)
+
+    def test_repeated_requests_in_order(self):
+        with StandInServer() as server:
+            dbc = DBC(server.url)
+            cassette = dbc.enable_recording(self.path)
+            server.fail_next(1, 503)
+            self.assertIsNone(dbc.execute_query(QUERY))
+            result = dbc.execute_query(QUERY)
+            cassette.close()
+
+        replay = DBC(server.url)
+        replay.enable_replay(self.path)
+        self.assertIsNone(replay.execute_query(QUERY))
+        self.assertEqual(replay.execute_query(QUERY), result)
+        # The last recorded response is repeated
+        self.assertEqual(replay.execute_query(QUERY), result)
+        replay.transport.cassette.close()
+
+if __name__ == '__main__':
+    unittest.main()
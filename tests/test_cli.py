@@ -0,0 +1,114 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from wdc import cli
+from wdc.cli import main, output_name, query_of
+from wdc.standin import StandInServer
+
+QUERY = 'for $c in (AvgLandTemp) return avg($c[ansi("2015-05"), Lat(25:30), Long(0:5)])'
+SPEC = {"id": "may-csv", "coverages": ["AvgLandTemp"], "format": "text/csv",
+        "subsets": [["ansi", "2015-05"], ["Lat", 25, 26], ["Long", 0, 2]]}
+
+class TestEntries(unittest.TestCase):
+    def test_query_of_spec(self):
+        query = query_of({"coverages": ["AvgLandTemp"], "subsets": [["Lat", 25, 30]], "operation": "avg"}, None)
+        self.assertEqual(query, 'for $c in (AvgLandTemp)\nreturn avg($c[Lat(25:30)])')
+        with self.assertRaises(ValueError):
+            query_of({"coverages": ["AvgLandTemp"], "operation": "median"}, None)
+        with self.assertRaises(ValueError):
+            query_of({"label": "no query"}, None)
+
+    def test_output_names(self):
+        self.assertEqual(output_name(7, {"id": "may/2015"}, 'return encode($c, "text/csv")'), "may_2015.csv")
+        self.assertEqual(output_name(7, {}, QUERY), output_name(7, {}, QUERY))
+        self.assertTrue(output_name(7, {}, QUERY).startswith("000007-"))
+        self.assertTrue(output_name(7, {}, QUERY).endswith(".txt"))
+        clip = 'return encode(clip(c, POLYGON((0 0, 1 1))), "image/png", "{\\"nodata\\": [0]}")'
+        self.assertTrue(output_name(0, {}, clip).endswith(".png"))
+
+class TestBatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.directory.name, "out")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_batch(self, *arguments):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            code = main(list(arguments) + ["--endpoint", self.server.url, "-o", self.output, "--progress", "0",
+                                           "--backoff", "0"])
+        return code, json.loads(stdout.getvalue().splitlines()[-1])
+
+    def manifest(self):
+        with open(os.path.join(self.output, "manifest.jsonl")) as file:
+            return sorted((json.loads(line) for line in file), key=lambda record: record["index"])
+
+    def test_jsonl_and_query_files(self):
+        workload = os.path.join(self.directory.name, "batch.jsonl")
+        with open(workload, "w") as file:
+            for index in range(6):
+                file.write(json.dumps({"query": QUERY.replace("Long(0:5)", f"Long({index}:{index + 5})")}) + "\n")
+            file.write(json.dumps(SPEC) + "\n")
+        query_file = os.path.join(self.directory.name, "june.wcps")
+        with open(query_file, "w") as file:
+            file.write(QUERY.replace("2015-05", "2015-06"))
+
+        code, summary = self.run_batch(workload, query_file, "-j", "3")
+        self.assertEqual(code, 0)
+        self.assertEqual((summary["queries"], summary["failed"]), (8, 0))
+        records = self.manifest()
+        self.assertEqual([record["index"] for record in records], list(range(8)))
+        self.assertEqual(records[6]["file"], "may-csv.csv")
+        self.assertEqual(records[7]["file"], "june.txt")
+        with open(os.path.join(self.output, "may-csv.csv"), "rb") as file:
+            self.assertEqual(len(file.read()), records[6]["bytes"])
+        self.assertFalse([name for name in os.listdir(self.output) if name.endswith(".part")])
+
+        # The same input gives the same files
+        names = sorted(os.listdir(self.output))
+        self.run_batch(workload, query_file)
+        self.assertEqual(sorted(os.listdir(self.output)), names)
+
+    def test_stdin_and_failures(self):
+        lines = "\n".join([json.dumps({"query": QUERY, "id": "ok"}), "{not json", json.dumps({"query": "not a query"})])
+        with patch("sys.stdin", io.StringIO(lines + "\n")):
+            code, summary = self.run_batch("--retries", "0")
+        self.assertEqual(code, 1)
+        self.assertEqual((summary["queries"], summary["failed"]), (3, 2))
+        records = self.manifest()
+        self.assertTrue(records[0]["ok"])
+        self.assertTrue(records[1]["error"].startswith("ValueError: Invalid JSON"))
+        self.assertEqual(records[2]["error"], "query failed")
+
+    def test_results_streamed_and_duplicate_ids(self):
+        lines = "\n".join(json.dumps({"query": QUERY.replace("Long(0:5)", f"Long({index}:{index + 5})"), "id": "same"})
+                          for index in range(2))
+        # Results go to disk as they arrive, never through the whole body in memory
+        with patch("sys.stdin", io.StringIO(lines + "\n")), \
+                patch.object(cli.DBC, "execute_query", side_effect=AssertionError("body held in memory")):
+            code, summary = self.run_batch()
+        self.assertEqual(code, 1)
+        records = self.manifest()
+        self.assertTrue(records[0]["ok"])
+        with open(os.path.join(self.output, "same.txt"), "rb") as file:
+            self.assertEqual(len(file.read()), records[0]["bytes"])
+        # The second entry would overwrite the result of the first
+        self.assertEqual(records[1]["error"], "ValueError: Duplicate id 'same'")
+        self.assertFalse([name for name in os.listdir(self.output) if name.endswith(".part")])
+
+if __name__ == '__main__':
+    unittest.main()
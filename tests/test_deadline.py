@@ -0,0 +1,123 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from wdc.DCO import AxisSubset, DCO
+from wdc.DBC import DBC
+# The same module the connector imports, so that deadlines are recognized
+from deadline import Deadline, DeadlineExceeded
+
+def stream_response(status_code=200, chunks=(b"1,2",), text=""):
+    response = MagicMock(status_code=status_code, text=text)
+    response.iter_content.return_value = iter(chunks)
+    return response
+
+class TestDeadline(unittest.TestCase):
+    def test_remaining_and_check(self):
+        deadline = Deadline(10)
+        self.assertLessEqual(deadline.remaining(), 10)
+        deadline.check()
+        deadline.cancel()
+        self.assertEqual(deadline.remaining(), 0)
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check()
+        # Without time limit only a cancellation stops the work
+        self.assertIsNone(Deadline().remaining())
+        self.assertIsNone(Deadline.of(None))
+
+    def test_sleep_past_deadline(self):
+        deadline = Deadline(0.05)
+        started = time.monotonic()
+        self.assertFalse(deadline.sleep(1))
+        self.assertLess(time.monotonic() - started, 0.05)
+
+class TestDBCDeadline(unittest.TestCase):
+    @patch("wdc.DBC.WebCoverageService")
+    def setUp(self, mock_wcs):
+        self.dbc = DBC("https://example.org/rasdaman/ows")
+
+    @patch("wdc.DBC.requests.post")
+    def test_timeout_bounded_by_deadline(self, mock_post):
+        mock_post.return_value = stream_response(chunks=[b"1,", b"2"])
+        self.assertEqual(self.dbc.execute_query("for $c in (A) return 1", deadline=2), b"1,2")
+        self.assertLessEqual(mock_post.call_args[1]["timeout"], 2)
+        # The connection goes back to the pool
+        mock_post.return_value.close.assert_called()
+
+    @patch("wdc.DBC.requests.post")
+    def test_cancel_during_transfer(self, mock_post):
+        deadline = Deadline()
+
+        def chunks():
+            yield b"1,"
+            deadline.cancel()
+            yield b"2"
+
+        mock_post.return_value = stream_response(chunks=chunks())
+        with self.assertRaises(DeadlineExceeded):
+            self.dbc.execute_query("for $c in (A) return 1", deadline=deadline)
+        mock_post.return_value.close.assert_called()
+
+    @patch("wdc.DBC.requests.post")
+    def test_retries(self, mock_post):
+        mock_post.side_effect = [stream_response(503, text="busy"), stream_response(chunks=[b"7"])]
+        self.dbc.enable_retries(retries=2, backoff=0.01)
+        self.assertEqual(self.dbc.execute_query("for $c in (A) return 1", deadline=5), b"7")
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch("wdc.DBC.requests.post")
+    def test_no_retry_past_deadline(self, mock_post):
+        mock_post.return_value = stream_response(503, text="busy")
+        self.dbc.enable_retries(retries=5, backoff=1)
+        started = time.monotonic()
+        # The backoff would outlast the deadline, the query gives up at once
+        self.assertIsNone(self.dbc.execute_query("for $c in (A) return 1", deadline=0.5))
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+class TestDCODeadline(unittest.TestCase):
+    def test_outstanding_tiles_abandoned(self):
+        mock_dbc = MagicMock()
+        sent = []
+
+        def slow_query(query, deadline=None):
+            # Stands for a fetch bounded by the deadline, nothing is sent once it passed
+            deadline.check()
+            sent.append(query)
+            while not deadline.expired:
+                time.sleep(0.005)
+            deadline.check()
+            return b"[1, 2, 3]"
+
+        mock_dbc.execute_query.side_effect = slow_query
+        dco = DCO(mock_dbc).select("$c", ["AvgLandTemp"])
+        tiles = [[AxisSubset("Lat", low, low + 1)] for low in range(20)]
+        started = time.monotonic()
+        deadline = Deadline(0.1)
+        with self.assertRaises(DeadlineExceeded):
+            dco.execute_quantiles([0.5], tiles, workers=2, deadline=deadline)
+        self.assertLess(time.monotonic() - started, 0.5)
+        # Only the tiles being fetched when the deadline passed were sent
+        self.assertEqual(len(sent), 2)
+        # The caller's deadline may be shared, only the tiles were cancelled
+        self.assertFalse(deadline.cancelled)
+
+    def test_execute_passes_deadline(self):
+        mock_dbc = MagicMock()
+        dco = DCO(mock_dbc).select("$c", ["AvgLandTemp"]).subset("$c", [AxisSubset("ansi", "2015-05")])
+        dco.set_format("text/csv").execute(deadline=3)
+        deadline = mock_dbc.execute_query.call_args[1]["deadline"]
+        self.assertIsInstance(deadline, Deadline)
+        self.assertLessEqual(deadline.remaining(), 3)
+
+    def test_helpers_pass_deadline(self):
+        mock_dbc = MagicMock()
+        dco = DCO(mock_dbc).select("$c", ["AvgLandTemp"])
+        subsets = [AxisSubset("ansi", "2015-05"), AxisSubset("Lat", 25, 30)]
+        dco.celsius_to_kelvin("$c", subsets, deadline=3)
+        dco.greater_than_query("$c", subsets, 10, deadline=3)
+        dco.clip_with_polygon("AvgLandTemp", [(0, 0), (1, 1), (1, 0)], deadline=3)
+        for call in mock_dbc.execute_query.call_args_list:
+            self.assertIsInstance(call[1]["deadline"], Deadline)
+
+if __name__ == '__main__':
+    unittest.main()
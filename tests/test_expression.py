@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from wdc.DCO import AxisSubset, DCO
+from wdc.expression import Func, compile_wcps
+
+class TestExpressions(unittest.TestCase):
+    def setUp(self):
+        # Create a MagicMock to simulate database behavior
+        self.mock_dbc = MagicMock()
+        self.dco = DCO(self.mock_dbc)
+        self.dco.selectMultVar(["$n", "$r", "$b"], ["NIR", "RED", "BLUE"])
+        self.dco.only_subset([AxisSubset('ansi', '2021-04-06')])
+
+    def test_shared_subsets_are_hoisted(self):
+        nir, red = self.dco.band("$n"), self.dco.band("$r")
+        self.dco.calculate(ndvi=(nir - red) / (nir + red), diff=nir - red)
+        self.dco.set_format("application/json").execute_expressions()
+
+        query = self.mock_dbc.execute_query.call_args[0][0]
+        # Every subset reference and the shared difference are bound once
+        self.assertEqual(query.count('$n[ansi("2021-04-06")]'), 1)
+        self.assertEqual(query.count('$r[ansi("2021-04-06")]'), 1)
+        self.assertIn('let $let0 := $n[ansi("2021-04-06")], $let1 := $r[ansi("2021-04-06")], '
+                      '$let2 := ($let0 - $let1)', query)
+        self.assertIn('return encode({ndvi: ($let2 / ($let0 + $let1)); diff: $let2}, "application/json")', query)
+        self.assertTrue(query.startswith("for $n in (NIR), $r in (RED), $b in (BLUE)"))
+
+    def test_single_output_without_sharing(self):
+        let_clause, result = compile_wcps({None: self.dco.band("$n") * 2 + self.dco.band("$b")})
+        self.assertEqual(let_clause, "")
+        self.assertEqual(result, '(($n[ansi("2021-04-06")] * 2) + $b[ansi("2021-04-06")])')
+
+    def test_band_requires_selected_variable(self):
+        with self.assertRaises(ValueError):
+            self.dco.band("$x")
+
+    def test_evaluate_local_in_chunks(self):
+        nir, red, blue = self.dco.band("$n"), self.dco.band("$r"), self.dco.band("$b")
+        self.dco.calculate(ndvi=(nir - red) / (nir + red), evi=Func("sqrt", blue * blue))
+        arrays = {
+            "$n": np.arange(10, 20, dtype=float).reshape(2, 5),
+            "$r": np.arange(0, 10, dtype=float).reshape(2, 5),
+            "$b": -np.ones((2, 5)),
+        }
+        # A chunk smaller than the arrays exercises the chunked evaluation
+        results = self.dco.evaluate_local(arrays, chunk_size=3)
+        expected = (arrays["$n"] - arrays["$r"]) / (arrays["$n"] + arrays["$r"])
+        np.testing.assert_allclose(results["ndvi"], expected)
+        np.testing.assert_allclose(results["evi"], np.ones((2, 5)))
+
+if __name__ == '__main__':
+    unittest.main()
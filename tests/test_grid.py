@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from xml.etree import ElementTree
+from wdc.DCO import AxisSubset, DCO
+from wdc.DBC import DBC
+from wdc.grid import GridTranslator
+
+DESCRIPTION = {
+    "axis_labels": ["ansi", "Lat", "Long"],
+    "dimension": 3,
+    "low_limits": ["0", "0", "0"],
+    "high_limits": ["3", "1799", "3599"],
+    "origin": ['"2015-01-01T00:00:00.000Z"', "89.95", "-179.95"],
+    "offset_vectors": [["1", "0", "0"], ["0", "-0.1", "0"], ["0", "0", "0.1"]],
+    # Irregular monthly time axis
+    "coefficients": {"ansi": ['"2015-01-01T00:00:00.000Z"', '"2015-02-01T00:00:00.000Z"',
+                              '"2015-03-01T00:00:00.000Z"', '"2015-04-01T00:00:00.000Z"']},
+}
+
+class TestGridTranslator(unittest.TestCase):
+    def setUp(self):
+        # Create a MagicMock to simulate database behavior
+        self.mock_dbc = MagicMock()
+        self.mock_dbc.describe_coverage.return_value = DESCRIPTION
+        self.translator = GridTranslator(self.mock_dbc)
+
+    def query(self, *axis_subsets):
+        dco = DCO(self.mock_dbc).select("$c", ["AvgLandTemp"]).subset("$c", list(axis_subsets))
+        return dco.set_format("image/png").snap_to_grid(translator=self.translator).build_query()
+
+    def test_equivalent_subsets_give_identical_queries(self):
+        first = self.query(AxisSubset('ansi', '2015-03'), AxisSubset('Lat', 54.08), AxisSubset('Long', 8.80))
+        second = self.query(AxisSubset('ansi', '2015-03-12'), AxisSubset('Lat', 54.03), AxisSubset('Long', 8.84))
+        self.assertEqual(first, second)
+        self.assertIn('$c[ansi:"CRS:1"(2), Lat:"CRS:1"(359), Long:"CRS:1"(1888)]', first)
+        # The georeferencing is requested once and then reused
+        self.mock_dbc.describe_coverage.assert_called_once()
+
+    def test_irregular_time_trim(self):
+        subsets = self.translator.translate("AvgLandTemp", [AxisSubset('ansi', '2015-01-15', '2015-04')])
+        self.assertEqual(subsets[0].query, 'ansi:"CRS:1"(1:3)')
+
+    def test_coordinate_mode(self):
+        subsets = self.translator.translate("AvgLandTemp", [AxisSubset('ansi', '2015-02-20'),
+                                                            AxisSubset('Long', -30.02, 55)], mode="coordinate")
+        self.assertEqual(subsets[0].query, 'ansi("2015-02-01T00:00:00.000Z")')
+        self.assertEqual(subsets[1].query, 'Long(-30.05:55.05)')
+
+    def test_values_outside_the_axis(self):
+        # Slices outside of the axis are refused instead of moved to the nearest cell
+        with self.assertRaises(ValueError):
+            self.translator.translate("AvgLandTemp", [AxisSubset('Lat', 95)])
+        with self.assertRaises(ValueError):
+            self.translator.translate("AvgLandTemp", [AxisSubset('ansi', '2014-12')])
+        # Only the ends of trims are clamped
+        subsets = self.translator.translate("AvgLandTemp", [AxisSubset('Lat', 80, 95), AxisSubset('ansi', '2014-06', '2015-02')])
+        self.assertEqual([subset.query for subset in subsets], ['Lat:"CRS:1"(0:100)', 'ansi:"CRS:1"(0:1)'])
+        with self.assertRaises(ValueError):
+            self.translator.translate("AvgLandTemp", [AxisSubset('Long', 190, 200)])
+
+    def test_temporal_reduction_keeps_dates(self):
+        dco = DCO(self.mock_dbc).select("$c", ["AvgLandTemp"]).group_by_time("year")
+        dco.subset("$c", [AxisSubset('ansi', '2015-01', '2015-04'), AxisSubset('Lat', 54.08), AxisSubset('Long', 8.80)])
+        query = dco.snap_to_grid(translator=self.translator).build_query()
+        self.assertIn('Lat:"CRS:1"(359)', query)
+        self.assertIn('imageCrsDomain($c[ansi("2015-01":"2015-01")], ansi).lo', query)
+        # A time axis already snapped to grid indices cannot be reduced
+        snapped = DCO(self.mock_dbc).select("$c", ["AvgLandTemp"])
+        snapped.subset("$c", [AxisSubset('ansi', '2015-01', '2015-04')]).snap_to_grid(translator=self.translator)
+        with self.assertRaises(ValueError):
+            snapped.rolling_window(2)
+
+    def test_axes_without_georeferencing_are_kept(self):
+        subsets = self.translator.translate("AvgLandTemp", [AxisSubset('E', 670000, 730000)])
+        self.assertEqual(subsets[0].query, 'E(670000:730000)')
+
+    @patch("wdc.DBC.WebCoverageService")
+    def test_describe_coverage_coefficients(self, mock_wcs):
+        description = ElementTree.fromstring(
+            '<d xmlns:rgrid="http://www.opengis.net/gml/3.3/rgrid">'
+            '<rgrid:GeneralGridAxis><rgrid:coefficients>"2015-01-01" "2015-02-01"</rgrid:coefficients>'
+            '<rgrid:gridAxesSpanned>ansi</rgrid:gridAxesSpanned></rgrid:GeneralGridAxis>'
+            '<rgrid:GeneralGridAxis><rgrid:coefficients/>'
+            '<rgrid:gridAxesSpanned>Lat</rgrid:gridAxesSpanned></rgrid:GeneralGridAxis></d>')
+        coverage = MagicMock(descCov=description)
+        mock_wcs.return_value.contents = {"AvgLandTemp": coverage}
+        result = DBC("https://example.org/rasdaman/ows").describe_coverage("AvgLandTemp")
+        self.assertEqual(result["coefficients"], {"ansi": ['"2015-01-01"', '"2015-02-01"']})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+from unittest.mock import patch
+from benchmarks.import_time import HEAVY_MODULES, imported_modules, run_python
+
+class TestImportTime(unittest.TestCase):
+    def test_heavy_modules_not_imported(self):
+        # Importing the package must not load owslib, NumPy or PIL
+        for module in ("DBC", "DCO"):
+            loaded = imported_modules(module)
+            self.assertEqual([name for name in HEAVY_MODULES if name in loaded], [], module)
+
+    def test_numpy_loaded_on_first_use(self):
+        output = run_python("import sys\nimport decoders\nprint('numpy' in sys.modules)\n"
+                            "print(decoders.decode(b'{1,2}', 'text/csv').sum())\nprint('numpy' in sys.modules)")
+        self.assertEqual(output.split(), ["False", "3.0", "True"])
+
+    @patch("wdc.DBC.WebCoverageService")
+    def test_wcs_client_created_when_needed(self, mock_wcs):
+        from wdc.DBC import DBC
+        dbc = DBC("https://example.org/rasdaman/ows")
+        # Sending WCPS text does not request the capabilities of the server
+        mock_wcs.assert_not_called()
+        self.assertIs(dbc.wcs, dbc.wcs)
+        mock_wcs.assert_called_once_with("https://example.org/rasdaman/ows", version='2.0.1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from wdc.cli import main
+from wdc.journal import JobJournal, checksum
+from wdc.standin import StandInServer
+
+QUERY = 'for $c in (AvgLandTemp) return avg($c[ansi("{month}"), Lat(25:30), Long(0:5)])'
+
+class TestJobJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal = JobJournal(os.path.join(self.directory.name, "journal.sqlite"))
+        self.target = os.path.join(self.directory.name, "unit.txt")
+
+    def tearDown(self):
+        self.journal.close()
+        self.directory.cleanup()
+
+    def test_unit_life_cycle(self):
+        self.assertFalse(self.journal.completed(self.target, "q"))
+        self.journal.begin(self.target, "q")
+        self.journal.fail(self.target, "Error: 503")
+        self.assertEqual(self.journal.unit(self.target)["status"], "failed")
+        self.journal.begin(self.target, "q")
+        self.journal.write(self.target, b"42")
+        unit = self.journal.unit(self.target)
+        self.assertEqual((unit["status"], unit["attempts"], unit["bytes"]), ("done", 2, 2))
+        self.assertTrue(self.journal.completed(self.target, "q"))
+        # Another query for the same target is not done
+        self.assertFalse(self.journal.completed(self.target, "other"))
+        # A changed output is only caught when verifying
+        with open(self.target, "wb") as file:
+            file.write(b"43")
+        self.assertTrue(self.journal.completed(self.target, "q"))
+        self.assertFalse(self.journal.completed(self.target, "q", verify=True))
+        os.remove(self.target)
+        self.assertFalse(self.journal.completed(self.target, "q"))
+        self.assertEqual(self.journal.summary(), {"done": 1})
+
+    def test_crash_after_rename_recovered(self):
+        self.journal.begin(self.target, "q")
+        self.journal.write(self.target, b"42")
+        # The journal update after the rename was lost
+        with sqlite3.connect(self.journal.path) as connection:
+            connection.execute("UPDATE units SET status = 'writing' WHERE target = ?", (self.target,))
+        self.assertTrue(self.journal.completed(self.target, "q"))
+        self.assertEqual(self.journal.unit(self.target)["status"], "done")
+        self.assertEqual(self.journal.unit(self.target)["checksum"], checksum(b"42"))
+
+class TestResume(unittest.TestCase):
+    def test_rerun_skips_completed_units(self):
+        with tempfile.TemporaryDirectory() as directory, StandInServer() as server:
+            workload = os.path.join(directory, "months.jsonl")
+            with open(workload, "w") as file:
+                for month in range(1, 11):
+                    file.write(json.dumps({"id": f"m{month:02d}", "query": QUERY.format(month=f"2015-{month:02d}")}) + "\n")
+            output = os.path.join(directory, "out")
+            arguments = [workload, "--endpoint", server.url, "-o", output, "--progress", "0", "--retries", "0", "-j", "1"]
+
+            def run():
+                stdout = io.StringIO()
+                with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+                    code = main(arguments)
+                return code, json.loads(stdout.getvalue().splitlines()[-1])
+
+            # The server fails one unit of the first run
+            server.fail_next(1, 503)
+            code, summary = run()
+            self.assertEqual((code, summary["failed"]), (1, 1))
+            sent = server.requests
+
+            code, summary = run()
+            self.assertEqual((code, summary["skipped"], summary["failed"]), (0, 9, 0))
+            # Only the failed unit was fetched again
+            self.assertEqual(server.requests - sent, 1)
+            with JobJournal(os.path.join(output, "journal.sqlite")) as journal:
+                self.assertEqual(journal.summary(), {"done": 10})
+            self.assertEqual(len([name for name in os.listdir(output) if name.endswith(".txt")]), 10)
+
+if __name__ == '__main__':
+    unittest.main()
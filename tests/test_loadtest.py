@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from wdc.DBC import DBC
+from wdc.standin import StandInServer
+from benchmarks.loadtest import LoadGenerator, LoadReport, Sample, load_workload, percentile
+
+QUERY = 'for $c in (AvgLandTemp) return avg($c[ansi("2015-05"), Lat(25:30), Long(0:5)])'
+
+class TestLoadReport(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summary_and_timeline(self):
+        samples = [Sample("a", 0.0, 0.0, 0.1, True, 10), Sample("b", 0.5, 0.5, 1.2, True, 20),
+                   Sample("a", 1.0, 1.0, 1.5, False, 0)]
+        report = LoadReport(samples, 2.0, "closed")
+        summary = report.summary()
+        self.assertEqual(summary["errors"], 1)
+        self.assertEqual(summary["bytes"], 30)
+        self.assertEqual(summary["throughput_per_s"], 1.0)
+        self.assertEqual(summary["latency"]["max_ms"], 700)
+        self.assertEqual(set(summary["labels"]), {"a", "b"})
+        timeline = report.timeline(1.0)
+        self.assertEqual([bucket["requests"] for bucket in timeline], [1, 2, 0])
+        self.assertEqual(timeline[1]["errors"], 1)
+
+    def test_load_workload(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "workload.jsonl")
+            with open(path, "w") as file:
+                file.write(json.dumps({"query": QUERY, "label": "avg"}) + "\n\n")
+                file.write(json.dumps({"request_id": "not a query"}) + "\n")
+            self.assertEqual(load_workload(path), [{"query": QUERY, "label": "avg"}])
+
+class TestLoadGenerator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.error_rate = 0
+        self.generator = LoadGenerator(DBC(self.server.url), [{"query": QUERY}])
+
+    def test_closed_loop(self):
+        report = self.generator.closed_loop(concurrency=3, requests=12)
+        summary = report.summary()
+        self.assertEqual(summary["requests"], 12)
+        self.assertEqual(summary["errors"], 0)
+        self.assertGreater(summary["bytes"], 0)
+
+    def test_open_loop_rate(self):
+        started = time.monotonic()
+        report = self.generator.open_loop(rate=50, requests=10)
+        # Ten queries 20 ms apart
+        self.assertGreaterEqual(time.monotonic() - started, 0.18)
+        self.assertEqual([round(sample.scheduled, 2) for sample in report.samples][:3], [0.0, 0.02, 0.04])
+        poisson = self.generator.open_loop(rate=100, duration=0.2, arrival="poisson", seed=1)
+        self.assertEqual(poisson.summary()["mode"], "open-poisson")
+        self.assertGreater(len(poisson.samples), 0)
+
+    def test_errors_counted(self):
+        self.server.error_rate = 1
+        summary = self.generator.closed_loop(concurrency=2, requests=4).summary()
+        self.assertEqual(summary["error_rate"], 1.0)
+        self.assertIsNone(summary["latency"]["p50_ms"])
+
+if __name__ == '__main__':
+    unittest.main()
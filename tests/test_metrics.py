@@ -0,0 +1,98 @@
+import unittest
+import requests
+from wdc.DBC import DBC
+from wdc.metrics import MetricsRegistry
+from wdc.standin import StandInServer
+
+QUERY = 'for $c in (AvgLandTemp) return avg($c[ansi("2015-05"), Lat(25:30), Long(0:5)])'
+
+class TestRegistry(unittest.TestCase):
+    def test_snapshot_and_exposition(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs", ("state",))
+        counter.inc(state="done")
+        counter.inc(2, state="done")
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.05, 0.5, 2.0):
+            histogram.observe(value)
+        registry.gauge("ratio", "Ratio", function=lambda: 0.25)
+        snapshot = registry.snapshot()
+        self.assertEqual(snapshot["jobs_total"], {"state=done": 3})
+        self.assertEqual(snapshot["latency_seconds"]["count"], 4)
+        self.assertAlmostEqual(snapshot["latency_seconds"]["p50"], 0.1)
+        self.assertEqual(snapshot["ratio"], 0.25)
+        text = registry.exposition()
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', text)
+        self.assertIn('jobs_total{state="done"} 3', text)
+        # Registering again returns the same metric, other labels are refused
+        self.assertIs(registry.counter("jobs_total", "Jobs", ("state",)), counter)
+        with self.assertRaises(ValueError):
+            registry.counter("jobs_total", "Jobs")
+        with self.assertRaises(ValueError):
+            counter.inc(kind="x")
+
+class TestClientMetrics(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_connector_metrics(self):
+        dbc = DBC(self.server.url)
+        metrics = dbc.enable_metrics()
+        dbc.enable_cache()
+        dbc.enable_scheduler(max_concurrency=4)
+        result = dbc.execute_query(QUERY)
+        dbc.execute_query(QUERY)
+        self.assertIsNone(dbc.execute_query("not a query"))
+        dbc.get_subset_coverage("AvgLandTemp", ['ansi("2015-05")', "Lat(25,26)", "Long(0,1)"], "text/csv")
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["wdc_requests_total"], {"operation=execute,outcome=error": 1,
+                                                          "operation=execute,outcome=ok": 2,
+                                                          "operation=get_subset_coverage,outcome=ok": 1})
+        self.assertEqual(snapshot["wdc_request_duration_seconds"]["operation=execute"]["count"], 3)
+        self.assertEqual(snapshot["wdc_requests_in_flight"], {"operation=execute": 0, "operation=get_subset_coverage": 0})
+        self.assertEqual(snapshot["wdc_bytes_received_total"]["operation=execute"], 2 * len(result))
+        self.assertGreater(snapshot["wdc_bytes_sent_total"]["operation=execute"], 2 * len(QUERY))
+        self.assertAlmostEqual(snapshot["wdc_cache_hit_ratio"], 1 / 3)
+        self.assertEqual(snapshot["wdc_scheduler_utilization"], 0)
+        self.assertEqual(snapshot["wdc_scheduler_queued"], {"priority=batch": 0, "priority=interactive": 0})
+        self.assertGreater(snapshot["wdc_request_rate"], 0)
+
+    def test_shared_registry(self):
+        registry = MetricsRegistry()
+        first, second = DBC(self.server.url), DBC(self.server.url)
+        first.enable_metrics(registry)
+        second.enable_metrics(registry)
+        second.enable_cache()
+        for _ in range(3):
+            second.execute_query(QUERY)
+        first.execute_query(QUERY)
+        snapshot = registry.snapshot()
+        # Both connectors report to the same metrics
+        self.assertEqual(snapshot["wdc_requests_total"], {"operation=execute,outcome=ok": 4})
+        self.assertAlmostEqual(snapshot["wdc_cache_hit_ratio"], 2 / 3)
+        self.assertGreater(snapshot["wdc_request_rate"], 0)
+        # A function-backed metric cannot silently be read from another function
+        with self.assertRaises(ValueError):
+            registry.gauge("wdc_cache_bytes", "Size of the cached results", function=lambda: 0)
+
+    def test_prometheus_endpoint(self):
+        dbc = DBC(self.server.url)
+        with dbc.enable_metrics().serve() as endpoint:
+            dbc.execute_query(QUERY)
+            response = requests.get(endpoint.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["Content-Type"].startswith("text/plain"))
+        self.assertIn('wdc_request_duration_seconds_count{operation="execute"} 1', response.text)
+        # Metrics without values yet, like the cache hit ratio, are left out
+        self.assertNotIn("\nwdc_cache_hit_ratio ", response.text)
+
+if __name__ == '__main__':
+    unittest.main()
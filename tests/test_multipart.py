@@ -0,0 +1,58 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from wdc.DCO import AxisSubset, DCO
+from wdc.DBC import DBC
+from wdc.multipart import get_boundary, iter_parts
+
+BODY = (b"preamble\r\n--b0undary\r\nContent-Type: text/csv\r\nContent-ID: <A>\r\n\r\n1,2,3"
+        b"\r\n--b0undary\r\nContent-Type: text/csv\r\n\r\n4,5\r\n6"
+        b"\r\n--b0undary--\r\n")
+
+class TestMultipart(unittest.TestCase):
+    def test_get_boundary(self):
+        self.assertEqual(get_boundary('multipart/related; boundary="b0undary"; type=text/csv'), "b0undary")
+        self.assertIsNone(get_boundary("text/csv"))
+
+    def test_parts_across_chunk_borders(self):
+        # Feed the body a few bytes at a time to cross every delimiter
+        chunks = [BODY[i:i + 3] for i in range(0, len(BODY), 3)]
+        parts = list(iter_parts(chunks, "b0undary"))
+        self.assertEqual([payload for _, payload in parts], [b"1,2,3", b"4,5\r\n6"])
+        self.assertEqual(parts[0][0]["content-id"], "<A>")
+
+    def test_large_part_in_small_chunks(self):
+        # A 32 MB part received in 64 KiB chunks must not be copied for every chunk
+        payload = bytes(range(256)) * (32 * 4096)
+        body = b"--b0undary\r\nContent-ID: <A>\r\n\r\n" + payload + b"\r\n--b0undary--\r\n"
+        chunks = (body[i:i + 65536] for i in range(0, len(body), 65536))
+        start = time.perf_counter()
+        parts = list(iter_parts(chunks, "b0undary"))
+        self.assertEqual(len(parts), 1)
+        self.assertEqual(parts[0][1], payload)
+        self.assertLess(time.perf_counter() - start, 2)
+
+    @patch("wdc.DBC.requests.post")
+    @patch("wdc.DBC.WebCoverageService")
+    def test_execute_query_parts(self, mock_wcs, mock_post):
+        response = MagicMock(status_code=200, headers={"Content-Type": "multipart/related; boundary=b0undary"})
+        response.iter_content.return_value = iter([BODY])
+        mock_post.return_value = response
+        dbc = DBC("https://example.org/rasdaman/ows")
+
+        parts = list(dbc.execute_query_parts("for $c in (A, B) return 1", ["A", "B"]))
+        self.assertEqual(parts, [("A", b"1,2,3"), ("B", b"4,5\r\n6")])
+        self.assertTrue(mock_post.call_args[1]["stream"])
+
+    def test_execute_each_single_request(self):
+        mock_dbc = MagicMock()
+        mock_dbc.execute_query_parts.return_value = iter([("A", b"1"), ("B", b"2")])
+        dco = DCO(mock_dbc)
+        dco.select("$c", ["A", "B"]).avg().subset("$c", [AxisSubset("ansi", "2015-05")])
+        self.assertEqual(list(dco.execute_each()), [("A", b"1"), ("B", b"2")])
+        query, coverage_ids = mock_dbc.execute_query_parts.call_args[0]
+        self.assertTrue(query.startswith("for $c in (A, B)"))
+        self.assertEqual(coverage_ids, ["A", "B"])
+
+if __name__ == '__main__':
+    unittest.main()
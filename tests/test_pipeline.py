@@ -0,0 +1,76 @@
+import importlib.util
+import unittest
+import numpy as np
+from wdc.DBC import DBC
+from wdc.decoders import decode
+from wdc.pipeline import DecodePipeline
+from wdc.standin import StandInServer
+
+QUERY = 'for $c in (AvgLandTemp) return encode($c[ansi("2015-{month:02d}"), Lat(20:40), Long(0:20)], "{format}")'
+
+class TestDecodePipeline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer().start()
+        cls.dbc = DBC(cls.server.url)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def queries(self, format: str, months: int = 6) -> list:
+        return [QUERY.format(month=month, format=format) for month in range(1, months + 1)]
+
+    def test_decoded_like_decode(self):
+        for format in ("text/csv", "application/json"):
+            queries = self.queries(format)
+            # No result is small enough to be decoded inline, all go through the processes
+            pipeline = DecodePipeline(self.dbc, format, fetchers=3, decoders=2, inline_bytes=0)
+            results = list(pipeline.run(queries, ordered=True))
+            self.assertEqual([result.index for result in results], list(range(len(queries))))
+            for result in results:
+                self.assertIsNone(result.error)
+                np.testing.assert_array_equal(result.value, decode(self.dbc.execute_query(result.query), format))
+            self.assertEqual(pipeline.buffered, 0)
+
+    def test_unordered_and_inline(self):
+        queries = self.queries("text/csv")
+        pipeline = DecodePipeline(self.dbc, "text/csv", fetchers=4, decoders=2, inline_bytes=1 << 30)
+        results = list(pipeline.run(iter(queries)))
+        self.assertEqual(sorted(result.index for result in results), list(range(len(queries))))
+        self.assertTrue(all(result.value.shape == (41, 41) for result in results))
+
+    def test_failures_reported(self):
+        queries = self.queries("text/csv", 2) + ["not a query"]
+        # The result cannot be decoded as JSON
+        queries.append(QUERY.format(month=3, format="text/csv").replace("AvgLandTemp", "AverageChloroColor")
+                       .replace('ansi("2015-03"), ', ""))
+        results = list(DecodePipeline(self.dbc, "application/json", decoders=1, inline_bytes=0).run(queries, True))
+        self.assertEqual(results[2].error, "query failed")
+        self.assertTrue(all(result.error is not None and result.value is None for result in results))
+
+    def test_buffered_bytes_bounded(self):
+        queries = self.queries("text/csv", 12)
+        size = max(len(self.dbc.execute_query(query)) for query in queries)
+        pipeline = DecodePipeline(self.dbc, "text/csv", fetchers=8, decoders=1, max_buffered_bytes=2 * size,
+                                  inline_bytes=0)
+        self.assertEqual(len(list(pipeline.run(queries))), 12)
+        # A download in flight may cross the bound, at most one per fetcher
+        self.assertLessEqual(pipeline.max_buffered, 2 * size + 8 * size)
+        self.assertEqual(pipeline.buffered, 0)
+
+    @unittest.skipIf(importlib.util.find_spec("PIL") is None, "Pillow is not installed")
+    def test_png(self):
+        query = 'for $c in (AverageChloroColor) return encode($c[Lat(20:40), Long(0:20)], "image/png")'
+        results = list(DecodePipeline(self.dbc, "image/png", decoders=1, inline_bytes=0).run([query]))
+        self.assertIsNone(results[0].error)
+        self.assertEqual(results[0].value.shape[:2], (41, 41))
+
+    @unittest.skipIf(importlib.util.find_spec("netCDF4") is None, "netCDF4 is not installed")
+    def test_netcdf(self):
+        query = QUERY.format(month=1, format="application/netcdf")
+        results = list(DecodePipeline(self.dbc, "application/netcdf", decoders=1, inline_bytes=0).run([query]))
+        self.assertIsNone(results[0].error)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import MagicMock
+from wdc.DCO import AxisSubset, DCO
+from wdc.planner import QueryPlanner
+
+DESCRIPTION = {
+    "axis_labels": ["ansi", "Lat", "Long"],
+    "dimension": 3,
+    "low_limits": ["0", "0", "0"],
+    "high_limits": ["191", "1799", "3599"],
+    "origin": ['"2000-02-01T00:00:00.000Z"', "89.95", "-179.95"],
+    "offset_vectors": [["30", "0", "0"], ["0", "-0.1", "0"], ["0", "0", "0.1"]],
+}
+
+class TestQueryPlanner(unittest.TestCase):
+    def setUp(self):
+        # Create a MagicMock to simulate database behavior
+        self.mock_dbc = MagicMock()
+        self.mock_dbc.describe_coverage.return_value = DESCRIPTION
+        self.dco = DCO(self.mock_dbc)
+        self.dco.select("$c", ["AvgLandTemp"]).subset("$c", [AxisSubset('ansi', '2015-05'),
+                                                            AxisSubset('Lat', 25, 90),
+                                                            AxisSubset('Long', -30, 55)])
+
+    def test_estimate_from_description(self):
+        estimate = QueryPlanner(self.mock_dbc).plan("AvgLandTemp", self.dco._DCO__axis_subsets, "image/png")
+        # Both ends of a trim select the cell they fall in
+        self.assertEqual([(axis.low, axis.high) for axis in estimate.axes[1:]], [(0, 650), (1500, 2350)])
+        self.assertTrue(estimate.axes[0].sliced)
+        self.assertEqual(estimate.cells, 651 * 851)
+        self.assertEqual(estimate.bytes, 651 * 851)
+
+    def test_explain_without_executing(self):
+        explanation = self.dco.set_format("image/png").explain()
+        self.assertEqual(explanation["shape"], {"Lat": 651, "Long": 851})
+        self.assertTrue(explanation["within_budget"])
+        self.assertIn('return encode($c[ansi("2015-05"), Lat(25:90), Long(-30:55)], "image/png")', explanation["query"])
+        self.mock_dbc.execute_query.assert_not_called()
+        # Coverage descriptions are requested once
+        self.dco.explain()
+        self.mock_dbc.describe_coverage.assert_called_once()
+
+    def test_budget_refuses_query(self):
+        self.dco.set_format("application/json").set_budget(max_bytes=1000000)
+        with self.assertRaises(ValueError):
+            self.dco.execute()
+        self.mock_dbc.execute_query.assert_not_called()
+
+    def test_budget_splits_query(self):
+        self.dco.set_format("image/png").set_budget(max_cells=200000, split=True)
+        results = self.dco.execute()
+        queries = [call[0][0] for call in self.mock_dbc.execute_query.call_args_list]
+        self.assertEqual(len(results), len(queries))
+        self.assertGreater(len(queries), 1)
+        # Every result tells the grid range it covers
+        self.assertEqual(results[0].tile, {"Lat": (0, 325), "Long": (1500, 1925)})
+        self.assertEqual(sum((tile["Lat"][1] - tile["Lat"][0] + 1) * (tile["Long"][1] - tile["Long"][0] + 1)
+                             for tile, _ in results), 651 * 851)
+        # Tiles keep the time slice and cover the range in grid coordinates
+        self.assertIn('$c[ansi("2015-05"), Lat:"CRS:1"(0:325), Long:"CRS:1"(1500:', queries[0])
+        # The original subset is restored after splitting
+        self.assertEqual(self.dco._DCO__subset_query, '$c[ansi("2015-05"), Lat(25:90), Long(-30:55)]')
+
+    def test_aggregates_are_not_split(self):
+        self.dco.count().set_budget(max_cells=1000, split=True)
+        with self.assertRaises(ValueError):
+            self.dco.execute()
+        # A condensed result is small even when many cells are scanned
+        self.assertEqual(self.dco.explain()["bytes"], 32)
+
+if __name__ == '__main__':
+    unittest.main()
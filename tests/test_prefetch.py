@@ -0,0 +1,117 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from wdc.DCO import AxisSubset, DCO
+from wdc.DBC import DBC
+from wdc.cache import ResultCache
+from wdc.prefetch import Prefetcher
+
+def respond(url, data=None, verify=True):
+    # Answer every query with its own text so results can be told apart
+    return MagicMock(status_code=200, content=data["query"].encode())
+
+class TestResultCache(unittest.TestCase):
+    def test_lru_eviction_by_bytes(self):
+        cache = ResultCache(max_entries=10, max_bytes=10)
+        cache.put("a", b"12345")
+        cache.put("b", b"12345")
+        cache.get("a")
+        cache.put("c", b"12345")
+        # "b" is the least recently used result
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.size, 10)
+
+    def test_concurrent_loads_are_collapsed(self):
+        cache = ResultCache()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.05)
+            return b"result"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("q", loader)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [b"result"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual((cache.hits, cache.misses), (4, 1))
+
+class TestPrefetcher(unittest.TestCase):
+    @patch("wdc.DBC.WebCoverageService")
+    def setUp(self, mock_wcs):
+        self.patcher = patch("wdc.DBC.requests.post", side_effect=respond)
+        self.mock_post = self.patcher.start()
+        self.dbc = DBC("https://example.org/rasdaman/ows")
+        self.prefetcher = Prefetcher(self.dbc, depth=2)
+        self.dco = DCO(self.dbc).select("$c", ["AvgLandTemp"]).set_format("text/csv").enable_prefetch(self.prefetcher)
+
+    def tearDown(self):
+        self.prefetcher.close()
+        self.patcher.stop()
+
+    def run_months(self, months):
+        for month in months:
+            self.dco.subset("$c", [AxisSubset("ansi", month), AxisSubset("Lat", 40, 50)]).execute()
+        # Wait for the background fetches
+        self.prefetcher.wait()
+
+    def sent_queries(self):
+        return [call[1]["data"]["query"] for call in self.mock_post.call_args_list]
+
+    def test_monthly_stepping(self):
+        self.run_months(["2015-11", "2015-12", "2016-01"])
+        # The next two months are fetched ahead, across the year boundary
+        self.assertEqual(self.prefetcher.prefetched, 2)
+        self.assertTrue(any('ansi("2016-02")' in query for query in self.sent_queries()))
+        self.assertTrue(any('ansi("2016-03")' in query for query in self.sent_queries()))
+
+        # The predicted month is served from the cache
+        sent = len(self.sent_queries())
+        result = self.dco.subset("$c", [AxisSubset("ansi", "2016-02"), AxisSubset("Lat", 40, 50)]).execute()
+        self.assertIn(b'ansi("2016-02")', result)
+        self.assertEqual(len(self.sent_queries()), sent)
+
+    def test_spatial_panning(self):
+        for low in (0, 10, 20):
+            self.dco.subset("$c", [AxisSubset("ansi", "2015-05"), AxisSubset("Long", low, low + 10)]).execute()
+        self.prefetcher.wait()
+        self.assertTrue(any("Long(30:40)" in query for query in self.sent_queries()))
+        self.assertTrue(any("Long(40:50)" in query for query in self.sent_queries()))
+
+    def test_no_pattern(self):
+        self.run_months(["2015-01", "2015-03", "2015-04"])
+        self.assertEqual(self.prefetcher.prefetched, 0)
+        self.assertEqual(len(self.sent_queries()), 3)
+
+    def test_pattern_break_cancels_queued_fetches(self):
+        mock_dbc = MagicMock()
+        started, release = threading.Event(), threading.Event()
+
+        def slow_query(query):
+            started.set()
+            release.wait(5)
+            return b""
+
+        mock_dbc.execute_query.side_effect = slow_query
+        mock_dbc.cache = ResultCache()
+        prefetcher = Prefetcher(mock_dbc, depth=3, workers=1)
+        build = lambda subsets: ", ".join(str(axis_subset.query) for axis_subset in subsets)
+        for low in (0, 1, 2):
+            prefetcher.observe("key", [AxisSubset("Lat", low, low + 1)], build)
+        started.wait(5)
+        # The last two predictions are still queued behind the first one
+        prefetcher.observe("key", [AxisSubset("Lat", 50, 51)], build)
+        self.assertEqual(prefetcher.cancelled, 2)
+        release.set()
+        prefetcher.close()
+        self.assertEqual(mock_dbc.execute_query.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from wdc.pyramid import SummaryPyramid, coverage_fetcher
+
+class TestSummaryPyramid(unittest.TestCase):
+    def setUp(self):
+        random = np.random.default_rng(0)
+        # Two time steps of a 100 x 130 coverage with a few nodata cells
+        self.data = {key: random.normal(15, 5, (100, 130)) for key in ("2015-04", "2015-05")}
+        self.data["2015-05"][3:9, 40:50] = 99999
+        self.fetched_cells = 0
+        self.fetches = 0
+
+    def fetch(self, time_key, rows, columns):
+        self.fetches += 1
+        self.fetched_cells += (rows[1] - rows[0]) * (columns[1] - columns[0])
+        return self.data[time_key][rows[0]:rows[1], columns[0]:columns[1]]
+
+    def expected(self, rows, columns):
+        values = np.concatenate([self.data[key][rows[0]:rows[1], columns[0]:columns[1]].ravel()
+                                 for key in self.data])
+        return values[values != 99999]
+
+    def test_matches_exact_aggregates(self):
+        pyramid = SummaryPyramid((100, 130), tile_size=(8, 8), levels=3, nodata=99999)
+        for key, values in self.data.items():
+            pyramid.add(key, values)
+        rows, columns = (5, 93), (11, 127)
+        values = self.expected(rows, columns)
+        self.assertAlmostEqual(pyramid.aggregate("sum", list(self.data), rows, columns, self.fetch), values.sum())
+        self.assertAlmostEqual(pyramid.aggregate("avg", list(self.data), rows, columns, self.fetch), values.mean())
+        self.assertEqual(pyramid.aggregate("min", list(self.data), rows, columns, self.fetch), values.min())
+        self.assertEqual(pyramid.aggregate("max", list(self.data), rows, columns, self.fetch), values.max())
+        self.assertEqual(pyramid.aggregate("count", list(self.data), rows, columns, self.fetch), values.size)
+
+    def test_only_edges_are_fetched(self):
+        pyramid = SummaryPyramid((100, 130), tile_size=(8, 8), levels=3)
+        pyramid.add("2015-04", self.data["2015-04"])
+        pyramid.summarize(["2015-04"], (5, 93), (11, 127), self.fetch)
+        # Only cells of the partial edge tiles are fetched, far less than the whole range
+        self.assertLess(self.fetched_cells, 88 * 116 // 3)
+        self.assertGreater(self.fetched_cells, 0)
+        # The edge tiles are fetched as four perimeter strips
+        self.assertEqual(self.fetches, 4)
+
+    def test_round_trips_on_empty_pyramid(self):
+        pyramid = SummaryPyramid((100, 130), tile_size=(8, 8), levels=3, nodata=99999)
+        rows, columns = (5, 93), (11, 127)
+        total = pyramid.aggregate("sum", list(self.data), rows, columns, self.fetch)
+        self.assertAlmostEqual(total, self.expected(rows, columns).sum())
+        # Four strips and one interior block per time step
+        self.assertEqual(self.fetches, 5 * len(self.data))
+        self.assertEqual(self.fetched_cells, 88 * 116 * len(self.data))
+        # The interior is indexed, later queries only fetch the strips
+        pyramid.aggregate("sum", list(self.data), rows, columns, self.fetch)
+        self.assertEqual(self.fetches, 9 * len(self.data))
+
+    def test_built_incrementally_from_fetches(self):
+        pyramid = SummaryPyramid((100, 130), tile_size=(8, 8), levels=2)
+        rows, columns = (0, 64), (0, 64)
+        first = pyramid.aggregate("sum", ["2015-04"], rows, columns, self.fetch)
+        fetched = self.fetched_cells
+        # The complete tiles fetched by the first query are indexed for the second one
+        second = pyramid.aggregate("sum", ["2015-04"], rows, columns, self.fetch)
+        self.assertEqual(fetched, 64 * 64)
+        self.assertEqual(self.fetched_cells, fetched)
+        self.assertAlmostEqual(first, second)
+
+    def test_requires_fetch_for_unindexed_range(self):
+        pyramid = SummaryPyramid((100, 130))
+        with self.assertRaises(ValueError):
+            pyramid.summarize(["2015-04"], (0, 10), (0, 10))
+
+    def test_coverage_fetcher_query(self):
+        mock_dbc = MagicMock()
+        mock_dbc.execute_query.return_value = b"[[1, 2, 3], [4, 5, 6]]"
+        fetch = coverage_fetcher(mock_dbc, "AvgLandTemp", "ansi", "Lat", "Long")
+        block = fetch("2015-05", (10, 12), (20, 23))
+        query = mock_dbc.execute_query.call_args[0][0]
+        self.assertIn('$c[ansi("2015-05"), Lat:"CRS:1"(10:11), Long:"CRS:1"(20:22)]', query)
+        self.assertEqual(block.shape, (2, 3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import struct
+import zlib
+from unittest.mock import MagicMock
+import numpy as np
+from wdc.DCO import AxisSubset, DCO
+from wdc.render import Layer, Style, encode_png
+
+class TestRender(unittest.TestCase):
+    def setUp(self):
+        # Same classes as the switch/case colormap of main.py
+        self.style = Style(breaks=[18, 23, 30],
+                           colors=[(0, 0, 255), (255, 255, 0), (255, 140, 0), (255, 255, 255)],
+                           nodata=99999, nodata_color=(0, 0, 0, 0))
+
+    def test_classification(self):
+        pixels = self.style.apply(np.array([[10, 18, 25], [35, 99999, np.nan]]))
+        self.assertEqual(pixels.shape, (2, 3, 4))
+        self.assertEqual(tuple(pixels[0, 0]), (0, 0, 255, 255))
+        # A value equal to a break belongs to the next class, as with "18 > $c"
+        self.assertEqual(tuple(pixels[0, 1]), (255, 255, 0, 255))
+        self.assertEqual(tuple(pixels[0, 2]), (255, 140, 0, 255))
+        self.assertEqual(tuple(pixels[1, 0]), (255, 255, 255, 255))
+        # Nodata values and NaN are masked
+        self.assertEqual(tuple(pixels[1, 1]), (0, 0, 0, 0))
+        self.assertEqual(tuple(pixels[1, 2]), (0, 0, 0, 0))
+
+    def test_linear_style(self):
+        style = Style.linear(0, 10, [(0, 0, 0), (255, 255, 255)])
+        pixels = style.apply(np.array([[-5, 10, 20]]))
+        self.assertEqual(tuple(pixels[0, 0]), (0, 0, 0, 255))
+        self.assertEqual(tuple(pixels[0, 1]), (255, 255, 255, 255))
+        self.assertEqual(tuple(pixels[0, 2]), (255, 255, 255, 255))
+
+    def test_encode_png(self):
+        pixels = np.arange(2 * 3 * 4, dtype=np.uint8).reshape(2, 3, 4)
+        png = encode_png(pixels)
+        self.assertTrue(png.startswith(b"\x89PNG\r\n\x1a\n"))
+        width, height = struct.unpack(">II", png[16:24])
+        self.assertEqual((width, height), (3, 2))
+        # The image data decompresses to one filter byte followed by each row
+        idat_length = struct.unpack(">I", png[33:37])[0]
+        raw = zlib.decompress(png[41:41 + idat_length])
+        self.assertEqual(raw, b"\x00" + pixels[0].tobytes() + b"\x00" + pixels[1].tobytes())
+
+    def test_fetch_layer_once_and_restyle(self):
+        mock_dbc = MagicMock()
+        mock_dbc.execute_query.return_value = b"[[10, 20], [25, 99999]]"
+        dco = DCO(mock_dbc)
+        dco.select("$c", ["AvgLandTemp"]).subset("$c", [AxisSubset('ansi', '2015-05')]).set_format("image/png")
+        layer = dco.fetch_layer()
+
+        query = mock_dbc.execute_query.call_args[0][0]
+        self.assertIn('return encode($c[ansi("2015-05")], "application/json")', query)
+        # Restyling the cached layer does not query the server again
+        layer.to_png(self.style)
+        layer.to_png(Style.linear(0, 30, [(0, 0, 255), (255, 0, 0)], nodata=99999))
+        mock_dbc.execute_query.assert_called_once()
+        # The format set by the caller is kept for later queries
+        self.assertIn('"image/png")', dco.build_query())
+
+    def test_layer_must_be_2d(self):
+        with self.assertRaises(ValueError):
+            Layer(np.zeros(3))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from wdc.DCO import AxisSubset, DCO
+from wdc.DBC import DBC
+
+class TestScaling(unittest.TestCase):
+    def setUp(self):
+        # Create a MagicMock to simulate database behavior
+        self.mock_dbc = MagicMock()
+        self.dco = DCO(self.mock_dbc)
+        self.dco.select("$c", ["AvgLandTemp"]).subset("$c", [AxisSubset('ansi', '2015-05')]).set_format("image/png")
+
+    def test_scale_factor(self):
+        self.dco.scale(factor=0.25).execute()
+        query = self.mock_dbc.execute_query.call_args[0][0]
+        self.assertIn('return encode(scale($c[ansi("2015-05")], 0.25), "image/png")', query)
+
+    def test_scale_size(self):
+        self.dco.scale(size={"Lat": 180, "Long": 360}).execute()
+        query = self.mock_dbc.execute_query.call_args[0][0]
+        self.assertIn('scale($c[ansi("2015-05")], {Lat:"CRS:1"(0:179), Long:"CRS:1"(0:359)})', query)
+
+    def test_scale_needs_one_option(self):
+        with self.assertRaises(ValueError):
+            self.dco.scale()
+        with self.assertRaises(ValueError):
+            self.dco.scale(factor=0.5, size={"Lat": 10})
+
+    def test_progressive_coarse_first(self):
+        results = list(self.dco.execute_progressive(factors=[0.1, 0.5]))
+        queries = [call[0][0] for call in self.mock_dbc.execute_query.call_args_list]
+        self.assertEqual(len(results), 3)
+        self.assertIn("0.1)", queries[0])
+        self.assertIn("0.5)", queries[1])
+        # The last result is at native resolution
+        self.assertIn('return encode($c[ansi("2015-05")], "image/png")', queries[2])
+
+    @patch("wdc.DBC.requests.get")
+    @patch("wdc.DBC.WebCoverageService")
+    def test_get_subset_coverage_scaling(self, mock_wcs, mock_get):
+        dbc = DBC("https://example.org/rasdaman/ows?SERVICE=WCS&VERSION=2.0.1")
+        dbc.get_subset_coverage("AvgLandTemp", ['ansi("2015-05")'], "image/png", scale_size={"Lat": 90, "Long": 180})
+        url = mock_get.call_args[0][0]
+        self.assertTrue(url.endswith("&FORMAT=image/png&SCALESIZE=Lat(90),Long(180)"))
+
+        list(dbc.get_subset_coverage_progressive("AvgLandTemp", [], scale_factors=[0.25]))
+        urls = [call[0][0] for call in mock_get.call_args_list[1:]]
+        self.assertIn("&SCALEFACTOR=0.25", urls[0])
+        self.assertNotIn("SCALEFACTOR", urls[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from wdc.DBC import DBC
+from wdc.scheduler import PriorityClass, PriorityScheduler
+
+class TestPriorityScheduler(unittest.TestCase):
+    def run_queued(self, scheduler, priorities):
+        # Hold the only slot, queue the given queries and release the slot
+        order, threads = [], []
+        scheduler.acquire("interactive")
+
+        def run(priority):
+            with scheduler.slot(priority):
+                order.append(priority)
+
+        for priority in priorities:
+            threads.append(threading.Thread(target=run, args=(priority,)))
+            threads[-1].start()
+            # Queue the queries in a known order
+            while sum(stats["queued"] for stats in scheduler.stats().values()) < len(threads):
+                time.sleep(0.001)
+        scheduler.release("interactive")
+        for thread in threads:
+            thread.join()
+        return order
+
+    def test_interactive_jumps_ahead_of_batch(self):
+        scheduler = PriorityScheduler(max_concurrency=1)
+        order = self.run_queued(scheduler, ["batch"] * 5 + ["interactive"])
+        # The interactive query waits for at most one batch query
+        self.assertIn(order.index("interactive"), (0, 1))
+
+    def test_weighted_fair_share(self):
+        scheduler = PriorityScheduler(max_concurrency=1, classes=[PriorityClass("interactive", weight=3),
+                                                                  PriorityClass("batch", weight=1)])
+        order = self.run_queued(scheduler, ["batch"] * 4 + ["interactive"] * 12)
+        # Batch work still progresses: one batch query per three interactive queries
+        self.assertEqual(order[:8].count("batch"), 2)
+        self.assertEqual(len(order), 16)
+
+    def test_class_concurrency_cap(self):
+        scheduler = PriorityScheduler(max_concurrency=4)
+        running, peak, lock = [0], [0], threading.Lock()
+
+        def run():
+            with scheduler.slot("batch"):
+                with lock:
+                    running[0] += 1
+                    peak[0] = max(peak[0], running[0])
+                time.sleep(0.01)
+                with lock:
+                    running[0] -= 1
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Batch queries use at most half of the slots
+        self.assertEqual(peak[0], 2)
+        stats = scheduler.stats()["batch"]
+        self.assertEqual(stats["completed"], 8)
+        self.assertGreater(stats["max_queued"], 0)
+        self.assertGreater(stats["wait_max"], 0)
+
+    def test_timeout(self):
+        scheduler = PriorityScheduler(max_concurrency=1)
+        scheduler.acquire()
+        with self.assertRaises(TimeoutError):
+            scheduler.acquire("batch", timeout=0.01)
+        self.assertEqual(scheduler.stats()["batch"]["queued"], 0)
+
+    def test_unknown_class(self):
+        with self.assertRaises(ValueError):
+            PriorityScheduler().acquire("nightly")
+
+    @patch("wdc.DBC.requests.post")
+    @patch("wdc.DBC.WebCoverageService")
+    def test_dbc_priority(self, mock_wcs, mock_post):
+        mock_post.return_value = MagicMock(status_code=200, content=b"1")
+        dbc = DBC("https://example.org/rasdaman/ows")
+        scheduler = dbc.enable_scheduler(max_concurrency=2)
+        with dbc.priority("batch"):
+            self.assertEqual(dbc.execute_query("for $c in (A) return 1"), b"1")
+        dbc.execute_query("for $c in (A) return 2")
+        stats = scheduler.stats()
+        self.assertEqual((stats["batch"]["completed"], stats["interactive"]["completed"]), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import MagicMock
+import json
+import numpy as np
+from wdc.DCO import AxisSubset, DCO, grid_tiles
+from wdc.sketch import KLLSketch
+
+class TestKLLSketch(unittest.TestCase):
+    def test_quantiles_within_error(self):
+        values = np.random.default_rng(1).normal(0, 1, 200000)
+        sketch = KLLSketch(k=200, seed=1).update(values)
+        estimated = sketch.quantiles([0.05, 0.5, 0.95])
+        # Compare the ranks of the estimates with the requested quantiles
+        ranks = np.searchsorted(np.sort(values), estimated) / values.size
+        np.testing.assert_allclose(ranks, [0.05, 0.5, 0.95], atol=0.02)
+        # Memory stays bounded whatever the number of values
+        self.assertLess(sketch.size(), 1000)
+        self.assertEqual(sketch.count, values.size)
+
+    def test_merged_sketches(self):
+        random = np.random.default_rng(2)
+        parts = [random.uniform(0, 100, 30000) for _ in range(8)]
+        sketch = KLLSketch(seed=2)
+        for part in parts:
+            sketch.merge(KLLSketch(seed=3).update(part))
+        median = sketch.quantiles([0.5])[0]
+        self.assertAlmostEqual(median, np.median(np.concatenate(parts)), delta=2)
+
+    def test_nan_ignored(self):
+        sketch = KLLSketch().update(np.array([1.0, np.nan, 3.0]))
+        self.assertEqual(sketch.count, 2)
+        self.assertEqual(sketch.quantiles([0, 1]).tolist(), [1.0, 3.0])
+
+class TestTiledQuantiles(unittest.TestCase):
+    def test_grid_tiles(self):
+        description = {"axis_labels": ["ansi", "Lat", "Long"], "low_limits": ["0", "0", "0"],
+                       "high_limits": ["191", "9", "14"]}
+        tiles = grid_tiles(description, {"Lat": 5, "Long": 10}, [AxisSubset('ansi', '2015-05')])
+        self.assertEqual(len(tiles), 4)
+        self.assertEqual([subset.query for subset in tiles[-1]],
+                         ['ansi("2015-05")', 'Lat:"CRS:1"(5:9)', 'Long:"CRS:1"(10:14)'])
+
+    def test_execute_quantiles_streams_tiles(self):
+        mock_dbc = MagicMock()
+        # Every tile returns a block of the values 0..99
+        mock_dbc.execute_query.return_value = json.dumps(np.arange(100).reshape(10, 10).tolist()).encode()
+        dco = DCO(mock_dbc).select("$c", ["AvgLandTemp"])
+        tiles = [[AxisSubset('Lat:"CRS:1"', i * 10, i * 10 + 9)] for i in range(6)]
+        median, maximum = dco.execute_quantiles([0.5, 1.0], tiles, workers=3)
+        self.assertEqual(mock_dbc.execute_query.call_count, 6)
+        self.assertAlmostEqual(median, 49.5, delta=1)
+        self.assertEqual(maximum, 99)
+        query = mock_dbc.execute_query.call_args_list[0][0][0]
+        self.assertIn('return encode($c[Lat:"CRS:1"(0:9)], "application/json")', query)
+
+    def test_execute_quantiles_bounds_tiles_in_flight(self):
+        mock_dbc = MagicMock()
+        read = []
+        fetched = []
+
+        def tiles():
+            for i in range(20):
+                read.append(i)
+                yield [AxisSubset('Lat:"CRS:1"', i, i)]
+
+        def fetch(query, deadline=None):
+            # Tiles are read from the iterator only as workers become free
+            self.assertLessEqual(len(read) - len(fetched), 3)
+            fetched.append(query)
+            return b"[1, 2, 3]"
+
+        mock_dbc.execute_query.side_effect = fetch
+        DCO(mock_dbc).select("$c", ["AvgLandTemp"]).execute_quantiles([0.5], tiles(), workers=2)
+        self.assertEqual(len(fetched), 20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from wdc.DBC import DBC
+from wdc.DCO import DCO, AxisSubset
+from wdc.slowlog import SlowQueryLog, normalize_query
+from wdc.standin import StandInServer
+
+class TestNormalize(unittest.TestCase):
+    def test_values_stripped(self):
+        first = 'for $c in (AvgLandTemp) return avg($c[ansi("2015-05"), Lat(25:30), Long(0:5)])'
+        second = 'for $c in (AvgLandTemp)   return avg($c[ansi("2013-07"), Lat(-2.5:3e1), Long(10:15)])'
+        self.assertEqual(normalize_query(first), normalize_query(second))
+        self.assertEqual(normalize_query(first), 'for $c in (AvgLandTemp) return avg($c[ansi(?), Lat(?:?), Long(?:?)])')
+        # Slices and slice points, coverages and formats stay apart
+        self.assertNotEqual(normalize_query(first), normalize_query(first.replace("Lat(25:30)", "Lat(25)")))
+        self.assertNotEqual(normalize_query(first), normalize_query(first.replace("AvgLandTemp", "AverageChloroColor")))
+        csv = 'for $c in (AvgLandTemp) return encode($c[Lat:"CRS:1"(3:5)], "text/csv")'
+        self.assertEqual(normalize_query(csv), 'for $c in (AvgLandTemp) return encode($c[Lat:"CRS:1"(?:?)], "text/csv")')
+
+    def test_polygons_of_any_size(self):
+        triangle = 'clip(c, POLYGON((1 2, 3 4, 5 6)))'
+        square = 'clip(c, POLYGON((0 0, 0 1, 1 1, 1 0)))'
+        self.assertEqual(normalize_query(triangle), normalize_query(square))
+
+class TestSlowQueryLog(unittest.TestCase):
+    def test_threshold_and_aggregation(self):
+        log = SlowQueryLog(threshold=0.5)
+        log.record('avg($c[Lat(1:2)])', 0.1, b"1")
+        for seconds, value in ((0.6, 1), (0.8, 2), (1.0, 3)):
+            log.record(f'avg($c[Lat({value}:{value + 1})])', seconds, b"12")
+        log.record('count($c[Lat(1)])', 0.01, None)
+        slow, failed = log.report()
+        self.assertEqual(slow["shape"], "avg($c[Lat(?:?)])")
+        self.assertEqual((slow["count"], slow["errors"], slow["bytes"]), (3, 0, 6))
+        self.assertEqual((slow["p50_ms"], slow["p99_ms"]), (800, 1000))
+        self.assertEqual((failed["count"], failed["errors"]), (1, 1))
+        self.assertEqual(len(log.entries()), 4)
+
+    def test_bounds_and_sampling(self):
+        log = SlowQueryLog(threshold=0, max_shapes=2, max_samples=10, max_entries=3, seed=1)
+        for coverage in ("A", "B", "C"):
+            log.record(f"for $c in ({coverage}) return 1", 0.1, b"1")
+        # The least recently seen shape is dropped
+        self.assertEqual({summary["example"] for summary in log.report()},
+                         {"for $c in (B) return 1", "for $c in (C) return 1"})
+        self.assertEqual(log.evicted, 1)
+        for index in range(100):
+            log.record("for $c in (C) return 1", index / 100, b"1")
+        self.assertEqual(len(log.entries()), 3)
+        shape = log.report("count")[0]
+        self.assertEqual(shape["count"], 101)
+        self.assertIsNotNone(shape["p99_ms"])
+        sampled = SlowQueryLog(threshold=0, sample_rate=0.1, seed=1)
+        for _ in range(1000):
+            sampled.record("q", 1.0, b"")
+        self.assertLess(sampled.report()[0]["count"], 200)
+
+    def test_connector_log(self):
+        with StandInServer(latency=0.02) as server:
+            dbc = DBC(server.url)
+            log = dbc.enable_slow_query_log(threshold=0.01)
+            for month, lat in (("2015-05", 25), ("2015-06", 30)):
+                dco = DCO(dbc)
+                dco.select("$c", ["AvgLandTemp"])
+                dco.subset("$c", [AxisSubset("ansi", month), AxisSubset("Lat", lat, lat + 5), AxisSubset("Long", 0, 5)])
+                dco.avg().execute()
+            dco.clip_with_polygon("AvgLandTemp", [(0, 0), (0, 10), (10, 10)])
+            self.assertIsNone(dbc.execute_query("not a query"))
+        report = {summary["shape"]: summary for summary in log.report()}
+        self.assertEqual(len(report), 3)
+        subset = report['for $c in (AvgLandTemp) return avg($c[ansi(?), Lat(?:?), Long(?:?)])']
+        self.assertEqual(subset["count"], 2)
+        self.assertGreaterEqual(subset["p50_ms"], 20)
+        self.assertEqual(report["not a query"]["errors"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
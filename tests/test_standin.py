@@ -0,0 +1,131 @@
+import time
+import unittest
+import numpy as np
+from wdc.DCO import AxisSubset, DCO
+from wdc.DBC import DBC
+from wdc.decoders import decode_csv, decode_json
+from wdc.standin import StandInServer, SyntheticCoverage, monthly_axis, regular_axis
+
+def small_coverage():
+    return SyntheticCoverage("Small", [monthly_axis("ansi", "2014-01", 24),
+                                       regular_axis("Lat", 50.5, -1, 6),
+                                       regular_axis("Long", 5.5, 1, 8)])
+
+class TestStandInServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer([small_coverage(), SyntheticCoverage("Other", [regular_axis("Lat", 50.5, -1, 6)],
+                                                                        dtype="uint8"),
+                                    SyntheticCoverage("Gaps", [regular_axis("Lat", 50.5, -1, 6),
+                                                               regular_axis("Long", 5.5, 1, 8)], nodata=99999)]).start()
+        cls.coverage = cls.server.coverages["Small"]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.dbc = DBC(self.server.url)
+        self.server.latency = 0
+        self.server.bandwidth = None
+        self.server.error_rate = 0
+
+    def dco(self):
+        return DCO(self.dbc).select("$c", ["Small"])
+
+    def test_subset_encodings(self):
+        # 2014-03 is the third month, Lat 49.5 and 48.5 the 2nd and 3rd rows, Long 6.5 to 9.5 columns 2 to 5
+        expected = self.coverage.read([(2, 2), (1, 2), (1, 4)])[0]
+        subsets = [AxisSubset("ansi", "2014-03"), AxisSubset("Lat", 48.5, 49.5), AxisSubset("Long", 6.5, 9.5)]
+        csv = self.dco().subset("$c", subsets).set_format("text/csv").execute()
+        np.testing.assert_allclose(decode_csv(csv), expected, rtol=1e-6)
+        result = self.dco().subset("$c", subsets).set_format("application/json").execute()
+        np.testing.assert_allclose(decode_json(result), expected, rtol=1e-6)
+        self.assertTrue(self.dco().subset("$c", subsets).set_format("image/png").execute().startswith(b"\x89PNG"))
+
+    def test_condensers(self):
+        subsets = [AxisSubset("ansi", "2014-01", "2014-06"), AxisSubset("Lat", 48.5, 50.5)]
+        values = self.coverage.read([(0, 5), (0, 2), (0, 7)])
+        self.assertAlmostEqual(float(self.dco().subset("$c", subsets).avg().execute()), values.mean(), places=4)
+        self.assertAlmostEqual(float(self.dco().subset("$c", subsets).max().execute()), values.max(), places=4)
+        # count stands for cellCount
+        self.assertEqual(int(self.dco().subset("$c", subsets).count().execute()), values.size)
+
+    def test_nodata_propagates_through_arithmetic(self):
+        values = self.server.coverages["Gaps"].read()
+        valid = values[values != 99999]
+        self.assertLess(valid.size, values.size)
+        for expression, expected in (("avg($c + 0)", valid.mean()), ("sum($c * $c)", (valid.astype(float) ** 2).sum()),
+                                     ("cellCount(abs($c))", valid.size)):
+            result = float(self.dbc.execute_query(f"for $c in (Gaps) return {expression}"))
+            self.assertAlmostEqual(result, expected, delta=expected * 1e-5)
+        # Null cells stay null after resampling
+        scaled = float(self.dbc.execute_query("for $c in (Gaps) return avg(scale($c, 0.5))"))
+        self.assertAlmostEqual(float(self.dbc.execute_query("for $c in (Gaps) return avg(-scale($c, 0.5))")), -scaled,
+                               places=4)
+
+    def test_temporal_reduction(self):
+        subsets = [AxisSubset("Lat", 49.5), AxisSubset("Long", 7.5), AxisSubset("ansi", "2014-01", "2015-12")]
+        series = self.dco().subset("$c", subsets).group_by_time("year", "avg").execute_series()
+        expected = self.coverage.read([(0, 23), (1, 1), (2, 2)]).reshape(2, 12).mean(axis=1)
+        np.testing.assert_allclose(series.values, expected, rtol=1e-5)
+
+    def test_temporal_reduction_partial_cycle(self):
+        # Only the months and seasons with members are returned, in the order of the range
+        subsets = [AxisSubset("Lat", 49.5), AxisSubset("Long", 7.5), AxisSubset("ansi", "2014-11", "2015-04")]
+        values = self.coverage.read([(10, 15), (1, 1), (2, 2)]).ravel()
+        months = self.dco().subset("$c", subsets).group_by_time("month").execute_series()
+        seasons = self.dco().subset("$c", subsets).group_by_time("season").execute_series()
+        self.assertEqual(months.labels, ["Nov", "Dec", "Jan", "Feb", "Mar", "Apr"])
+        np.testing.assert_allclose(months.values, values, rtol=1e-5)
+        self.assertEqual(seasons.labels, ["SON", "DJF", "MAM"])
+        np.testing.assert_allclose(seasons.values, [values[0], values[1:4].mean(), values[4:].mean()], rtol=1e-5)
+
+    def test_describe_and_snap(self):
+        description = self.dbc.describe_coverage("Small")
+        self.assertEqual(description["axis_labels"], ["ansi", "Lat", "Long"])
+        self.assertEqual(description["high_limits"], ["23", "5", "7"])
+        self.assertEqual(len(description["coefficients"]["ansi"]), 24)
+        dco = self.dco().subset("$c", [AxisSubset("ansi", "2014-03"), AxisSubset("Lat", 49.5)]).snap_to_grid()
+        self.assertIn('ansi:"CRS:1"(2)', dco.build_query())
+        self.assertIn("Small", self.dbc.get_coverages())
+
+    def test_multipart_and_get_coverage(self):
+        query = 'for $c in (Small, Other) return encode($c[Lat(49.5)], "text/csv")'
+        parts = list(self.dbc.execute_query_parts(query, ["Small", "Other"]))
+        self.assertEqual([name for name, _ in parts], ["Small", "Other"])
+        self.assertEqual(float(decode_csv(parts[1][1])), self.server.coverages["Other"].read([(1, 1)])[0])
+        response = self.dbc.get_subset_coverage("Small", ['ansi("2014-02")', "Lat(46.5,49.5)"], "text/csv", scale_factor=0.5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode_csv(response.content).shape, (2, 4))
+
+    def test_invalid_query(self):
+        self.assertIsNone(self.dbc.execute_query("for $c in (Small) return $c[Lat(2000)]"))
+        self.assertIsNone(self.dbc.execute_query("for $c in (Missing) return avg($c)"))
+        self.assertIsNone(self.dbc.execute_query("notaquery"))
+
+    def test_injected_errors(self):
+        query = 'for $c in (Small) return avg($c[ansi("2014-01")])'
+        self.server.fail_next(1, 503)
+        self.dbc.enable_retries(retries=1, backoff=0.01)
+        self.assertIsNotNone(self.dbc.execute_query(query))
+        self.server.error_rate = 1
+        self.assertIsNone(self.dbc.execute_query(query))
+
+    def test_latency_and_bandwidth(self):
+        query = 'for $c in (Small) return encode($c, "application/octet-stream")'
+        self.server.latency = 0.1
+        started = time.monotonic()
+        result = self.dbc.execute_query(query)
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(len(result), 24 * 6 * 8 * 4)
+
+        self.server.latency = 0
+        self.server.bandwidth = 20000
+        started = time.monotonic()
+        self.dbc.execute_query(query)
+        # 4608 bytes at 20 kB/s
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import MagicMock
+from wdc.DCO import AxisSubset, DCO
+
+class TestTemporalReduction(unittest.TestCase):
+    def setUp(self):
+        # Create a MagicMock to simulate database behavior
+        self.mock_dbc = MagicMock()
+        self.dco = DCO(self.mock_dbc)
+        self.dco.select("$c", ["AvgLandTemp"])
+
+    def test_monthly_climatology_single_query(self):
+        self.mock_dbc.execute_query.return_value = b"1,2,3,4,5,6,7,8,9,10,11,12"
+        self.dco.subset("$c", [AxisSubset('ansi', '2013-07', '2015-04'),
+                               AxisSubset('Lat', 54.08),
+                               AxisSubset('Long', 8.80)])
+        series = self.dco.group_by_time("month").execute_series()
+
+        # The whole climatology is computed by one request
+        self.mock_dbc.execute_query.assert_called_once()
+        query = self.mock_dbc.execute_query.call_args[0][0]
+        self.assertIn('coverage series over $group t(0:11)', query)
+        self.assertIn('condense + over $year y(0:', query)
+        self.assertIn('imageCrsDomain($c[ansi("2013-07":"2013-07")], ansi).lo', query)
+        self.assertIn('Lat(54.08), Long(8.8), ansi:"CRS:1"(', query)
+        self.assertTrue(query.endswith('"text/csv")'))
+
+        # Values are aligned with calendar month labels
+        self.assertEqual(series.labels[0], "Jan")
+        self.assertEqual(len(series.labels), len(series.values))
+        self.assertEqual(series.values[11], 12.0)
+
+    def test_rolling_window_labels(self):
+        self.mock_dbc.execute_query.return_value = b"{1.5,2.5,3.5}"
+        self.dco.subset("$c", [AxisSubset('ansi', '2014-11', '2015-03'),
+                               AxisSubset('Lat', 25, 90)])
+        series = self.dco.rolling_window(3, "max").execute_series()
+
+        query = self.mock_dbc.execute_query.call_args[0][0]
+        self.assertIn('coverage series over $group t(0:2)', query)
+        # Spatial trims are condensed before the time steps are folded
+        self.assertIn('condense max over $step s(0:2) using max($c[Lat(25:90)', query)
+        self.assertNotIn(' where ', query)
+        self.assertEqual(series.labels, ["2015-01", "2015-02", "2015-03"])
+        self.assertEqual(list(series.values), [1.5, 2.5, 3.5])
+
+    def test_yearly_groups(self):
+        self.dco.subset("$c", [AxisSubset('ansi', '2013-07', '2015-04')])
+        self.dco.group_by_time("year", "sum").execute()
+        query = self.mock_dbc.execute_query.call_args[0][0]
+        self.assertIn('coverage series over $group t(0:2)', query)
+        self.assertIn('where (12 * $group + $step + (-6)) >= 0', query)
+
+    def test_requires_time_range(self):
+        # A time slice cannot be grouped
+        self.dco.subset("$c", [AxisSubset('ansi', '2015-05')])
+        with self.assertRaises(ValueError):
+            self.dco.group_by_time("season").execute()
+
+    def test_invalid_period(self):
+        with self.assertRaises(ValueError):
+            self.dco.group_by_time("week")
+
+    def test_operation_already_pending(self):
+        self.dco.avg()
+        with self.assertRaises(ValueError):
+            self.dco.rolling_window(3)
+
+if __name__ == '__main__':
+    unittest.main()
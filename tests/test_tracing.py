@@ -0,0 +1,101 @@
+import importlib.util
+import io
+import json
+import unittest
+from wdc.DBC import DBC
+from wdc.DCO import DCO, AxisSubset
+from wdc.standin import StandInServer
+from wdc.tracing import JsonLinesHook, Tracer, query_hash
+
+class TestTracing(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.spans = []
+        self.dbc = DBC(self.server.url)
+        self.dco = DCO(self.dbc).enable_tracing(self.spans.append)
+        self.dco.select("$c", ["AvgLandTemp"])
+        self.dco.subset("$c", [AxisSubset("ansi", "2015-05"), AxisSubset("Lat", 25, 30), AxisSubset("Long", 0, 5)])
+        self.dco.avg()
+
+    def test_query_span_is_child_of_execution(self):
+        result = self.dco.execute()
+        query, execution = self.spans
+        self.assertEqual((query.name, execution.name), ("wcps.query", "dco.execute"))
+        self.assertEqual(query.parent_id, execution.span_id)
+        self.assertEqual(query.trace_id, execution.trace_id)
+        self.assertIn("build", execution.phases)
+        self.assertTrue({"wait", "transfer"} <= set(query.phases))
+        self.assertEqual(query.attributes["query_hash"], query_hash(self.dco.build_query()))
+        self.assertEqual(query.attributes["bytes_received"], len(result))
+        self.assertGreater(query.attributes["bytes_sent"], len(self.dco.build_query()))
+        self.assertEqual(query.attributes["status"], 200)
+        self.assertGreaterEqual(execution.duration, query.duration)
+
+    def test_cache_retries_and_deadline(self):
+        self.dbc.enable_cache()
+        self.dbc.enable_retries(retries=1, backoff=0.01)
+        self.server.fail_next(1, 503)
+        self.dco.execute(deadline=5)
+        self.dco.execute(deadline=5)
+        miss, hit = [span for span in self.spans if span.name == "wcps.query"]
+        self.assertEqual((miss.attributes["cache"], hit.attributes["cache"]), ("miss", "hit"))
+        self.assertEqual(miss.attributes["retries"], 1)
+        self.assertIn("backoff", miss.phases)
+        self.assertTrue({"wait", "transfer"} <= set(miss.phases))
+        self.assertNotIn("wait", hit.phases)
+
+    def test_disabled_and_failing_hooks(self):
+        dbc = DBC(self.server.url)
+        # Without tracing the spans do nothing
+        with dbc.tracer.span("wcps.query") as span:
+            span.set("cache", "hit")
+        self.assertIsNone(dbc.tracer.current())
+
+        def fail(span):
+            raise RuntimeError("backend down")
+        dbc.enable_tracing(fail)
+        self.assertIsNotNone(dbc.execute_query(self.dco.build_query()))
+
+    def test_decode_phase_and_json_lines(self):
+        output = io.StringIO()
+        self.dbc.tracer.add_hook(JsonLinesHook(output))
+        dco = DCO(self.dbc).enable_tracing()
+        dco.select("$c", ["AvgLandTemp"])
+        dco.subset("$c", [AxisSubset("ansi", "2014-01", "2015-12"), AxisSubset("Lat", 25), AxisSubset("Long", 0)])
+        self.assertEqual(len(dco.group_by_time("year").execute_series()), 2)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([line["name"] for line in lines], ["wcps.query", "dco.execute_series"])
+        self.assertIn("decode", lines[1]["phases_ms"])
+
+    def test_errors_recorded(self):
+        tracer = Tracer(self.spans.append)
+        with self.assertRaises(ValueError):
+            with tracer.span("outer"):
+                raise ValueError("bad")
+        self.assertEqual(self.spans[0].error, "ValueError: bad")
+        self.assertIsNone(tracer.current())
+
+    @unittest.skipUnless(importlib.util.find_spec("opentelemetry"), "opentelemetry is not installed")
+    def test_open_telemetry_hook(self):
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        from wdc.tracing import OpenTelemetryHook
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        self.dbc.tracer.add_hook(OpenTelemetryHook(provider.get_tracer("test")))
+        self.dco.execute()
+        query, execution = exporter.get_finished_spans()
+        self.assertEqual(query.parent.span_id, execution.context.span_id)
+        self.assertIn("wdc.phase.wait_ms", query.attributes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,28 +1,461 @@
+import threading
+import time
+from contextlib import contextmanager
 import requests
-from owslib.wcs import WebCoverageService
-from owslib.wcs import wcs201
+from multipart import get_boundary, iter_parts, part_name
+from cache import ResultCache
+from scheduler import PriorityScheduler
+from deadline import Deadline, DeadlineExceeded
+from cassette import Cassette, RecordingTransport, ReplayTransport
+from tracing import NULL_SPAN, NULL_TRACER, Tracer
+from metrics import NULL_METRICS, ClientMetrics
+from slowlog import SlowQueryLog
+
+def WebCoverageService(url, version):
+    '''
+        WCS client of owslib, imported on first use since owslib pulls in lxml and dateutil
+
+        Arguments:
+            url (str): endpoint of the server
+            version (str): WCS version
+    '''
+    from owslib.wcs import WebCoverageService as service
+    return service(url, version=version)
 
 class DBC:
     def __init__(self, endpoint):
         self.endpoint = endpoint
-        self.wcs = WebCoverageService(self.endpoint, version='2.0.1')
+        self.__wcs = None  # WCS client, created when first needed, see wcs
+        self.__wcs_lock = threading.Lock()
+        self.cache = None  # cache of query results, see enable_cache
+        self.scheduler = None  # scheduler of queries by priority class, see enable_scheduler
+        self.__local = threading.local()  # priority class of the queries of the current thread
+        self.retries = 0  # number of times a failed query is sent again, see enable_retries
+        self.retry_backoff = 0.5
+        self.retry_statuses = (429, 502, 503, 504)
+        self.transport = requests  # sends the HTTP requests, see enable_recording and enable_replay
+        self.tracer = NULL_TRACER  # emits a span per query, see enable_tracing
+        self.metrics = NULL_METRICS  # operational metrics of the requests, see enable_metrics
+        self.slow_queries = None  # log of slow and failed queries by shape, see enable_slow_query_log
+
+    @property
+    def wcs(self):
+        '''
+            WCS client of the endpoint; it requests the capabilities of the server, so it is
+            only created by the methods using it and not by queries sent as WCPS text
+
+            Arguments:
+                self: self@DBC
+        '''
+        with self.__wcs_lock:
+            if self.__wcs is None:
+                self.__wcs = WebCoverageService(self.endpoint, version='2.0.1')
+            return self.__wcs
+
+    def enable_cache(self, max_entries=256, max_bytes=256 * 1024 * 1024):
+        '''
+            Method to cache the results of executed queries
+
+            Arguments:
+                self: self@DBC
+                max_entries (int): maximum number of cached results
+                max_bytes (int): maximum total size of the cached results
+        '''
+        self.cache = ResultCache(max_entries, max_bytes)
+        return self.cache
+
+    def enable_scheduler(self, max_concurrency=8, classes=None, default="interactive"):
+        '''
+            Method to queue queries by priority class, so that interactive queries are not
+            starved by batch work sharing the connector
+
+            Arguments:
+                self: self@DBC
+                max_concurrency (int): maximum number of queries sent at once
+                classes (list): PriorityClass objects, interactive and batch by default
+                default (str): class of queries sent without a priority
+        '''
+        self.scheduler = PriorityScheduler(max_concurrency, classes, default)
+        return self.scheduler
+
+    def enable_retries(self, retries=2, backoff=0.5, statuses=(429, 502, 503, 504)):
+        '''
+            Method to send failed queries again with exponential backoff. A query with a deadline
+            is not retried when the deadline would pass before the next attempt.
+
+            Arguments:
+                self: self@DBC
+                retries (int): maximum number of additional attempts
+                backoff (float): seconds before the first retry, doubled for every further one
+                statuses (tuple): HTTP status codes worth retrying, connection errors always are
+        '''
+        self.retries = retries
+        self.retry_backoff = backoff
+        self.retry_statuses = tuple(statuses)
+        return self
 
-    def execute_query(self, query):
+    def enable_tracing(self, *hooks):
+        '''
+            Method to emit a span per query with its phase timings (queue, wait for the response
+            headers, body transfer, retry backoff), bytes sent and received, cache hit or miss,
+            retries and query hash. Waiting covers DNS, connection, TLS and server compute time.
+
+            Arguments:
+                self: self@DBC
+                hooks: callables receiving finished spans, e.g. tracing.JsonLinesHook()
+        '''
+        if self.tracer is NULL_TRACER:
+            self.tracer = Tracer()
+        for hook in hooks:
+            self.tracer.add_hook(hook)
+        return self.tracer
+
+    def enable_metrics(self, registry=None):
+        '''
+            Method to measure the requests of the connector: request counts and rate, latency
+            histograms and bytes by operation, requests in flight, cache hit ratio and scheduler
+            utilization. Read them with metrics.snapshot() or serve them to Prometheus with
+            metrics.serve(port).
+
+            Arguments:
+                self: self@DBC
+                registry (MetricsRegistry): registry to add the metrics to, e.g. one shared by
+                                            several connectors, whose metrics are then summed;
+                                            a new one by default
+        '''
+        self.metrics = ClientMetrics(self, registry)
+        return self.metrics
+
+    def enable_slow_query_log(self, threshold=1.0, sample_rate=1.0, max_shapes=200, max_entries=100):
+        '''
+            Method to log the queries slower than a threshold and the failed ones, grouped by
+            query shape (the query without its subset and condition values). The report of the
+            log tells which query patterns dominate the load of the server.
+
+            Arguments:
+                self: self@DBC
+                threshold (float): seconds from which a successful query is logged
+                sample_rate (float): share of the slow queries logged, failed queries always are
+                max_shapes (int): maximum number of shapes, the least recently seen is dropped
+                max_entries (int): most recent logged queries kept verbatim
+        '''
+        self.slow_queries = SlowQueryLog(threshold, sample_rate, max_shapes, max_entries=max_entries)
+        return self.slow_queries
+
+    def enable_recording(self, path):
+        '''
+            Method to record the HTTP exchanges of the queries into a cassette, to replay them
+            later without the server. Requests made by the WCS client of owslib are not recorded.
+
+            Arguments:
+                self: self@DBC
+                path (str): path of the cassette without extension, appended to if it exists
+        '''
+        self.transport = RecordingTransport(Cassette(path))
+        return self.transport.cassette
+
+    def enable_replay(self, path, timing=False, speed=1.0):
+        '''
+            Method to answer queries from a recorded cassette without the network; a query that
+            was not recorded fails like a connection error
+
+            Arguments:
+                self: self@DBC
+                path (str): path of the cassette without extension
+                timing (bool): whether to wait as long as the recorded responses took
+                speed (float): factor the recorded times are divided by when timing is emulated
+        '''
+        self.transport = ReplayTransport(Cassette(path), timing, speed)
+        return self.transport.cassette
+
+    @contextmanager
+    def priority(self, priority):
+        '''
+            Context manager sending the queries of the current thread with a priority class,
+            e.g. with dbc.priority("batch"): ...
+
+            Arguments:
+                self: self@DBC
+                priority (str): priority class
+        '''
+        previous = getattr(self.__local, "priority", None)
+        self.__local.priority = priority
+        try:
+            yield
+        finally:
+            self.__local.priority = previous
+
+    def execute_query(self, query, priority=None, deadline=None):
         '''
             Method to execute WCPS query
         
             Arguments:
                 self: self@DBC
                 query: the query given by the user
+                priority (str): priority class of the query, by default the one of the current thread
+                deadline: Deadline or seconds after which the query is abandoned with DeadlineExceeded
         '''
+        started = time.perf_counter()
+        result = None
         try:
-            response = requests.post(self.endpoint, data={'query': query}, verify=True)
-            if response.status_code == 200:
-                return response.content
+            with self.metrics.request("execute", query) as request:
+                result = request.result(self.__execute_query(query, priority, deadline))
+                return result
+        finally:
+            # Abandoned queries are logged as failed
+            if self.slow_queries is not None:
+                self.slow_queries.record(query, time.perf_counter() - started, result)
+
+    def execute_query_to(self, query, file, priority=None, deadline=None):
+        '''
+            Method to execute WCPS query and stream the result into a file chunk by chunk, so
+            that it is never held in memory whatever its size; returns the number of bytes
+            written, or None if the query failed. With a cache, the result goes through it.
+
+            Arguments:
+                self: self@DBC
+                query: the query given by the user
+                file: binary file open for writing and seekable; a failed attempt is truncated
+                priority (str): priority class of the query, by default the one of the current thread
+                deadline: Deadline or seconds after which the query is abandoned with DeadlineExceeded
+        '''
+        started = time.perf_counter()
+        size = None
+        try:
+            with self.metrics.request("execute", query) as request:
+                size = request.result(self.__execute_query(query, priority, deadline, file))
+                return size
+        finally:
+            if self.slow_queries is not None:
+                self.slow_queries.record(query, time.perf_counter() - started, size)
+
+    def __execute_query(self, query, priority=None, deadline=None, sink=None):
+        '''
+            Method that answers a query from the cache or the server, see execute_query
+
+            Arguments:
+                self: self@DBC
+                query: the query given by the user
+                priority (str): priority class of the query, by default the one of the current thread
+                deadline: Deadline or seconds after which the query is abandoned with DeadlineExceeded
+                sink: file the result is streamed into, the number of bytes is returned instead
+        '''
+        if priority is None:
+            priority = getattr(self.__local, "priority", None)
+        deadline = Deadline.of(deadline)
+        if sink is not None and self.cache is not None:
+            # Cached results are held in memory anyway
+            result = self.__execute_query(query, priority, deadline)
+            if result is None:
+                return None
+            sink.write(result)
+            return len(result)
+        with self.tracer.span("wcps.query") as span:
+            span.query(query)
+            if self.cache is not None:
+                span.set("cache", "hit")
+
+                def load():
+                    span.set("cache", "miss")
+                    return self.__post_query(query, priority, deadline, span)
+
+                timeout = None if deadline is None else deadline.timeout()
+                try:
+                    return self.cache.get_or_load(query, load, timeout)
+                except DeadlineExceeded:
+                    raise
+                except TimeoutError as e:
+                    raise DeadlineExceeded(str(e)) from e
+            return self.__post_query(query, priority, deadline, span, sink)
+
+    def __post_query(self, query, priority=None, deadline=None, span=NULL_SPAN, sink=None):
+        '''
+            Method that sends a WCPS query to the server
+
+            Arguments:
+                self: self@DBC
+                query: the query given by the user
+                priority (str): priority class of the query
+                deadline (Deadline): deadline of the query, if any
+                span (Span): span of the query
+                sink: file the result is streamed into, if any
+        '''
+        if self.scheduler is not None:
+            # Queued behind the queries of the same class, cache hits never wait here
+            timeout = None if deadline is None else deadline.timeout()
+            queued = time.perf_counter()
+            try:
+                with self.scheduler.slot(priority, timeout):
+                    span.add_phase("queue", time.perf_counter() - queued)
+                    return self.__send_query(query, deadline, span, sink)
+            except DeadlineExceeded:
+                raise
+            except TimeoutError as e:
+                raise DeadlineExceeded(str(e)) from e
+        return self.__send_query(query, deadline, span, sink)
+
+    def __send_query(self, query, deadline=None, span=NULL_SPAN, sink=None):
+        '''
+            Method that posts a query, retrying failures while retries and the deadline allow
+
+            Arguments:
+                self: self@DBC
+                query: the query given by the user
+                deadline (Deadline): deadline of the query, if any
+                span (Span): span of the query
+                sink: file the result is streamed into, the number of bytes is returned instead
+        '''
+        attempt = 0
+        while True:
+            span.set("retries", attempt)
+            try:
+                if deadline is None and sink is None:
+                    sent = time.perf_counter()
+                    response = self.transport.post(self.endpoint, data={'query': query}, verify=True)
+                    span.response(response, sent)
+                    span.set("status", response.status_code)
+                    if response.status_code == 200:
+                        span.set("bytes_received", len(response.content))
+                        return response.content
+                    status, text = response.status_code, response.text
+                else:
+                    status, content, text = self.__post_streamed(query, deadline, span, sink)
+                    span.set("status", status)
+                    if status == 200:
+                        span.set("bytes_received", content if sink is not None else len(content))
+                        return content
+                error = f"Error: {status} - {text}"
+                retryable = status in self.retry_statuses
+            except requests.exceptions.RequestException as e:
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded("Query deadline exceeded") from e
+                error = f"Error: {e}"
+                retryable = True
+
+            delay = self.retry_backoff * 2 ** attempt
+            if not retryable or attempt >= self.retries:
+                print(error)
+                span.set("error", error)
+                return None
+            with span.phase("backoff"):
+                if deadline is None:
+                    time.sleep(delay)
+                elif not deadline.sleep(delay):
+                    # The next attempt could not finish in time
+                    deadline.check()
+                    print(error)
+                    span.set("error", error)
+                    return None
+            attempt += 1
+
+    def __post_streamed(self, query, deadline=None, span=NULL_SPAN, sink=None):
+        '''
+            Method that posts a query and streams the body, so that a cancellation closes the
+            connection at once instead of waiting for the whole result, and a result written
+            to a file is never held in memory
+
+            Arguments:
+                self: self@DBC
+                query: the query given by the user
+                deadline (Deadline): deadline of the query, if any
+                span (Span): span of the query
+                sink: file the body is written to, its size is returned instead of the body
+        '''
+        sent = time.perf_counter()
+        if deadline is None:
+            response = self.transport.post(self.endpoint, data={'query': query}, verify=True, stream=True)
+        else:
+            response = self.transport.post(self.endpoint, data={'query': query}, verify=True,
+                                           stream=True, timeout=deadline.timeout())
+            deadline.on_cancel(response.close)
+        span.add_phase("wait", time.perf_counter() - sent)
+        try:
+            if response.status_code != 200:
+                return response.status_code, None, response.text
+            body = bytearray()
+            size = 0
+            if sink is not None:
+                # The body of a failed attempt is discarded
+                sink.seek(0)
+                sink.truncate()
+            with span.phase("transfer"):
+                for chunk in response.iter_content(chunk_size=65536):
+                    if deadline is not None:
+                        deadline.check()
+                    if sink is None:
+                        body += chunk
+                    else:
+                        sink.write(chunk)
+                    size += len(chunk)
+            if deadline is not None:
+                deadline.check()
+            return response.status_code, bytes(body) if sink is None else size, None
+        except (requests.exceptions.RequestException, AttributeError, ValueError) as e:
+            # Closing the response from another thread breaks the read in progress
+            if deadline is not None:
+                deadline.check()
+            raise requests.exceptions.RequestException(str(e)) from e
+        finally:
+            if deadline is not None:
+                deadline.remove_callback(response.close)
+            response.close()
+
+    def execute_query_parts(self, query, coverage_ids=(), deadline=None):
+        '''
+            Method to execute a WCPS query iterating over several coverages and stream
+            the multipart response as (coverage id, payload) pairs, part by part
+
+            Arguments:
+                self: self@DBC
+                query: the query given by the user
+                coverage_ids: coverages iterated by the query, in the order of the for clause
+                deadline: Deadline or seconds after which the stream is closed with DeadlineExceeded
+        '''
+        deadline = Deadline.of(deadline)
+        if self.scheduler is not None:
+            # The slot is held until the whole response has been streamed
+            timeout = None if deadline is None else deadline.timeout()
+            with self.scheduler.slot(getattr(self.__local, "priority", None), timeout):
+                yield from self.__stream_parts(query, coverage_ids, deadline)
+        else:
+            yield from self.__stream_parts(query, coverage_ids, deadline)
+
+    def __stream_parts(self, query, coverage_ids, deadline=None):
+        coverage_ids = list(coverage_ids)
+        response = None
+        try:
+            if deadline is None:
+                response = self.transport.post(self.endpoint, data={'query': query}, verify=True, stream=True)
             else:
+                response = self.transport.post(self.endpoint, data={'query': query}, verify=True, stream=True,
+                                               timeout=deadline.timeout())
+                deadline.on_cancel(response.close)
+            if response.status_code != 200:
                 print(f"Error: {response.status_code} - {response.text}")
+                return
+
+            boundary = get_boundary(response.headers.get("Content-Type"))
+            # A query over a single coverage is answered with a plain body
+            if boundary is None:
+                yield (coverage_ids[0] if coverage_ids else None), response.content
+                return
+
+            parts = iter_parts(response.iter_content(chunk_size=65536), boundary)
+            for index, (headers, payload) in enumerate(parts):
+                if deadline is not None:
+                    deadline.check()
+                # Parts come in the order of the for clause, fall back to the part headers
+                name = coverage_ids[index] if index < len(coverage_ids) else part_name(headers)
+                yield name, payload
         except requests.exceptions.RequestException as e:
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded("Query deadline exceeded") from e
             print(f"Error: {e}")
+        finally:
+            # An abandoned stream gives its connection back to the pool
+            if deadline is not None and response is not None:
+                deadline.remove_callback(response.close)
+                response.close()
 
     def get_coverages(self):
         try:
@@ -36,7 +469,7 @@ class DBC:
         except Exception as e:
             print(f"Error: {e}")
     
-    def get_subset_coverage(self, coverage_id:str, subsets:list, encode=None):
+    def get_subset_coverage(self, coverage_id:str, subsets:list, encode=None, scale_factor=None, scale_size=None):
         '''
             Method that returns an encoded subset coverage with defined subsets 
 
@@ -45,6 +478,8 @@ class DBC:
                 coverage_id (str): coverage id 
                 subsets (list): list of coverage subsets
                 encode (str):the result format needed by user
+                scale_factor (float): factor by which the server downsamples every axis
+                scale_size (dict): target number of cells per axis label, e.g. {"Lat": 180, "Long": 360}
         '''
         request_url=self.endpoint+ "&REQUEST=GetCoverage"
         request_url+=f"&COVERAGEID={coverage_id}"
@@ -53,8 +488,29 @@ class DBC:
         # if econding is specified modify the url
         if not encode is None:
             request_url+=f"&FORMAT={encode}"
-        response=requests.get(request_url, verify=False)
-        return response
+        # scaling is done by the server before encoding (WCS Scaling extension)
+        if not scale_factor is None:
+            request_url+=f"&SCALEFACTOR={scale_factor}"
+        if not scale_size is None:
+            request_url+="&SCALESIZE="+",".join(f"{axis}({size})" for axis, size in scale_size.items())
+        with self.metrics.request("get_subset_coverage") as request:
+            return request.response(self.transport.get(request_url, verify=False))
+
+    def get_subset_coverage_progressive(self, coverage_id:str, subsets:list, encode=None, scale_factors=(0.125,)):
+        '''
+            Method that yields the subset coverage at increasing resolutions, coarse results first
+            and the native resolution last
+
+            Arguments:
+                self: self@DBC
+                coverage_id (str): coverage id
+                subsets (list): list of coverage subsets
+                encode (str): the result format needed by user
+                scale_factors (list): scale factors of the coarse results, in the order they are returned
+        '''
+        for scale_factor in scale_factors:
+            yield self.get_subset_coverage(coverage_id, subsets, encode, scale_factor=scale_factor)
+        yield self.get_subset_coverage(coverage_id, subsets, encode)
     
     def describe_coverage(self, coverage_id):
         '''
@@ -64,18 +520,54 @@ class DBC:
                 self: self@DBC
                 coverage_id: coverage id 
         '''
+        with self.metrics.request("describe_coverage") as request:
+            return request.result(self.__describe_coverage(coverage_id))
+
+    def __describe_coverage(self, coverage_id):
+        '''
+            Method that reads the description of a coverage, see describe_coverage
+
+            Arguments:
+                self: self@DBC
+                coverage_id: coverage id
+        '''
         try:
             coverage = self.wcs.contents[f"{coverage_id}"]
+            grid = coverage.grid
             result = {
-                "axis_labels": coverage.grid.axislabels,
-                "dimension": coverage.grid.dimension,
-                "low_limits": coverage.grid.lowlimits,
-                "high_limits": coverage.grid.highlimits
+                "axis_labels": grid.axislabels,
+                "dimension": grid.dimension,
+                "low_limits": grid.lowlimits,
+                "high_limits": grid.highlimits,
+                # georeferencing of the grid, used to map coordinates to grid indices
+                "origin": getattr(grid, "origin", None),
+                "offset_vectors": getattr(grid, "offsetvectors", None),
+                "coefficients": self.__axis_coefficients(coverage)
             }
             return result
         except Exception as e:
             print(f"Error: {e}")
     
+    def __axis_coefficients(self, coverage):
+        '''
+            Method that returns the coefficients of the irregular axes of a described coverage
+
+            Arguments:
+                self: self@DBC
+                coverage: coverage metadata whose description has already been requested
+        '''
+        coefficients = {}
+        description = getattr(coverage, "descCov", None)
+        if description is None:
+            return coefficients
+        rgrid = "{http://www.opengis.net/gml/3.3/rgrid}"
+        for axis in description.iter(f"{rgrid}GeneralGridAxis"):
+            values = (axis.findtext(f"{rgrid}coefficients") or "").split()
+            # regular axes have no coefficients
+            if values:
+                coefficients[axis.findtext(f"{rgrid}gridAxesSpanned")] = values
+        return coefficients
+
     def connection(self):
         '''
             Tests the connection with the server and provides the status code in case of the failure
@@ -84,7 +576,7 @@ class DBC:
                 self: self@DBC
         '''
         try:                      
-            response=requests.get(self.endpoint)
+            response=self.transport.get(self.endpoint)
             if response.status_code==200:
                 print(f"successful connection")
             else:
@@ -103,5 +595,5 @@ class DBC:
                 self: self@DBC
         '''
         request_url=self.endpoint+"&request=GetCapabilities"
-        response=requests.get(request_url, verify=False)
+        response=self.transport.get(request_url, verify=False)
         return response
\ No newline at end of file
@@ -1,10 +1,28 @@
 from DBC import DBC
 from exceptions.ErrorMessage import ErrorMessage
+from temporal import TemporalReduction, TemporalSeries
+from expression import Expr, Var, compile_wcps, evaluate
+from decoders import decode
+from render import Layer
+from approximate import ESTIMABLE, estimate, sample_statistics_query
+from sketch import KLLSketch
+from planner import QueryPlanner, TileResult
+from grid import GridTranslator, base_axis
+from prefetch import Prefetcher
+from deadline import Deadline, DeadlineExceeded
+from builder import QueryBuilder, compose_query
+from tracing import NULL_SPAN, NULL_TRACER
+import math
+import time
 import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import List
 
 class AxisSubset:
     def __init__(self, operation: str, *values):
+        # Keep the axis name and raw values so the subset can be inspected later
+        self.axis = operation
+        self.values = values
         # Initialize a list to hold formatted values
         formatted_values = []
         for value in values:
@@ -29,6 +47,30 @@ class AxisSubset:
             self.query = f'{operation}({":".join(formatted_values)})'
 
 
+def grid_tiles(description: dict, tile_size: dict, fixed_subsets: List[AxisSubset] = ()) -> List[List[AxisSubset]]:
+    '''
+        Split the grid of a coverage into tiles of grid-index subsets that do not share cells
+
+        Arguments:
+            description (dict): coverage description returned by DBC.describe_coverage
+            tile_size (dict): number of grid cells of a tile per axis label, other axes are not split
+            fixed_subsets (List[AxisSubset]): subsets added to every tile (e.g. a time slice)
+    '''
+    axis_tiles = []
+    for axis, low, high in zip(description["axis_labels"], description["low_limits"], description["high_limits"]):
+        if axis not in tile_size:
+            continue
+        low, high, size = int(low), int(high), int(tile_size[axis])
+        axis_tiles.append([AxisSubset(f'{axis}:"CRS:1"', start, min(start + size - 1, high))
+                           for start in range(low, high + 1, size)])
+
+    # Every combination of one tile per split axis is a tile of the coverage
+    tiles = [list(fixed_subsets)]
+    for subsets in axis_tiles:
+        tiles = [tile + [subset] for tile in tiles for subset in subsets]
+    return tiles
+
+
 class DCO:
     '''
         DCO class will create the datacube object in order to manage query building
@@ -40,6 +82,7 @@ class DCO:
         '''
         png = "image/png"
         csv = "text/csv"
+        json = "application/json"
 
     
     def __init__(self, dbc: 'DBC'):
@@ -58,6 +101,17 @@ class DCO:
         self.__format_query = ""  # Specifies the desired output format
         self.__arithmetic_operation_query = ""  # Holds any arithmetic operations
         self.__custom_encode = ""  # Contains custom encoding commands if used
+        self.__axis_subsets = []  # AxisSubset objects of the last subset call
+        self.__temporal_reduction = None  # Pending grouped or windowed temporal reduction
+        self.__variables = []  # Variables selected with selectMultVar
+        self.__expressions = {}  # Pending band-math outputs, by output name
+        self.__scale_query = ""  # Scaling applied by the server before encoding
+        self.__datacubes = []  # Datacubes iterated by the main variable
+        self.__planner = None  # Planner enforcing the query budgets, if any
+        self.__split = False  # Split queries over budget into tiles instead of refusing them
+        self.__translator = None  # Translator snapping subsets to the grid, created when first needed
+        self.__prefetcher = None  # Prefetcher fed with the subsets of every executed query, if any
+        self.__tracer = NULL_TRACER  # Tracer of the executions, see enable_tracing
     
     def basic_query(self):
         '''
@@ -79,7 +133,10 @@ class DCO:
         '''
         # Store the main variable name to be used in queries
         self.__variable = variable
-        # Build a "for" clause from the given variable name and list of datacubes
+        self.__datacubes = list(datacubes)
+        # Build a "for" clause from the given variable name and list of datacubes,
+        # replacing the clause of a variable selected again instead of repeating it
+        self.__for_queries = [query for query in self.__for_queries if not query.startswith(f"{variable} in ")]
         self.__for_queries.append(f"{variable} in ({', '.join(datacubes)})")
         return self  # Return self for chaining methods
 
@@ -126,8 +183,35 @@ class DCO:
 
         # Store the subset query to be used later
         self.__subset_query = subset_query
+        self.__axis_subsets = list(axis_subsets)
         return self
 
+    def snap_to_grid(self, mode: str = "index", translator: GridTranslator = None) -> 'DCO':
+        '''
+            Snap the subset to the grid of the coverage, so that subsets selecting the same
+            cells produce identical queries
+
+            Arguments:
+                self: self@DCO
+                mode (str): "index" for integer grid subsets, "coordinate" for cell center coordinates
+                translator (GridTranslator): translator to use, e.g. one shared by several DCOs
+        '''
+        if not self.__datacubes or not self.__axis_subsets:
+            raise ValueError(ErrorMessage.structure_not_defined)
+        if translator is not None:
+            self.__translator = translator
+        elif self.__translator is None:
+            self.__translator = GridTranslator(self.__dbc)
+
+        axis_subsets = self.__translator.translate(self.__datacubes[0], self.__axis_subsets, mode)
+        if self.__temporal_reduction and mode == "index":
+            # A temporal reduction needs the dates of the time range, its axis keeps coordinates
+            time_axis = self.__temporal_reduction.time_axis
+            axis_subsets = [self.__translator.translate(self.__datacubes[0], [original], "coordinate")[0]
+                            if base_axis(original.axis) == time_axis else snapped
+                            for original, snapped in zip(self.__axis_subsets, axis_subsets)]
+        return self.subset(self.__variable, axis_subsets)
+
     def set_format(self, format: str) -> 'DCO':
         '''
             Set the output format 
@@ -220,6 +304,45 @@ class DCO:
         self.__arithmetic_operation_query = "avg(0)"
         return self
 
+    def group_by_time(self, period: str, operation: str = "avg", time_axis: str = "ansi") -> 'DCO':
+        '''
+            Reduce the time steps of the subset grouped by month-of-year, season or year
+
+            Arguments:
+                self: self@DCO
+                period (str): grouping period (available: month, season, year)
+                operation (str): reduction applied within a group (available: min, max, avg, count, sum)
+                time_axis (str): label of the time axis
+        '''
+        # Check if any arithmetic operation is already pending
+        if self.__arithmetic_operation_query or self.__temporal_reduction:
+            raise ValueError(ErrorMessage.operation_is_already_pending)
+        # Grid indices of the time axis cannot be grouped by date
+        if any(axis_subset.axis == f'{time_axis}:"CRS:1"' for axis_subset in self.__axis_subsets):
+            raise ValueError(ErrorMessage.time_axis_snapped)
+        # The time range is taken from the subset when the query is executed
+        self.__temporal_reduction = TemporalReduction(period, operation, time_axis=time_axis)
+        return self
+
+    def rolling_window(self, window: int, operation: str = "avg", time_axis: str = "ansi") -> 'DCO':
+        '''
+            Reduce the time steps of the subset over a sliding window of consecutive steps
+
+            Arguments:
+                self: self@DCO
+                window (int): number of time steps in the window
+                operation (str): reduction applied within a window (available: min, max, avg, count, sum)
+                time_axis (str): label of the time axis
+        '''
+        # Check if any arithmetic operation is already pending
+        if self.__arithmetic_operation_query or self.__temporal_reduction:
+            raise ValueError(ErrorMessage.operation_is_already_pending)
+        # Grid indices of the time axis cannot be grouped by date
+        if any(axis_subset.axis == f'{time_axis}:"CRS:1"' for axis_subset in self.__axis_subsets):
+            raise ValueError(ErrorMessage.time_axis_snapped)
+        self.__temporal_reduction = TemporalReduction("rolling", operation, window=window, time_axis=time_axis)
+        return self
+
     def transform_data(self, transformation: str) -> 'DCO':
         '''
             Transform data based on a given expression
@@ -248,35 +371,409 @@ class DCO:
 
         return self
 
-    def execute(self) -> bytes:
+    def build_query(self) -> str:
         '''
-            Execute the constructed query and return the result
+            Construct the WCPS query without executing it
 
             Arguments:
-                self:self@DBC
+                self: self@DCO
         '''
         # Raise an error if no variable has been defined
         if not self.__variable:
             raise ValueError("Variable not defined.")
 
-        # Begin constructing the query with a "for" clause using all selected variables
-        query = f"for {', '.join(self.__for_queries)}\n"
+        series_query = ""
+        if self.__temporal_reduction and not self.__custom_encode:
+            series_query = self.__temporal_reduction.build(self.__variable, self.__axis_subsets)
+        return compose_query(self.__for_queries, self.__subset_query, self.__format_query, self.__custom_encode,
+                             self.__arithmetic_operation_query, self.__scale_query, series_query)
+
+    def freeze(self) -> QueryBuilder:
+        '''
+            Immutable QueryBuilder with the selection, subset, format, custom encoding, aggregate
+            and scaling of this DCO, to be shared across threads or branched into variants
+
+            Arguments:
+                self: self@DCO
+        '''
+        if self.__temporal_reduction or self.__expressions or self.__variables:
+            raise ValueError("Temporal reductions, band-math and multi-variable queries cannot be frozen")
+        return QueryBuilder(self.__dbc)._replace(
+            variable=self.__variable, datacubes=tuple(self.__datacubes), for_queries=tuple(self.__for_queries),
+            subset_query=self.__subset_query, axis_subsets=tuple(self.__axis_subsets), format=self.__format_query,
+            custom_encode=self.__custom_encode, operation=self.__arithmetic_operation_query,
+            scale_query=self.__scale_query)
+
+    def set_budget(self, max_cells: int = None, max_bytes: int = None, split: bool = False, cell_size: int = 4) -> 'DCO':
+        '''
+            Set per-query budgets checked before execution
+
+            Arguments:
+                self: self@DCO
+                max_cells (int): maximum number of cells a query may touch
+                max_bytes (int): maximum number of encoded bytes a query may return
+                split (bool): split an oversized subset into tiles instead of refusing it
+                cell_size (int): size in bytes of a raw cell of the coverage
+        '''
+        self.__planner = QueryPlanner(self.__dbc, max_cells, max_bytes, cell_size)
+        self.__split = split
+        return self
 
-        # Append the appropriate encoding or arithmetic operation to the query
-        if self.__custom_encode:
-            # If custom encoding is specified, use it directly in the query
-            query += f'return encode({self.__custom_encode.replace("$c", self.__subset_query)}, "{self.__format_query}")'
-        elif self.__arithmetic_operation_query:
-            # If an arithmetic operation is pending, replace "0" with the subset query
-            query += f'return {self.__arithmetic_operation_query.replace("0", self.__subset_query)}'
-        elif self.__subset_query:
-            # If only a subset query exists, include it with encoding
-            query += f'return encode({self.__subset_query}, "{self.__format_query}")'
+    def explain(self) -> dict:
+        '''
+            Estimate the size of the constructed query without executing it
+
+            Arguments:
+                self: self@DCO
+        '''
+        # A planner without budgets still caches the coverage descriptions
+        if self.__planner is None:
+            self.__planner = QueryPlanner(self.__dbc)
+        planner = self.__planner
+        estimate = self.__estimate(planner)
+        within_budget = planner.within_budget(estimate)
+        return {
+            "query": self.build_query(),
+            "cells": estimate.cells,
+            "bytes": estimate.bytes,
+            "shape": {axis_plan.axis: axis_plan.high - axis_plan.low + 1
+                      for axis_plan in estimate.axes if not axis_plan.sliced},
+            "within_budget": within_budget,
+            "tiles": 1 if within_budget or not self.__splittable() else len(planner.split(estimate)),
+        }
+
+    def __estimate(self, planner: QueryPlanner):
+        '''
+            Estimate the constructed query on the first datacube of the main variable
+
+            Arguments:
+                self: self@DCO
+                planner (QueryPlanner): planner used for the estimate
+        '''
+        if not self.__datacubes:
+            raise ValueError(ErrorMessage.variable_not_defined)
+        condensed = bool(self.__arithmetic_operation_query) and not self.__custom_encode
+        return planner.plan(self.__datacubes[0], self.__axis_subsets, self.__format_query, condensed)
+
+    def __splittable(self) -> bool:
+        '''
+            Only cell-wise encoded subsets can be split, aggregates and series cannot be recombined
+
+            Arguments:
+                self: self@DCO
+        '''
+        return not (self.__arithmetic_operation_query or self.__temporal_reduction or self.__scale_query)
+
+    def execute(self, deadline=None) -> bytes:
+        '''
+            Execute the constructed query and return the result. When a budget with splitting
+            is set and the query exceeds it, a list of TileResult (tile, result) pairs is returned
+            instead; every tile maps each split axis to the (low, high) grid range its result covers
+
+            Arguments:
+                self:self@DBC
+                deadline: Deadline or seconds after which the execution is abandoned with DeadlineExceeded
+        '''
+        with self.__tracer.span("dco.execute") as span:
+            return self.__execute(deadline, span)
+
+    def __execute(self, deadline=None, span=NULL_SPAN):
+        '''
+            Execute the constructed query, see execute
+
+            Arguments:
+                self: self@DCO
+                deadline: Deadline or seconds after which the execution is abandoned with DeadlineExceeded
+                span (Span): span of the execution, timing the query construction
+        '''
+        deadline = Deadline.of(deadline)
+        if self.__planner is not None and self.__planner.has_budget():
+            estimate = self.__estimate(self.__planner)
+            if not self.__planner.within_budget(estimate):
+                if not (self.__split and self.__splittable()):
+                    raise ValueError(f"{ErrorMessage.budget_exceeded}: {estimate.cells} cells, {estimate.bytes} bytes")
+                return [TileResult(tile, self.__execute_tile(tile, deadline)) for tile in self.__planner.split(estimate)]
+
+        with span.phase("build"):
+            query = self.build_query()
+        if self.__prefetcher is not None and self.__axis_subsets:
+            # Everything but the subsets identifies the stepped query
+            key = (query.replace(self.__subset_query, ""), self.__variable)
+            self.__prefetcher.observe(key, self.__axis_subsets, self.__query_for)
+
+        # Execute the constructed query using the DBC's execute_query method
+        return self.__dbc.execute_query(query, deadline=deadline)
+
+    def __query_for(self, axis_subsets: List[AxisSubset]) -> str:
+        '''
+            Construct the query with other subsets, leaving the DCO unchanged
+
+            Arguments:
+                self: self@DCO
+                axis_subsets (List[AxisSubset]): subsets replacing the current ones
+        '''
+        subset_query, subsets = self.__subset_query, self.__axis_subsets
+        try:
+            self.subset(self.__variable, axis_subsets)
+            return self.build_query()
+        finally:
+            self.__subset_query, self.__axis_subsets = subset_query, subsets
+
+    def __execute_tile(self, tile: dict, deadline: Deadline = None) -> bytes:
+        '''
+            Execute the constructed query restricted to one grid tile
+
+            Arguments:
+                self: self@DCO
+                tile (dict): (low, high) grid range of every split axis
+                deadline (Deadline): deadline of the whole execution, if any
+        '''
+        axis_subsets = [axis_subset for axis_subset in self.__axis_subsets if base_axis(axis_subset.axis) not in tile]
+        axis_subsets += [AxisSubset(f'{axis}:"CRS:1"', low, high) for axis, (low, high) in tile.items()]
+        return self.__dbc.execute_query(self.__query_for(axis_subsets), deadline=deadline)
+
+    def enable_prefetch(self, prefetcher: Prefetcher = None, depth: int = 2) -> 'DCO':
+        '''
+            Prefetch the next subsets when executed queries step through a coverage,
+            e.g. month after month or tile after tile
+
+            Arguments:
+                self: self@DCO
+                prefetcher (Prefetcher): prefetcher to use, e.g. one shared by several DCOs
+                depth (int): number of steps fetched ahead by a new prefetcher
+        '''
+        self.__prefetcher = prefetcher if prefetcher is not None else Prefetcher(self.__dbc, depth)
+        return self
+
+    def enable_tracing(self, *hooks) -> 'DCO':
+        '''
+            Trace the executions of this DCO: every execution is a span timing the query
+            construction and decoding, with the spans of the queries it sends as children
+
+            Arguments:
+                self: self@DCO
+                hooks: callables receiving finished spans, added to the tracer of the connector
+        '''
+        self.__tracer = self.__dbc.enable_tracing(*hooks)
+        return self
+
+    def execute_each(self, deadline=None):
+        '''
+            Execute the constructed query once for all datacubes of the main variable and
+            yield a (coverage id, result) pair per datacube as the response streams in
+
+            Arguments:
+                self: self@DCO
+                deadline: Deadline or seconds after which the stream is closed with DeadlineExceeded
+        '''
+        return self.__dbc.execute_query_parts(self.build_query(), self.__datacubes, deadline=deadline)
+
+    def scale(self, factor: float = None, size: dict = None) -> 'DCO':
+        '''
+            Let the server downsample the encoded result, e.g. for previews
+
+            Arguments:
+                self: self@DCO
+                factor (float): scale factor applied to every axis (0.5 halves the resolution)
+                size (dict): target number of cells per axis label, e.g. {"Lat": 180, "Long": 360}
+        '''
+        if (factor is None) == (size is None):
+            raise ValueError(ErrorMessage.missing_paramethers)
+
+        if factor is not None:
+            self.__scale_query = str(factor)
         else:
+            # A target size is expressed as a grid interval on every scaled axis
+            intervals = [f'{axis}:"CRS:1"(0:{int(count) - 1})' for axis, count in size.items()]
+            self.__scale_query = f"{{{', '.join(intervals)}}}"
+        return self
+
+    def execute_progressive(self, factors: list = (0.125,), deadline=None):
+        '''
+            Execute the query at increasing resolutions, yielding a coarse result first
+            and the native resolution result last
+
+            Arguments:
+                self: self@DCO
+                factors (list): scale factors of the coarse results, in the order they are returned
+                deadline: Deadline or seconds shared by all refinements
+        '''
+        deadline = Deadline.of(deadline)
+        scale_query = self.__scale_query
+        try:
+            for factor in factors:
+                yield self.scale(factor=factor).execute(deadline)
+            # The last refinement is the unscaled result
+            self.__scale_query = ""
+            yield self.execute(deadline)
+        finally:
+            self.__scale_query = scale_query
+
+    def execute_approximate(self, factors: list = (0.01, 0.1, 1), confidence: float = 0.95, budget: float = None,
+                            deadline=None):
+        '''
+            Estimate the pending avg, sum or count on server-side subsamples of increasing size,
+            yielding an Estimate with its confidence interval after every refinement
+
+            Arguments:
+                self: self@DCO
+                factors (list): increasing scale factors of the subsamples, 1 gives the exact value
+                confidence (float): confidence level of the intervals
+                budget (float): seconds after which no further refinement is started
+                deadline: Deadline or seconds after which a running refinement is abandoned
+        '''
+        deadline = Deadline.of(deadline)
+        if self.__arithmetic_operation_query not in ESTIMABLE:
+            raise ValueError(ErrorMessage.invalid_operation)
+        if not self.__subset_query:
             raise ValueError("No operation specified.")
 
-        # Execute the constructed query using the DBC's execute_query method
-        return self.__dbc.execute_query(query)
+        operation = ESTIMABLE[self.__arithmetic_operation_query]
+        # The size of the full subset follows from its grid extents, the server only reads the subsamples
+        if self.__planner is None:
+            self.__planner = QueryPlanner(self.__dbc)
+        population = self.__planner.plan(self.__datacubes[0], self.__axis_subsets).cells
+        started = time.monotonic()
+        previous = None  # (factor, sample size, seconds) of the last refinement
+        for factor in factors:
+            if budget is not None and previous is not None:
+                # The cost of a refinement grows with the number of sampled cells
+                last_factor, last_size, last_seconds = previous
+                growth = (factor / last_factor) ** self.__sample_dimensions(last_factor, last_size, population)
+                if time.monotonic() - started + last_seconds * growth > budget:
+                    return
+
+            step_started = time.monotonic()
+            query = f"for {', '.join(self.__for_queries)}\n"
+            query += f'return encode({sample_statistics_query(self.__subset_query, factor)}, "{DCO.Format.csv}")'
+            result = self.__dbc.execute_query(query, deadline=deadline)
+            # Errors are reported by the connector, nothing to estimate
+            if result is None:
+                return
+
+            statistics = list(decode(result, DCO.Format.csv))
+            previous = (factor, statistics[2], time.monotonic() - step_started)
+            current = estimate(operation, statistics, population, factor, confidence)
+            yield current
+            if current.exact:
+                return
+
+    @staticmethod
+    def __sample_dimensions(factor: float, sample_size: float, population_size: float) -> float:
+        '''
+            Number of subsampled dimensions, derived from sample_size = population_size * factor ** dimensions
+
+            Arguments:
+                factor (float): scale factor of the subsample
+                sample_size (float): number of cells of the subsample
+                population_size (float): number of cells of the full subset
+        '''
+        if factor >= 1 or sample_size <= 0 or population_size <= sample_size:
+            return 1.0
+        return math.log(sample_size / population_size) / math.log(factor)
+
+    def execute_quantiles(self, quantiles: list, tiles: List[List[AxisSubset]], workers: int = 4, k: int = 200,
+                          deadline=None):
+        '''
+            Estimate quantiles of the selected variable over a set of tiles, e.g. from grid_tiles.
+            Tiles are fetched in parallel and folded into mergeable sketches, the raw values of a
+            tile are discarded as soon as it is folded so memory does not grow with the subset.
+
+            Arguments:
+                self: self@DCO
+                quantiles (list): quantiles between 0 and 1 (0.5 is the median)
+                tiles (List[List[AxisSubset]]): list of tiles, each a list of AxisSubset objects
+                workers (int): number of tiles fetched at the same time
+                k (int): accuracy parameter of the sketches
+                deadline: Deadline or seconds after which the outstanding tile fetches are abandoned
+        '''
+        deadline = Deadline.of(deadline)
+        if not self.__variable:
+            raise ValueError(ErrorMessage.variable_not_defined)
+
+        # Cancelling the outstanding tiles must not cancel the caller's deadline, which may be shared
+        tile_deadline = None if deadline is None else deadline.child()
+
+        def fetch_sketch(tile: List[AxisSubset]) -> KLLSketch:
+            subset_query = f"{self.__variable}[{', '.join(axis_subset.query for axis_subset in tile)}]"
+            query = f"for {', '.join(self.__for_queries)}\n"
+            query += f'return encode({subset_query}, "{DCO.Format.json}")'
+            result = self.__dbc.execute_query(query, deadline=tile_deadline)
+            if result is None:
+                raise ValueError(f"Tile {subset_query} could not be fetched")
+            return KLLSketch(k).update(decode(result, DCO.Format.json))
+
+        sketch = KLLSketch(k)
+        tiles = iter(tiles)
+        pending = set()
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            while True:
+                # At most one tile per worker is in flight, the next one is read when one completes
+                while len(pending) < workers:
+                    tile = next(tiles, None)
+                    if tile is None:
+                        break
+                    pending.add(executor.submit(fetch_sketch, tile))
+                if not pending:
+                    break
+                done, pending = wait(pending, None if deadline is None else deadline.remaining(),
+                                     return_when=FIRST_COMPLETED)
+                if not done:
+                    # Closes the connections of the tiles being fetched
+                    tile_deadline.cancel()
+                    raise DeadlineExceeded("Query deadline exceeded")
+                # Only the bounded-size sketch of a tile outlives its fetch, never its raw values
+                for future in done:
+                    sketch.merge(future.result())
+        finally:
+            # Tiles not started yet are dropped when one fails or the deadline passes
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            if deadline is not None:
+                deadline.remove_callback(tile_deadline.cancel)
+        return sketch.quantiles(quantiles)
+
+    def execute_series(self, deadline=None) -> TemporalSeries:
+        '''
+            Execute a pending temporal reduction and decode the reduced series
+
+            Arguments:
+                self: self@DCO
+                deadline: Deadline or seconds after which the execution is abandoned
+        '''
+        if not self.__temporal_reduction:
+            raise ValueError("No operation specified.")
+
+        with self.__tracer.span("dco.execute_series") as span:
+            result = self.__execute(deadline, span)
+            # Errors are reported by the connector, nothing to decode
+            if result is None:
+                return None
+            with span.phase("decode"):
+                return self.__temporal_reduction.decode(result)
+
+    def fetch_layer(self, deadline=None) -> Layer:
+        '''
+            Fetch the raw numeric subset once so it can be styled and encoded locally
+
+            Arguments:
+                self: self@DCO
+                deadline: Deadline or seconds after which the execution is abandoned
+        '''
+        # Raw values are requested as JSON instead of a server-side rendered image
+        format_query = self.__format_query
+        with self.__tracer.span("dco.fetch_layer") as span:
+            try:
+                result = self.set_format(DCO.Format.json).__execute(deadline, span)
+            finally:
+                self.__format_query = format_query
+            # Errors are reported by the connector, nothing to decode
+            if result is None:
+                return None
+            with span.phase("decode"):
+                return Layer(decode(result, DCO.Format.json))
 
     def construct_gradient_image(self, variable: str) -> str:
         '''
@@ -303,7 +800,7 @@ class DCO:
         # Return the constructed query
         return self.__custom_encode
     
-    def transform_to_1d(self, variable: str, axis_subsets: list[AxisSubset]) -> bytes:
+    def transform_to_1d(self, variable: str, axis_subsets: list[AxisSubset], deadline=None) -> bytes:
         '''
             Transform data to 1D
 
@@ -311,6 +808,7 @@ class DCO:
                 self: self@DBC
                 variable (str): data which will be transformed to 1d
                 axis_subsets (list[AxisSubset]): list of AxisSubset objects
+                deadline: Deadline or seconds after which the execution is abandoned
         '''
         # Ensure the specified variable matches the current selection
         if self.__variable != variable:
@@ -322,9 +820,10 @@ class DCO:
         self.__subset_query = f"{variable}[{', '.join(subset_queries)}]"
         
         # Set the output format to CSV and execute the query
-        return self.set_format(DCO.Format.csv).execute()
+        return self.set_format(DCO.Format.csv).execute(deadline)
     
-    def transform_3d_to_2d(self, variable: str, axis_subsets: List[AxisSubset], dimension_to_collapse: str) -> bytes:
+    def transform_3d_to_2d(self, variable: str, axis_subsets: List[AxisSubset], dimension_to_collapse: str,
+                           deadline=None) -> bytes:
         '''
             Transform 3D data to 2D
 
@@ -333,6 +832,7 @@ class DCO:
                 variable (str): data which will be transformed
                 axis_subsets (List[AxisSubset]): list of AxisSubset objects
                 dimension_to_collapse (str): dimension to collapse (e.g., 'x', 'y', or 'z').
+                deadline: Deadline or seconds after which the execution is abandoned
         '''
         if self.__variable != variable:
             raise ValueError("Variable not defined.")
@@ -349,10 +849,10 @@ class DCO:
                 combined_subset_query += query + ','
         combined_subset_query=combined_subset_query.rstrip(',')
         self.__subset_query = f"{variable}[{combined_subset_query}]"
-        return self.set_format(DCO.Format.csv).execute()
+        return self.set_format(DCO.Format.csv).execute(deadline)
 
     
-    def celsius_to_kelvin(self, variable: str, axis_subsets: list[AxisSubset]) -> bytes:
+    def celsius_to_kelvin(self, variable: str, axis_subsets: list[AxisSubset], deadline=None) -> bytes:
         '''
             Convert Celsius to Kelvin
 
@@ -360,6 +860,7 @@ class DCO:
                 self: self@DBC
                 variable (str): variable for which the conversion is performed
                 axis_subsets (list[AxisSubset]): list of AxisSubset objects
+                deadline: Deadline or seconds after which the execution is abandoned
         '''
         # Ensure the specified variable matches the current selection
         if self.__variable != variable:
@@ -371,9 +872,9 @@ class DCO:
         self.__subset_query = f"{variable}[{', '.join(subset_queries)}]"
         
         # Set the format to CSV and execute the query
-        return self.set_format(DCO.Format.csv).execute()
+        return self.set_format(DCO.Format.csv).execute(deadline)
     
-    def clip_with_polygon(self, variable: str, polygon_coords: List[tuple]) -> 'DCO':
+    def clip_with_polygon(self, variable: str, polygon_coords: List[tuple], deadline=None) -> 'DCO':
         '''
             Clips data using a polygonal boundary
 
@@ -381,6 +882,7 @@ class DCO:
                 self: self@DBC
                 variable (str): data to be clipped
                 polygon_coords (List[tuple]): coordinates of the polygon vertices
+                deadline: Deadline or seconds after which the execution is abandoned
         '''
         # Ensure the main variable is already selected
         if not self.__variable:
@@ -398,9 +900,9 @@ class DCO:
         query += f"return encode({clip_query}, \"image/png\", \"{{\\\"nodata\\\": [0]}}\")"
 
         # Execute the constructed query through the DBC's execute_query method
-        return self.__dbc.execute_query(query)
+        return self.__dbc.execute_query(query, deadline=Deadline.of(deadline))
 
-    def greater_than_query(self, variable: str, axis_subsets: List[AxisSubset], value: float) -> bytes:
+    def greater_than_query(self, variable: str, axis_subsets: List[AxisSubset], value: float, deadline=None) -> bytes:
         '''
             Counts the number of data cells greater than the specified value
 
@@ -409,6 +911,7 @@ class DCO:
                 variable (str): data that will be compared
                 axis_subsets (List[AxisSubset]): list of AxisSubset objects
                 value (float): the threshold for comparison
+                deadline: Deadline or seconds after which the execution is abandoned
         '''
         # Ensure that the given variable matches the current selection
         if not self.__variable or self.__variable != variable:
@@ -426,7 +929,7 @@ class DCO:
         query = f"for {', '.join(self.__for_queries)} return count({greater_than_expression})"
 
         # Execute the query via the DBC's execute_query method
-        return self.__dbc.execute_query(query)
+        return self.__dbc.execute_query(query, deadline=Deadline.of(deadline))
     
     def selectMultVar(self, variables: list, datacubes: list) -> 'DCO':
         '''
@@ -478,12 +981,13 @@ class DCO:
         return self
 
 
-    def executeMultVar(self):
+    def executeMultVar(self, deadline=None):
         '''
             Executes a query involving multiple variables
 
             Arguments:
                 self: self@DCO
+                deadline: Deadline or seconds after which the execution is abandoned
         '''
         if len(self.__variables) == 0:
             raise ValueError(ErrorMessage.variable_not_defined)
@@ -506,7 +1010,7 @@ class DCO:
              else:
                  query += f'\n{self.__subset_query}'
                  
-        return self.__dbc.execute_query(query)
+        return self.__dbc.execute_query(query, deadline=Deadline.of(deadline))
     
     def calculate_difference(self):
         '''
@@ -607,6 +1111,81 @@ class DCO:
             
         return self
 
+    def band(self, variable: str, axis_subsets: List[AxisSubset] = None) -> Expr:
+        '''
+            Reference a selected variable in a band-math expression
+
+            Arguments:
+                self: self@DCO
+                variable (str): one of the variables selected with selectMultVar
+                axis_subsets (List[AxisSubset]): subsets of this reference, defaults to the only_subset ones
+        '''
+        if variable not in self.__variables:
+            raise ValueError(ErrorMessage.variable_not_defined)
+
+        if axis_subsets is not None:
+            subset_query = f"[{', '.join(str(axis_subset.query) for axis_subset in axis_subsets)}]"
+        elif self.__subset_query.startswith("["):
+            # Reuse the subset shared by all variables (see only_subset)
+            subset_query = self.__subset_query
+        else:
+            subset_query = ""
+        return Var(variable, subset_query)
+
+    def calculate(self, expression: Expr = None, **outputs: Expr) -> 'DCO':
+        '''
+            Set one or several band-math expressions to evaluate in a single query
+
+            Arguments:
+                self: self@DCO
+                expression (Expr): single unnamed output
+                outputs (Expr): named outputs, returned as the bands of one coverage
+        '''
+        if (expression is None) == (not outputs):
+            raise ValueError(ErrorMessage.missing_paramethers)
+        self.__expressions = {None: expression} if expression is not None else outputs
+        return self
+
+    def execute_expressions(self, deadline=None) -> bytes:
+        '''
+            Execute the pending band-math expressions; shared subsets are evaluated once
+
+            Arguments:
+                self: self@DCO
+                deadline: Deadline or seconds after which the execution is abandoned
+        '''
+        if not self.__expressions:
+            raise ValueError("No operation specified.")
+        if len(self.__for_queries) == 0:
+            raise ValueError(ErrorMessage.structure_not_defined)
+
+        let_clause, result = compile_wcps(self.__expressions)
+        query = f"for {', '.join(self.__for_queries)}\n"
+        if let_clause:
+            query += f"{let_clause}\n"
+
+        if self.__format_query:
+            query += f'return encode({result}, "{self.__format_query}")'
+        else:
+            query += f"return {result}"
+        return self.__dbc.execute_query(query, deadline=deadline)
+
+    def evaluate_local(self, arrays: dict, chunk_size: int = 1 << 16):
+        '''
+            Evaluate the pending band-math expressions on local arrays instead of the server
+
+            Arguments:
+                self: self@DCO
+                arrays (dict): variable name mapped to its (already subsetted) NumPy array
+                chunk_size (int): number of cells evaluated at once
+        '''
+        if not self.__expressions:
+            raise ValueError("No operation specified.")
+
+        results = evaluate(self.__expressions, arrays, chunk_size)
+        # A single unnamed output is returned without its dictionary
+        return results[None] if None in results else results
+
     def aggregate(self, operation: str) -> 'DCO':
         '''
         Method to apply aggregation functions to your variable.
@@ -0,0 +1,64 @@
+import math
+from collections import namedtuple
+from statistics import NormalDist
+
+# Approximate aggregate with its confidence interval; exact is True when no subsampling was done
+Estimate = namedtuple("Estimate", ["value", "low", "high", "factor", "exact"])
+
+# Aggregates that can be estimated from a subsample, by their pending DCO operation
+ESTIMABLE = {
+    "avg(0)": "avg",
+    "sum(0)": "sum",
+    "cellCount(0)": "count",
+}
+
+
+def sample_statistics_query(subset_query: str, factor: float) -> str:
+    '''
+        Build a coverage constructor returning, in one response, the sum, the sum of squares
+        and the number of cells of a server-side subsample; only the subsample is read
+
+        Arguments:
+            subset_query (str): subset expression to aggregate
+            factor (float): scale factor of the subsample (1 means no subsampling)
+    '''
+    sample = subset_query if factor >= 1 else f"scale({subset_query}, {factor})"
+    return (f"coverage statistics over $i i(0:2) values switch "
+            f"case $i = 0 return sum({sample}) "
+            f"case $i = 1 return sum({sample} * {sample}) "
+            f"default return cellCount({sample})")
+
+
+def estimate(operation: str, statistics: list, population_size: int, factor: float,
+             confidence: float = 0.95) -> Estimate:
+    '''
+        Estimate an aggregate and its confidence interval from subsample statistics
+
+        Arguments:
+            operation (str): aggregate to estimate (available: avg, sum, count)
+            statistics (list): sum, sum of squares and size of the subsample
+            population_size (int): number of cells of the full subset, known from its grid extents
+            factor (float): scale factor of the subsample
+            confidence (float): confidence level of the interval
+    '''
+    total, squares, sample_size = (float(value) for value in statistics)
+    population_size = float(population_size)
+    exact = factor >= 1 or sample_size >= population_size
+
+    # The number of cells of the full subset is always known exactly
+    if operation == "count":
+        return Estimate(population_size, population_size, population_size, factor, True)
+    if sample_size == 0:
+        return Estimate(float("nan"), float("nan"), float("nan"), factor, exact)
+
+    mean = total / sample_size
+    variance = max(squares / sample_size - mean * mean, 0.0)
+    # Standard error of the mean with the finite population correction
+    correction = max(1 - sample_size / population_size, 0.0) if population_size else 0.0
+    error = 0.0 if exact else math.sqrt(variance / sample_size * correction)
+    margin = NormalDist().inv_cdf((1 + confidence) / 2) * error
+
+    if operation == "sum":
+        return Estimate(mean * population_size, (mean - margin) * population_size,
+                        (mean + margin) * population_size, factor, exact)
+    return Estimate(mean, mean - margin, mean + margin, factor, exact)
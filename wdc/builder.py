@@ -0,0 +1,207 @@
+from exceptions.ErrorMessage import ErrorMessage
+
+# Aggregates of the builder and their WCPS condensers; "0" stands for the subset
+AGGREGATES = {
+    "max": "max(0)",
+    "min": "min(0)",
+    "sum": "sum(0)",
+    "count": "cellCount(0)",
+    "avg": "avg(0)",
+}
+
+
+def compose_query(for_queries, subset_query: str, format: str, custom_encode: str = "",
+                  operation: str = "", scale_query: str = "", series_query: str = "") -> str:
+    '''
+        Construct a WCPS query from its parts, shared by DCO and QueryBuilder
+
+        Arguments:
+            for_queries: "for" clauses of the selected variables
+            subset_query (str): subset of the main variable, e.g. $c[ansi("2015-05")]
+            format (str): output format
+            custom_encode (str): custom encoding expression, $c stands for the subset
+            operation (str): pending aggregate, "0" stands for the subset
+            scale_query (str): scaling applied by the server before encoding
+            series_query (str): pending temporal reduction, encoded as CSV
+    '''
+    # Begin constructing the query with a "for" clause using all selected variables
+    query = f"for {', '.join(for_queries)}\n"
+
+    # Downsample the encoded subset on the server if a scaling is set
+    encoded_query = subset_query
+    if scale_query:
+        encoded_query = f"scale({subset_query}, {scale_query})"
+
+    # Append the appropriate encoding or arithmetic operation to the query
+    if custom_encode:
+        # If custom encoding is specified, use it directly in the query
+        query += f'return encode({custom_encode.replace("$c", encoded_query)}, "{format}")'
+    elif series_query:
+        # A temporal reduction returns the whole reduced series as CSV
+        query += f'return encode({series_query}, "text/csv")'
+    elif operation:
+        # If an arithmetic operation is pending, replace "0" with the subset query
+        query += f'return {operation.replace("0", subset_query)}'
+    elif subset_query:
+        # If only a subset query exists, include it with encoding
+        query += f'return encode({encoded_query}, "{format}")'
+    else:
+        raise ValueError("No operation specified.")
+
+    return query
+
+
+class QueryBuilder:
+    '''
+        QueryBuilder is an immutable counterpart of DCO: every chained call returns a new
+        lightweight object sharing the unchanged parts with its parent, so one base can be
+        shared across threads and branched into many variants without copying or races
+    '''
+
+    __slots__ = ("dbc", "variable", "datacubes", "for_queries", "subset_query", "axis_subsets",
+                 "format", "custom_encode", "operation", "scale_query")
+
+    def __init__(self, dbc):
+        '''
+            Initialization of an empty builder
+
+            Arguments:
+                self: self@QueryBuilder
+                dbc: database connector
+        '''
+        for name in QueryBuilder.__slots__:
+            object.__setattr__(self, name, "")
+        object.__setattr__(self, "dbc", dbc)
+        object.__setattr__(self, "datacubes", ())
+        object.__setattr__(self, "for_queries", ())
+        object.__setattr__(self, "axis_subsets", ())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("QueryBuilder is immutable, chained calls return new builders")
+
+    def __delattr__(self, name):
+        raise AttributeError("QueryBuilder is immutable, chained calls return new builders")
+
+    def _replace(self, **changes) -> 'QueryBuilder':
+        '''
+            New builder with some parts changed; the other parts are shared, not copied
+
+            Arguments:
+                self: self@QueryBuilder
+                changes: parts to change
+        '''
+        builder = object.__new__(QueryBuilder)
+        for name in QueryBuilder.__slots__:
+            object.__setattr__(builder, name, changes[name] if name in changes else getattr(self, name))
+        return builder
+
+    def select(self, variable: str, datacubes: list) -> 'QueryBuilder':
+        '''
+            Select a main variable; selecting a variable again replaces its "for" clause
+
+            Arguments:
+                self: self@QueryBuilder
+                variable (str): main variable selected for the operation
+                datacubes (list): list of datacubes
+        '''
+        clause = f"{variable} in ({', '.join(datacubes)})"
+        for_queries = tuple(query for query in self.for_queries if not query.startswith(f"{variable} in "))
+        return self._replace(variable=variable, datacubes=tuple(datacubes), for_queries=for_queries + (clause,))
+
+    def subset(self, axis_subsets: list) -> 'QueryBuilder':
+        '''
+            Subset the main variable
+
+            Arguments:
+                self: self@QueryBuilder
+                axis_subsets (list): list of AxisSubset objects
+        '''
+        if not self.variable:
+            raise ValueError(ErrorMessage.variable_not_defined)
+        axis_subsets = tuple(axis_subsets)
+        subset_query = f"{self.variable}[{', '.join(str(axis_subset.query) for axis_subset in axis_subsets)}]"
+        return self._replace(subset_query=subset_query, axis_subsets=axis_subsets)
+
+    def set_format(self, format: str) -> 'QueryBuilder':
+        '''
+            Set the output format
+
+            Arguments:
+                self: self@QueryBuilder
+                format (str): desired format
+        '''
+        return self._replace(format=format)
+
+    def with_custom_encode(self, custom_encode: str) -> 'QueryBuilder':
+        '''
+            Set a custom encoding expression, $c stands for the subset
+
+            Arguments:
+                self: self@QueryBuilder
+                custom_encode (str): encoding
+        '''
+        return self._replace(custom_encode=custom_encode)
+
+    def aggregate(self, operation: str) -> 'QueryBuilder':
+        '''
+            Condense the subset with an aggregate
+
+            Arguments:
+                self: self@QueryBuilder
+                operation (str): aggregate (available: max, min, sum, count, avg)
+        '''
+        if operation not in AGGREGATES:
+            raise ValueError(f"Unsupported aggregate '{operation}'")
+        if self.operation:
+            raise ValueError(ErrorMessage.operation_is_already_pending)
+        return self._replace(operation=AGGREGATES[operation])
+
+    def max(self) -> 'QueryBuilder':
+        return self.aggregate("max")
+
+    def min(self) -> 'QueryBuilder':
+        return self.aggregate("min")
+
+    def sum(self) -> 'QueryBuilder':
+        return self.aggregate("sum")
+
+    def count(self) -> 'QueryBuilder':
+        return self.aggregate("count")
+
+    def avg(self) -> 'QueryBuilder':
+        return self.aggregate("avg")
+
+    def scale(self, factor: float) -> 'QueryBuilder':
+        '''
+            Let the server downsample the encoded result
+
+            Arguments:
+                self: self@QueryBuilder
+                factor (float): scale factor applied to every axis
+        '''
+        return self._replace(scale_query=str(factor))
+
+    def build_query(self) -> str:
+        '''
+            Construct the WCPS query without executing it
+
+            Arguments:
+                self: self@QueryBuilder
+        '''
+        if not self.variable:
+            raise ValueError("Variable not defined.")
+        return compose_query(self.for_queries, self.subset_query, self.format, self.custom_encode,
+                             self.operation, self.scale_query)
+
+    def execute(self, deadline=None) -> bytes:
+        '''
+            Execute the constructed query and return the result
+
+            Arguments:
+                self: self@QueryBuilder
+                deadline: Deadline or seconds after which the execution is abandoned
+        '''
+        return self.dbc.execute_query(self.build_query(), deadline=deadline)
+
+    def __repr__(self) -> str:
+        return f"QueryBuilder({', '.join(self.for_queries)}; {self.subset_query})"
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    '''
+        ResultCache is a thread-safe LRU cache of query results bounded by entries and bytes.
+        Concurrent loads of the same query are collapsed into a single request.
+    '''
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 256 * 1024 * 1024):
+        '''
+            Initialization of the cache
+
+            Arguments:
+                self: self@ResultCache
+                max_entries (int): maximum number of cached results
+                max_bytes (int): maximum total size of the cached results
+        '''
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0  # Total size of the cached results
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()  # Query mapped to its result, least recently used first
+        self.__loading = {}  # Query mapped to the event set when its load finishes
+        self.__lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        with self.__lock:
+            return key in self.__entries
+
+    def get(self, key: str) -> bytes:
+        '''
+            Cached result of a query, None if it is not cached
+
+            Arguments:
+                self: self@ResultCache
+                key (str): query
+        '''
+        with self.__lock:
+            if key not in self.__entries:
+                return None
+            self.__entries.move_to_end(key)
+            return self.__entries[key]
+
+    def put(self, key: str, value: bytes):
+        '''
+            Cache the result of a query, evicting the least recently used results if needed
+
+            Arguments:
+                self: self@ResultCache
+                key (str): query
+                value (bytes): result of the query
+        '''
+        with self.__lock:
+            self.__store(key, value)
+
+    def __store(self, key: str, value: bytes):
+        # Results larger than the whole cache are not kept
+        if len(value) > self.max_bytes:
+            return
+        if key in self.__entries:
+            self.size -= len(self.__entries.pop(key))
+        self.__entries[key] = value
+        self.size += len(value)
+        while len(self.__entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.__entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def get_or_load(self, key: str, loader, timeout: float = None) -> bytes:
+        '''
+            Cached result of a query, loaded with the loader on a miss. A caller asking for a
+            query that is already being loaded waits for that load instead of sending it again.
+            Failed loads (None) are not cached.
+
+            Arguments:
+                self: self@ResultCache
+                key (str): query
+                loader: callable returning the result of the query
+                timeout (float): maximum number of seconds to wait for the load of another caller,
+                                 raises TimeoutError when exceeded
+        '''
+        expires = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.__lock:
+                if key in self.__entries:
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return self.__entries[key]
+                event = self.__loading.get(key)
+                if event is None:
+                    event = self.__loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another caller is loading the query, its result is picked up on the next pass
+            if not event.wait(None if expires is None else max(expires - time.monotonic(), 0)):
+                raise TimeoutError("Timed out waiting for the same query loaded by another caller")
+            with self.__lock:
+                if key not in self.__entries and key not in self.__loading:
+                    # That load failed, load the query ourselves
+                    self.__loading[key] = event = threading.Event()
+                    self.misses += 1
+                    break
+
+        value = None
+        try:
+            value = loader()
+        finally:
+            with self.__lock:
+                if value is not None:
+                    self.__store(key, value)
+                del self.__loading[key]
+            event.set()
+        return value
+
+    def clear(self):
+        '''
+            Remove every cached result
+
+            Arguments:
+                self: self@ResultCache
+        '''
+        with self.__lock:
+            self.__entries.clear()
+            self.size = 0
@@ -0,0 +1,262 @@
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import threading
+import time
+from collections import namedtuple
+import requests
+
+# One recorded exchange; the body is stored in the bodies file at offset, the times are the
+# seconds until the first byte of the body (or the headers of an empty one) arrived and until
+# the whole body was received
+Entry = namedtuple("Entry", ["key", "method", "url", "data", "status", "headers", "offset", "length",
+                             "first_byte", "elapsed"])
+
+
+# Size of the chunks a recorded body is read in
+CHUNK_SIZE = 64 * 1024
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    '''
+        Raised when a request has not been recorded; the connector reports it like a connection error
+    '''
+
+
+def request_key(method: str, url: str, data: dict = None) -> str:
+    '''
+        Key of a request in a cassette, from its method, URL and form data
+
+        Arguments:
+            method (str): HTTP method
+            url (str): requested URL
+            data (dict): form data of the request
+    '''
+    text = json.dumps([method.upper(), url, sorted((data or {}).items())], ensure_ascii=False)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class Cassette:
+    '''
+        Cassette stores recorded request/response pairs on disk: the bodies one after the other
+        in "<path>.bodies", memory-mapped for replay, and one JSON line per exchange in
+        "<path>.index", loaded into a dictionary for lookups by request key
+    '''
+
+    def __init__(self, path: str):
+        '''
+            Open a cassette, creating it if it does not exist
+
+            Arguments:
+                self: self@Cassette
+                path (str): path of the cassette without extension
+        '''
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__entries = {}  # Recorded entries, by request key, in recording order
+        self.__cursors = {}  # Next entry to replay, by request key
+        self.__map = None
+        self.__size = 0  # Size of the bodies file when it was mapped
+        self.__bodies = open(f"{path}.bodies", "ab+")
+        self.__index = open(f"{path}.index", "a+", encoding="utf-8")
+        self.__index.seek(0)
+        for line in self.__index:
+            if line.strip():
+                entry = Entry(**json.loads(line))
+                self.__entries.setdefault(entry.key, []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self.__entries.values())
+
+    def record(self, method: str, url: str, data: dict, status: int, headers: dict, body: bytes,
+               first_byte: float, elapsed: float) -> Entry:
+        '''
+            Append an exchange to the cassette
+
+            Arguments:
+                self: self@Cassette
+                method (str): HTTP method
+                url (str): requested URL
+                data (dict): form data of the request
+                status (int): HTTP status of the response
+                headers (dict): headers of the response
+                body (bytes): body of the response
+                first_byte (float): seconds until the first byte of the body arrived
+                elapsed (float): seconds until the whole body was received
+        '''
+        with self.__lock:
+            self.__bodies.seek(0, os.SEEK_END)
+            offset = self.__bodies.tell()
+            self.__bodies.write(body)
+            self.__bodies.flush()
+            entry = Entry(request_key(method, url, data), method.upper(), url, data, status, dict(headers),
+                          offset, len(body), first_byte, elapsed)
+            self.__index.write(json.dumps(entry._asdict()) + "\n")
+            self.__index.flush()
+            self.__entries.setdefault(entry.key, []).append(entry)
+            return entry
+
+    def lookup(self, method: str, url: str, data: dict = None) -> Entry:
+        '''
+            Recorded exchange of a request; a request recorded several times is replayed in
+            the recorded order, the last response is repeated afterwards
+
+            Arguments:
+                self: self@Cassette
+                method (str): HTTP method
+                url (str): requested URL
+                data (dict): form data of the request
+        '''
+        key = request_key(method, url, data)
+        with self.__lock:
+            entries = self.__entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded response for {method.upper()} {url} in cassette {self.path}")
+            cursor = self.__cursors.get(key, 0)
+            self.__cursors[key] = min(cursor + 1, len(entries) - 1)
+            return entries[cursor]
+
+    def body(self, entry: Entry) -> memoryview:
+        '''
+            Recorded body of an exchange, read from the memory-mapped bodies file without copying
+
+            Arguments:
+                self: self@Cassette
+                entry (Entry): recorded exchange
+        '''
+        if entry.length == 0:
+            return memoryview(b"")
+        with self.__lock:
+            # Bodies recorded after the file was mapped need a new mapping
+            if self.__map is None or entry.offset + entry.length > self.__size:
+                self.__size = os.fstat(self.__bodies.fileno()).st_size
+                self.__map = mmap.mmap(self.__bodies.fileno(), self.__size, access=mmap.ACCESS_READ)
+            return memoryview(self.__map)[entry.offset:entry.offset + entry.length]
+
+    def close(self):
+        with self.__lock:
+            self.__map = None
+            self.__bodies.close()
+            self.__index.close()
+
+
+class RecordedResponse:
+    '''
+        RecordedResponse answers like a requests response with a recorded exchange; with timing
+        it waits as long as the original transfer did, spread over the body chunks
+    '''
+
+    def __init__(self, entry: Entry, body, timing: bool = False, speed: float = 1.0):
+        self.status_code = entry.status
+        self.headers = requests.structures.CaseInsensitiveDict(entry.headers)
+        self.url = entry.url
+        self.__body = body
+        self.__transfer = max(entry.elapsed - entry.first_byte, 0.0) / speed if timing else 0.0
+
+    @property
+    def content(self) -> bytes:
+        if self.__transfer:
+            time.sleep(self.__transfer)
+            self.__transfer = 0.0
+        return bytes(self.__body)
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", "replace")
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def iter_content(self, chunk_size: int = 1):
+        chunk_size = chunk_size or len(self.__body) or 1
+        chunks = max(-(-len(self.__body) // chunk_size), 1)
+        for start in range(0, len(self.__body), chunk_size):
+            if self.__transfer:
+                time.sleep(self.__transfer / chunks)
+            yield bytes(self.__body[start:start + chunk_size])
+
+    def close(self):
+        pass
+
+
+class RecordingTransport:
+    '''
+        RecordingTransport sends requests through another transport and records every exchange
+    '''
+
+    def __init__(self, cassette: Cassette, transport=requests):
+        '''
+            Initialization of the transport
+
+            Arguments:
+                self: self@RecordingTransport
+                cassette (Cassette): cassette the exchanges are appended to
+                transport: transport sending the requests, the requests module by default
+        '''
+        self.cassette = cassette
+        self.transport = transport
+
+    def __exchange(self, method: str, url: str, data: dict = None, **kwargs) -> RecordedResponse:
+        # The body is streamed so that the wait for the first byte is told apart from the transfer
+        kwargs["stream"] = True
+        start = time.perf_counter()
+        response = getattr(self.transport, method)(url, data=data, **kwargs) if data is not None \
+            else getattr(self.transport, method)(url, **kwargs)
+        try:
+            # A read of a whole chunk would wait for the chunk, the first byte is read on its own
+            chunks = list(itertools.islice(response.iter_content(1), 1))
+            first_byte = time.perf_counter() - start
+            chunks.extend(response.iter_content(CHUNK_SIZE))
+        finally:
+            response.close()
+        elapsed = time.perf_counter() - start
+        body = b"".join(chunks)
+        entry = self.cassette.record(method, url, data, response.status_code, response.headers, body,
+                                     first_byte if body else elapsed, elapsed)
+        return RecordedResponse(entry, body)
+
+    def post(self, url: str, data: dict = None, **kwargs) -> RecordedResponse:
+        return self.__exchange("post", url, data, **kwargs)
+
+    def get(self, url: str, **kwargs) -> RecordedResponse:
+        return self.__exchange("get", url, **kwargs)
+
+
+class ReplayTransport:
+    '''
+        ReplayTransport answers requests from a cassette without the network, optionally as
+        slowly as the recorded exchanges were
+    '''
+
+    def __init__(self, cassette: Cassette, timing: bool = False, speed: float = 1.0):
+        '''
+            Initialization of the transport
+
+            Arguments:
+                self: self@ReplayTransport
+                cassette (Cassette): cassette holding the exchanges
+                timing (bool): whether the recorded waiting and transfer times are emulated
+                speed (float): factor the emulated times are divided by, e.g. 2 for twice as fast
+        '''
+        self.cassette = cassette
+        self.timing = timing
+        self.speed = speed
+
+    def __replay(self, method: str, url: str, data: dict = None, timeout: float = None) -> RecordedResponse:
+        entry = self.cassette.lookup(method, url, data)
+        if self.timing:
+            wait = entry.first_byte / self.speed
+            if timeout is not None and wait > timeout:
+                time.sleep(timeout)
+                raise requests.exceptions.Timeout(f"Recorded response of {url} arrived after {wait:.3f}s")
+            time.sleep(wait)
+        return RecordedResponse(entry, self.cassette.body(entry), self.timing, self.speed)
+
+    def post(self, url: str, data: dict = None, timeout: float = None, **kwargs) -> RecordedResponse:
+        return self.__replay("post", url, data, timeout)
+
+    def get(self, url: str, timeout: float = None, **kwargs) -> RecordedResponse:
+        return self.__replay("get", url, None, timeout)
@@ -0,0 +1,314 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from DBC import DBC
+from DCO import DCO, AxisSubset
+from journal import JobJournal, replace_durably
+
+# File extension of the results by encoding format, results without encoding are text
+EXTENSIONS = {
+    "text/csv": "csv", "csv": "csv",
+    "application/json": "json", "json": "json",
+    "image/png": "png", "png": "png",
+    "image/jpeg": "jpg", "jpeg": "jpg",
+    "image/tiff": "tif", "tiff": "tif",
+    "application/netcdf": "nc", "netcdf": "nc",
+    "application/octet-stream": "bin",
+}
+STRING = re.compile(r'"([^"\\]+)"')
+UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+OPERATIONS = ("min", "max", "sum", "count", "avg")
+
+
+def read_entries(paths: list):
+    '''
+        Entries of the input files, one at a time: every line of a JSONL file or of the
+        standard input is an entry, any other file is a single query
+
+        Arguments:
+            paths (list): input paths, "-" for the standard input
+    '''
+    for path in paths:
+        if path != "-" and not path.endswith((".jsonl", ".ndjson")):
+            with open(path) as file:
+                yield {"id": os.path.splitext(os.path.basename(path))[0], "query": file.read()}
+            continue
+        file = sys.stdin if path == "-" else open(path)
+        try:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    # Reported as a failed entry instead of stopping the batch
+                    yield {"invalid": f"Invalid JSON: {e}"}
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+
+def query_of(entry: dict, dbc) -> str:
+    '''
+        WCPS query of an entry: its "query", or the query built from a DCO spec such as
+        {"coverages": ["AvgLandTemp"], "subsets": [["ansi", "2015-05"], ["Lat", 25, 30]],
+         "where": "...", "operation": "avg", "format": "text/csv", "scale": 0.5}
+
+        Arguments:
+            entry (dict): input entry
+            dbc: database connector of the DCO
+    '''
+    if not isinstance(entry, dict) or "invalid" in entry:
+        raise ValueError(entry.get("invalid") if isinstance(entry, dict) else "An entry must be a JSON object")
+    if entry.get("query"):
+        return entry["query"]
+    if not entry.get("coverages"):
+        raise ValueError("An entry needs a query or coverages")
+    variable = entry.get("variable", "$c")
+    dco = DCO(dbc).select(variable, entry["coverages"])
+    if entry.get("subsets"):
+        dco.subset(variable, [AxisSubset(*subset) for subset in entry["subsets"]])
+    if entry.get("where"):
+        dco.where(entry["where"])
+    operation = entry.get("operation")
+    if operation is not None:
+        if operation not in OPERATIONS:
+            raise ValueError(f"Operation must be one of: {', '.join(OPERATIONS)}")
+        getattr(dco, operation)()
+    if entry.get("format"):
+        dco.set_format(entry["format"])
+    if entry.get("scale") is not None:
+        dco.scale(entry["scale"])
+    return dco.build_query()
+
+
+def entry_name(entry: dict) -> str:
+    '''
+        File name of a result without extension given by the id of its entry, None without id
+
+        Arguments:
+            entry (dict): input entry
+    '''
+    if not isinstance(entry, dict) or entry.get("id") is None:
+        return None
+    return UNSAFE.sub("_", str(entry["id"])).strip("._") or None
+
+
+def output_name(index: int, entry: dict, query: str) -> str:
+    '''
+        File name of a result, the same for the same input: the entry id if it has one,
+        otherwise its position and a hash of the query, with the extension of its format
+
+        Arguments:
+            index (int): position of the entry in the input, from 0
+            entry (dict): input entry
+            query (str): query of the entry
+    '''
+    extension = "txt"
+    position = query.find("encode")
+    if position >= 0:
+        formats = [EXTENSIONS[text.lower()] for text in STRING.findall(query, position) if text.lower() in EXTENSIONS]
+        extension = formats[-1] if formats else "bin"
+    if entry.get("id") is not None:
+        name = entry_name(entry) or f"{index:06d}"
+    else:
+        name = f"{index:06d}-{hashlib.sha256(query.encode()).hexdigest()[:12]}"
+    return f"{name}.{extension}"
+
+
+class BatchRunner:
+    '''
+        BatchRunner executes the entries of a batch with a bounded number of queries in flight,
+        writing every result as soon as it arrives, so memory stays constant whatever the size
+        of the batch. With a journal, entries completed by a previous run are skipped.
+    '''
+
+    def __init__(self, dbc, output: str, concurrency: int = 4, deadline: float = None,
+                 progress=None, progress_interval: float = 5.0, journal: JobJournal = None, verify: bool = False):
+        '''
+            Initialization of the runner
+
+            Arguments:
+                self: self@BatchRunner
+                dbc: database connector executing the queries
+                output (str): directory the results are written to
+                concurrency (int): maximum number of queries in flight
+                deadline (float): seconds after which a query is abandoned, None for no limit
+                progress: text file progress lines are written to, None for no progress
+                progress_interval (float): seconds between progress lines
+                journal (JobJournal): journal of the units of the batch, None to run every entry
+                verify (bool): check the checksums of the results of completed entries before skipping them
+        '''
+        self.dbc = dbc
+        self.output = output
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.journal = journal
+        self.verify = verify
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes = 0
+
+    def __execute(self, index: int, entry: dict) -> dict:
+        started = time.perf_counter()
+        record = {"index": index, "id": entry.get("id") if isinstance(entry, dict) else None}
+        try:
+            query = query_of(entry, self.dbc)
+            record["file"] = output_name(index, entry, query)
+            target = os.path.join(self.output, record["file"])
+            if self.journal is None:
+                self.__fetch(entry, query, target, record)
+            elif self.journal.completed(target, query, self.verify):
+                record["skipped"] = True
+            else:
+                self.journal.begin(target, query)
+                try:
+                    self.__fetch(entry, query, target, record)
+                finally:
+                    if "error" in record or "bytes" not in record:
+                        self.journal.fail(target, record.get("error", "interrupted"))
+        except (ValueError, TypeError, TimeoutError, OSError) as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["ok"] = "error" not in record
+        record["ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return record
+
+    def __fetch(self, entry: dict, query: str, target: str, record: dict):
+        # The result is streamed to disk as it arrives and renamed into place when complete
+        temporary = f"{target}.part"
+        try:
+            with open(temporary, "wb") as file:
+                size = self.dbc.execute_query_to(query, file, priority=entry.get("priority"),
+                                                 deadline=entry.get("deadline", self.deadline))
+                if size is not None:
+                    file.flush()
+                    os.fsync(file.fileno())
+            if size is None:
+                record["error"] = "query failed"
+            elif self.journal is not None:
+                self.journal.commit(target, temporary)
+                record["bytes"] = size
+            else:
+                replace_durably(temporary, target)
+                record["bytes"] = size
+        except TimeoutError as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def run(self, entries) -> dict:
+        '''
+            Execute the entries and write a manifest line per entry, in completion order
+
+            Arguments:
+                self: self@BatchRunner
+                entries: iterable of input entries, read lazily
+        '''
+        os.makedirs(self.output, exist_ok=True)
+        started = time.perf_counter()
+        reported = started
+        pending = set()
+        names = set()
+        with open(os.path.join(self.output, "manifest.jsonl"), "w") as manifest, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            def collect(futures):
+                for future in futures:
+                    record = future.result()
+                    manifest.write(json.dumps(record) + "\n")
+                    self.completed += 1
+                    self.failed += not record["ok"]
+                    self.skipped += record.get("skipped", False)
+                    self.bytes += record.get("bytes", 0)
+                manifest.flush()
+
+            def report(in_flight):
+                nonlocal reported
+                if self.progress is not None and time.perf_counter() - reported >= self.progress_interval:
+                    reported = time.perf_counter()
+                    self.progress.write(f"{self.completed} done, {self.skipped} skipped, {self.failed} failed, "
+                                        f"{in_flight} in flight, "
+                                        f"{self.bytes / 1e6:.1f} MB, "
+                                        f"{self.completed / (reported - started):.1f} queries/s\n")
+                    self.progress.flush()
+
+            for index, entry in enumerate(entries):
+                name = entry_name(entry)
+                if name is not None:
+                    # Entries with the same id would overwrite each other's result, the first one wins
+                    if name in names:
+                        entry = {"id": entry["id"], "invalid": f"Duplicate id {entry['id']!r}"}
+                    names.add(name)
+                # Entries are read only as fast as queries complete
+                while len(pending) >= self.concurrency:
+                    done, pending = wait(pending, timeout=self.progress_interval, return_when=FIRST_COMPLETED)
+                    collect(done)
+                    report(len(pending))
+                pending.add(executor.submit(self.__execute, index, entry))
+            while pending:
+                done, pending = wait(pending, timeout=self.progress_interval, return_when=FIRST_COMPLETED)
+                collect(done)
+                report(len(pending))
+        return self.summary(time.perf_counter() - started)
+
+    def summary(self, seconds: float) -> dict:
+        return {"queries": self.completed, "skipped": self.skipped, "failed": self.failed, "bytes": self.bytes, "seconds": round(seconds, 3),
+                "queries_per_s": self.completed / seconds if seconds else 0.0,
+                "bytes_per_s": self.bytes / seconds if seconds else 0.0, "output": self.output}
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog="wdc", description="Execute WCPS queries or DCO specs in parallel and "
+                                                             "write every result to a file")
+    parser.add_argument("inputs", nargs="*", default=["-"],
+                        help='JSONL files with one {"query": ...} or DCO spec per line, query files, "-" for stdin')
+    parser.add_argument("-o", "--output", default="results", help="directory of the results and manifest.jsonl")
+    parser.add_argument("--endpoint", default="https://ows.rasdaman.org/rasdaman/ows")
+    parser.add_argument("-j", "--concurrency", type=int, default=4, help="queries in flight")
+    parser.add_argument("--retries", type=int, default=2, help="attempts after a failure")
+    parser.add_argument("--backoff", type=float, default=0.5, help="seconds before the first retry")
+    parser.add_argument("--deadline", type=float, help="seconds after which a query is abandoned")
+    parser.add_argument("--cache", type=int, default=0, metavar="MB",
+                        help="cache results up to this size so repeated queries are sent once")
+    parser.add_argument("--journal", help="journal of the batch, by default journal.sqlite in the output directory")
+    parser.add_argument("--no-journal", action="store_true", help="run every entry, even those done by a previous run")
+    parser.add_argument("--verify", action="store_true",
+                        help="check the checksums of the results of completed entries before skipping them")
+    parser.add_argument("--progress", type=float, default=5.0, metavar="SECONDS",
+                        help="seconds between progress lines on stderr, 0 for none")
+    options = parser.parse_args(arguments)
+
+    dbc = DBC(options.endpoint)
+    dbc.enable_retries(options.retries, options.backoff)
+    if options.cache:
+        dbc.enable_cache(max_entries=1_000_000, max_bytes=options.cache * 1024 * 1024)
+    journal = None
+    if not options.no_journal:
+        os.makedirs(options.output, exist_ok=True)
+        journal = JobJournal(options.journal or os.path.join(options.output, "journal.sqlite"))
+    runner = BatchRunner(dbc, options.output, options.concurrency, options.deadline,
+                         sys.stderr if options.progress else None, options.progress, journal, options.verify)
+    # Errors reported by the connector go to stderr, stdout only holds the summary
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            summary = runner.run(read_entries(options.inputs))
+    finally:
+        if journal is not None:
+            journal.close()
+    print(json.dumps(summary))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import threading
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    '''
+        Raised when a query is abandoned because its deadline passed or it was cancelled
+    '''
+
+
+class Deadline:
+    '''
+        Deadline is a cancellation token with an optional time limit. It is passed down the
+        execute paths so that HTTP timeouts, retries and outstanding tile fetches stop as soon
+        as the result is no longer wanted.
+    '''
+
+    def __init__(self, timeout: float = None):
+        '''
+            Initialization of the deadline
+
+            Arguments:
+                self: self@Deadline
+                timeout (float): seconds from now until the deadline, None for cancellation only
+        '''
+        self.expires = None if timeout is None else time.monotonic() + timeout
+        self.__cancelled = threading.Event()
+        self.__callbacks = []
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def of(deadline) -> 'Deadline':
+        '''
+            Deadline from a number of seconds or an existing Deadline, None stays None
+
+            Arguments:
+                deadline: None, seconds or Deadline
+        '''
+        if deadline is None or isinstance(deadline, Deadline):
+            return deadline
+        return Deadline(float(deadline))
+
+    def cancel(self):
+        '''
+            Cancel the work bound to the deadline and run the registered callbacks
+
+            Arguments:
+                self: self@Deadline
+        '''
+        with self.__lock:
+            if self.__cancelled.is_set():
+                return
+            self.__cancelled.set()
+            callbacks, self.__callbacks = self.__callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def child(self) -> 'Deadline':
+        '''
+            Deadline with the same time limit, cancelled with this one; cancelling the child
+            stops the work bound to it without cancelling this deadline. Remove the child's
+            cancel from the callbacks (remove_callback) once it is no longer used.
+
+            Arguments:
+                self: self@Deadline
+        '''
+        child = Deadline()
+        child.expires = self.expires
+        self.on_cancel(child.cancel)
+        return child
+
+    def on_cancel(self, callback):
+        '''
+            Register a callback run when the deadline is cancelled, at once if it already is
+
+            Arguments:
+                self: self@Deadline
+                callback: callable without arguments, e.g. closing a response
+        '''
+        with self.__lock:
+            if not self.__cancelled.is_set():
+                self.__callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self.__lock:
+            if callback in self.__callbacks:
+                self.__callbacks.remove(callback)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    @property
+    def expired(self) -> bool:
+        return self.cancelled or (self.expires is not None and time.monotonic() >= self.expires)
+
+    def remaining(self) -> float:
+        '''
+            Seconds left until the deadline, None without time limit, 0 once expired or cancelled
+
+            Arguments:
+                self: self@Deadline
+        '''
+        if self.cancelled:
+            return 0.0
+        if self.expires is None:
+            return None
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def check(self):
+        '''
+            Raise DeadlineExceeded if the deadline passed or was cancelled
+
+            Arguments:
+                self: self@Deadline
+        '''
+        if self.cancelled:
+            raise DeadlineExceeded("Query cancelled")
+        if self.expired:
+            raise DeadlineExceeded("Query deadline exceeded")
+
+    def timeout(self, limit: float = None) -> float:
+        '''
+            Timeout for a blocking call, bounded by the deadline; raises DeadlineExceeded if none is left
+
+            Arguments:
+                self: self@Deadline
+                limit (float): timeout used without time limit, None to wait forever
+        '''
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return limit
+        return remaining if limit is None else min(remaining, limit)
+
+    def sleep(self, seconds: float) -> bool:
+        '''
+            Sleep unless cancelled; returns False without sleeping if the deadline would pass first
+
+            Arguments:
+                self: self@Deadline
+                seconds (float): seconds to sleep
+        '''
+        remaining = self.remaining()
+        if remaining is not None and remaining <= seconds:
+            return False
+        return not self.__cancelled.wait(seconds)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import io
+import json
+import re
+from lazy import lazy_import
+
+np = lazy_import("numpy", globals(), "np")
+
+
+def decode_csv(data: bytes) -> np.ndarray:
+    '''
+        Decode a rasdaman CSV result into a NumPy array
+
+        Nested braces in the result ("{1,2},{3,4}") are used to restore the
+        shape of multidimensional results.
+
+        Arguments:
+            data (bytes): raw CSV result returned by the server, or any buffer holding it
+    '''
+    text = data if isinstance(data, str) else str(data, "utf-8")
+    text = text.strip()
+    # Count how deep the braces go to find the number of dimensions
+    depth = 0
+    max_depth = 0
+    for char in text:
+        if char == '{':
+            depth += 1
+            max_depth = max(max_depth, depth)
+        elif char == '}':
+            depth -= 1
+
+    # Without braces the result is a flat (or scalar) list of values
+    if max_depth == 0:
+        values = [float(value) for value in text.replace(',', ' ').split()]
+        return np.array(values[0] if len(values) == 1 else values)
+
+    # Rewrite the braces as JSON brackets and let the JSON parser build the nesting
+    text = re.sub(r'[\s,]+', ',', text.replace('{', '[').replace('}', ']'))
+    text = text.replace('[,', '[').replace(',]', ']')
+    rows = json.loads('[' + text + ']')
+    result = np.array(rows, dtype=float)
+    # A single outer pair of braces is not an extra dimension
+    return result[0] if result.shape[0] == 1 else result
+
+
+def decode_json(data: bytes) -> np.ndarray:
+    '''
+        Decode a rasdaman JSON result into a NumPy array
+
+        Arguments:
+            data (bytes): raw JSON result returned by the server, or any buffer holding it
+    '''
+    if not isinstance(data, (str, bytes, bytearray)):
+        data = str(data, "utf-8")
+    return np.array(json.loads(data), dtype=float)
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    '''
+        Decode a PNG result into a NumPy array of pixels, channels last. Requires Pillow.
+
+        Arguments:
+            data (bytes): raw PNG result returned by the server, or any buffer holding it
+    '''
+    from PIL import Image
+    with Image.open(io.BytesIO(data)) as image:
+        return np.asarray(image)
+
+
+def decode_netcdf(data: bytes) -> np.ndarray:
+    '''
+        Decode a netCDF result into a NumPy array of its data variable; the variables of
+        a multi-band result are stacked along a last axis. Requires netCDF4.
+
+        Arguments:
+            data (bytes): raw netCDF result returned by the server, or any buffer holding it
+    '''
+    import netCDF4
+    with netCDF4.Dataset("result.nc", memory=bytes(data)) as dataset:
+        # Coordinate variables share the name of their dimension
+        bands = [np.asarray(variable[:]) for name, variable in dataset.variables.items()
+                 if name not in dataset.dimensions]
+    if not bands:
+        raise ValueError("The netCDF result has no data variable")
+    return bands[0] if len(bands) == 1 else np.stack(bands, axis=-1)
+
+
+DECODERS = {
+    "text/csv": decode_csv,
+    "application/json": decode_json,
+    "image/png": decode_png,
+    "application/netcdf": decode_netcdf,
+}
+
+
+def decode(data: bytes, format: str) -> np.ndarray:
+    '''
+        Decode a result with the decoder registered for its format
+
+        Arguments:
+            data (bytes): raw result returned by the server
+            format (str): format the result was encoded in
+    '''
+    if format not in DECODERS:
+        raise ValueError(f"No decoder available for format '{format}'")
+    return DECODERS[format](data)
@@ -3,5 +3,10 @@ class ErrorMessage:
     structure_not_defined = "Initial structude of the query has not been defined"
     operation_is_already_pending = "Sum, min, max, count, avg is already pending"
     variable_not_defined = "Variable is not defined"
+    invalid_operation = "Operation is not valid for the selected variables"
+    time_range_not_defined = "Time axis subset with a start and an end has not been defined"
+    invalid_period = "Period must be one of: month, season, year"
+    budget_exceeded = "Query exceeds the budget"
+    time_axis_snapped = "Time axis has been snapped to grid indices, snap to the grid after the temporal reduction"
 
     missing_paramethers = "You did not specify any paramether"
\ No newline at end of file
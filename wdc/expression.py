@@ -0,0 +1,265 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from lazy import lazy_import
+
+np = lazy_import("numpy", globals(), "np")
+
+# WCPS operators and the names of the NumPy functions used to evaluate them locally
+BINARY_OPERATORS = {
+    "+": "add",
+    "-": "subtract",
+    "*": "multiply",
+    "/": "true_divide",
+    ">": "greater",
+    "<": "less",
+    ">=": "greater_equal",
+    "<=": "less_equal",
+    "=": "equal",
+    "!=": "not_equal",
+}
+
+# WCPS functions and the names of their NumPy counterparts
+FUNCTIONS = {
+    "abs": "abs",
+    "sqrt": "sqrt",
+    "exp": "exp",
+    "log": "log10",
+    "ln": "log",
+    "sin": "sin",
+    "cos": "cos",
+    "tan": "tan",
+}
+
+
+class Expr(ABC):
+    '''
+        Expr is a node of a band-math expression over selected variables.
+        Nodes are compared structurally, so repeated subexpressions can be shared.
+    '''
+
+    def __init__(self, key: tuple, children: tuple = ()):
+        self.key = key  # Structural identity of the node
+        self.children = children  # Operand nodes
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, Expr) and self.key == other.key
+
+    def __binary(self, operator: str, other, reverse: bool = False) -> 'Expr':
+        other = other if isinstance(other, Expr) else Const(other)
+        if reverse:
+            return BinOp(operator, other, self)
+        return BinOp(operator, self, other)
+
+    def __add__(self, other): return self.__binary("+", other)
+    def __radd__(self, other): return self.__binary("+", other, reverse=True)
+    def __sub__(self, other): return self.__binary("-", other)
+    def __rsub__(self, other): return self.__binary("-", other, reverse=True)
+    def __mul__(self, other): return self.__binary("*", other)
+    def __rmul__(self, other): return self.__binary("*", other, reverse=True)
+    def __truediv__(self, other): return self.__binary("/", other)
+    def __rtruediv__(self, other): return self.__binary("/", other, reverse=True)
+    def __gt__(self, other): return self.__binary(">", other)
+    def __lt__(self, other): return self.__binary("<", other)
+    def __ge__(self, other): return self.__binary(">=", other)
+    def __le__(self, other): return self.__binary("<=", other)
+    def __neg__(self): return BinOp("-", Const(0), self)
+
+    def equals(self, other) -> 'Expr':
+        '''
+            Cell-wise equality ("==" is kept for structural comparison)
+
+            Arguments:
+                self: self@Expr
+                other: expression or number to compare with
+        '''
+        return self.__binary("=", other)
+
+    @abstractmethod
+    def render(self, names: dict) -> str:
+        pass
+
+    @abstractmethod
+    def compute(self, values: list, arrays: dict):
+        pass
+
+
+class Var(Expr):
+    '''
+        Reference to a selected variable, optionally subsetted
+    '''
+
+    def __init__(self, name: str, subset_query: str = ""):
+        super().__init__(("var", name, subset_query))
+        self.name = name
+        self.subset_query = subset_query
+
+    def render(self, names: dict) -> str:
+        return f"{self.name}{self.subset_query}"
+
+    def compute(self, values: list, arrays: dict):
+        return arrays[self.name]
+
+
+class Const(Expr):
+    '''
+        Numeric constant
+    '''
+
+    def __init__(self, value):
+        super().__init__(("const", value))
+        self.value = value
+
+    def render(self, names: dict) -> str:
+        return str(self.value)
+
+    def compute(self, values: list, arrays: dict):
+        return self.value
+
+
+class BinOp(Expr):
+    '''
+        Binary operation between two expressions
+    '''
+
+    def __init__(self, operator: str, left: Expr, right: Expr):
+        super().__init__(("binop", operator, left.key, right.key), (left, right))
+        self.operator = operator
+
+    def render(self, names: dict) -> str:
+        left, right = (names.get(child, None) or child.render(names) for child in self.children)
+        return f"({left} {self.operator} {right})"
+
+    def compute(self, values: list, arrays: dict):
+        return getattr(np, BINARY_OPERATORS[self.operator])(values[0], values[1])
+
+
+class Func(Expr):
+    '''
+        WCPS function applied to an expression
+    '''
+
+    def __init__(self, function: str, argument: Expr):
+        if function not in FUNCTIONS:
+            raise ValueError(f"Unsupported function '{function}'")
+        super().__init__(("func", function, argument.key), (argument,))
+        self.function = function
+
+    def render(self, names: dict) -> str:
+        argument = names.get(self.children[0], None) or self.children[0].render(names)
+        return f"{self.function}({argument})"
+
+    def compute(self, values: list, arrays: dict):
+        return getattr(np, FUNCTIONS[self.function])(values[0])
+
+
+def count_uses(outputs: dict) -> dict:
+    '''
+        Count how many times each distinct node is used across all outputs.
+        A repeated node is counted once per use and its operands are not revisited.
+
+        Arguments:
+            outputs (dict): output name mapped to its expression
+    '''
+    uses = {}
+    stack = list(outputs.values())
+    while stack:
+        node = stack.pop()
+        uses[node] = uses.get(node, 0) + 1
+        # Operands of a shared node belong to its single definition
+        if uses[node] == 1:
+            stack.extend(node.children)
+    return uses
+
+
+def topological_order(outputs: dict) -> list:
+    '''
+        List the distinct nodes of all outputs with operands before the nodes using them
+
+        Arguments:
+            outputs (dict): output name mapped to its expression
+    '''
+    order = []
+    visited = set()
+
+    def visit(node):
+        if node in visited:
+            return
+        visited.add(node)
+        for child in node.children:
+            visit(child)
+        order.append(node)
+
+    for expression in outputs.values():
+        visit(expression)
+    return order
+
+
+def compile_wcps(outputs: dict, prefix: str = "$let") -> tuple:
+    '''
+        Compile band-math expressions to WCPS, hoisting shared subexpressions
+
+        Every subset reference or subexpression used more than once is bound once in
+        a let clause and referenced by name, so the server evaluates it a single time.
+        Returns the let clause (empty if nothing is shared) and the return expression.
+
+        Arguments:
+            outputs (dict): output name mapped to its expression
+            prefix (str): prefix of the names of hoisted subexpressions
+    '''
+    uses = count_uses(outputs)
+    names = {}
+    bindings = []
+    for node in topological_order(outputs):
+        # Constants are cheaper to repeat than to bind
+        if uses[node] > 1 and not isinstance(node, Const):
+            bindings.append(f"{prefix}{len(names)} := {node.render(names)}")
+            names[node] = f"{prefix}{len(names)}"
+
+    rendered = {name: names.get(expression, None) or expression.render(names)
+                for name, expression in outputs.items()}
+    if len(rendered) == 1 and None in rendered:
+        # A single unnamed output is returned as it is
+        result = rendered[None]
+    else:
+        # Several outputs are returned together as the bands of one coverage
+        result = "{" + "; ".join(f"{name}: {value}" for name, value in rendered.items()) + "}"
+
+    let_clause = f"let {', '.join(bindings)}" if bindings else ""
+    return let_clause, result
+
+
+def evaluate(outputs: dict, arrays: dict, chunk_size: int = 1 << 16) -> dict:
+    '''
+        Evaluate band-math expressions on local arrays, chunk by chunk
+
+        Each shared subexpression is computed once per chunk and the temporaries
+        never exceed the chunk size, whatever the size of the arrays.
+
+        Arguments:
+            outputs (dict): output name mapped to its expression
+            arrays (dict): variable name mapped to its NumPy array
+            chunk_size (int): number of cells evaluated at once
+    '''
+    order = topological_order(outputs)
+    variables = {name: np.asarray(array) for name, array in arrays.items()}
+    shape = np.broadcast_shapes(*(array.shape for array in variables.values()))
+    flat = {name: np.broadcast_to(array, shape).reshape(-1) for name, array in variables.items()}
+    size = int(np.prod(shape))
+
+    results = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, max(size, 1), chunk_size):
+            chunk = {name: array[start:start + chunk_size] for name, array in flat.items()}
+            computed = {}
+            for node in order:
+                computed[node] = node.compute([computed[child] for child in node.children], chunk)
+            for name, expression in outputs.items():
+                value = np.broadcast_to(computed[expression], (min(chunk_size, size - start),))
+                if name not in results:
+                    results[name] = np.empty(size, dtype=np.result_type(value))
+                results[name][start:start + chunk_size] = value
+
+    return {name: result.reshape(shape) for name, result in results.items()}
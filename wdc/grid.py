@@ -0,0 +1,217 @@
+import math
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+# Georeferencing of one grid axis; coordinates lists the cell coordinates of irregular axes
+AxisReference = namedtuple("AxisReference", ["axis", "low", "high", "origin", "resolution", "coordinates"])
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Cells whose border a value falls on within this tolerance are resolved to the upper cell
+TOLERANCE = 1e-9
+
+
+def to_coordinate(value) -> float:
+    '''
+        Convert a subset value to a number; dates become days since 1970-01-01
+
+        Arguments:
+            value: number, numeric string or ISO date string (e.g. "2015-05")
+    '''
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().strip('"')
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    # Complete partial dates ("2015" or "2015-05") and drop the Z suffix
+    text = text.replace("Z", "+00:00")
+    if len(text) == 4:
+        text += "-01-01"
+    elif len(text) == 7:
+        text += "-01"
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH).total_seconds() / 86400
+
+
+def from_coordinate(coordinate: float, template):
+    '''
+        Convert a coordinate back to the kind of value of a subset; dates are written in ISO format
+
+        Arguments:
+            coordinate (float): number, or days since 1970-01-01 for dates
+            template: original subset value
+    '''
+    if isinstance(template, str):
+        try:
+            float(template)
+        except ValueError:
+            moment = EPOCH + timedelta(days=coordinate)
+            return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+    return round(coordinate, 9)
+
+
+def base_axis(axis: str) -> str:
+    '''
+        Axis label without its CRS, e.g. 'Lat:"CRS:1"' -> 'Lat'
+
+        Arguments:
+            axis (str): axis of an AxisSubset
+    '''
+    return axis.split(":")[0]
+
+
+def axis_references(description: dict) -> dict:
+    '''
+        Georeferencing of every axis of a coverage description, by axis label.
+        Axes without origin or offset vector have no origin and resolution.
+
+        Arguments:
+            description (dict): coverage description returned by DBC.describe_coverage
+    '''
+    origin = description.get("origin") or []
+    offsets = description.get("offset_vectors") or []
+    coefficients = description.get("coefficients") or {}
+
+    references = {}
+    for index, axis in enumerate(description["axis_labels"]):
+        low, high = int(description["low_limits"][index]), int(description["high_limits"][index])
+        start, resolution, coordinates = None, None, None
+        try:
+            start = to_coordinate(origin[index])
+            resolution = next(float(value) for value in offsets[index] if float(value) != 0)
+        except (IndexError, ValueError, StopIteration):
+            start, resolution = None, None
+
+        if axis in coefficients and start is not None:
+            # Irregular axis: coefficients are absolute coordinates (dates) or multiples of the offset
+            coordinates = []
+            for coefficient in coefficients[axis]:
+                text = str(coefficient).strip('"')
+                try:
+                    coordinates.append(start + float(text) * resolution)
+                except ValueError:
+                    coordinates.append(to_coordinate(text))
+            coordinates.sort()
+        references[axis] = AxisReference(axis, low, high, start, resolution, coordinates)
+    return references
+
+
+def grid_indices(reference: AxisReference, values) -> list:
+    '''
+        Grid indices of subset values on an axis, None if the axis is not georeferenced.
+        A slice gives one index, a trim gives the first and the last index of the cells it selects.
+        The ends of a trim are clamped to the axis, a slice or a trim outside of it raises a ValueError.
+
+        Arguments:
+            reference (AxisReference): georeferencing of the axis
+            values: raw values of the subset
+    '''
+    coordinates = [to_coordinate(value) for value in values]
+    if reference.coordinates:
+        # Irregular axes are resolved with a binary search over the cell coordinates
+        cells = reference.coordinates
+        if len(coordinates) == 1:
+            if not cells[0] - TOLERANCE <= coordinates[0] <= cells[-1] + TOLERANCE:
+                raise ValueError(f"Slice {values[0]} is outside of axis {reference.axis}")
+            indices = [bisect_right(cells, coordinates[0] + TOLERANCE) - 1]
+        else:
+            low, high = min(coordinates), max(coordinates)
+            indices = [bisect_left(cells, low - TOLERANCE), bisect_right(cells, high + TOLERANCE) - 1]
+            if indices[0] > indices[1]:
+                raise ValueError(f"Trim {values[0]}:{values[1]} selects no cell of axis {reference.axis}")
+        return [reference.low + index for index in indices]
+
+    if reference.resolution is None:
+        return None
+    # The origin is the center of the first cell, values on a cell border go to the upper cell
+    indices = [reference.low + math.floor((coordinate - reference.origin) / reference.resolution + 0.5 + TOLERANCE)
+               for coordinate in coordinates]
+    if len(indices) == 1:
+        if not reference.low <= indices[0] <= reference.high:
+            raise ValueError(f"Slice {values[0]} is outside of axis {reference.axis}")
+        return indices
+    indices = sorted(indices)
+    if indices[1] < reference.low or indices[0] > reference.high:
+        raise ValueError(f"Trim {values[0]}:{values[1]} selects no cell of axis {reference.axis}")
+    return [max(indices[0], reference.low), min(indices[1], reference.high)]
+
+
+def cell_coordinate(reference: AxisReference, index: int) -> float:
+    '''
+        Coordinate of the center of a grid cell
+
+        Arguments:
+            reference (AxisReference): georeferencing of the axis
+            index (int): grid index of the cell
+    '''
+    if reference.coordinates:
+        return reference.coordinates[index - reference.low]
+    return reference.origin + (index - reference.low) * reference.resolution
+
+
+class GridTranslator:
+    '''
+        GridTranslator snaps geographic and temporal subsets to the grid of a coverage, so that
+        subsets selecting the same cells produce byte-identical queries
+    '''
+
+    def __init__(self, dbc):
+        '''
+            Initialization of the translator
+
+            Arguments:
+                self: self@GridTranslator
+                dbc: database connector used to describe coverages
+        '''
+        self.dbc = dbc
+        self.__references = {}  # Axis georeferencing, by coverage id
+
+    def references(self, coverage_id: str) -> dict:
+        '''
+            Axis georeferencing of a coverage, requested from the server once per coverage
+
+            Arguments:
+                self: self@GridTranslator
+                coverage_id (str): coverage id
+        '''
+        if coverage_id not in self.__references:
+            description = self.dbc.describe_coverage(coverage_id)
+            if description is None:
+                raise ValueError(f"Coverage {coverage_id} could not be described")
+            self.__references[coverage_id] = axis_references(description)
+        return self.__references[coverage_id]
+
+    def translate(self, coverage_id: str, axis_subsets: list, mode: str = "index") -> list:
+        '''
+            Snap subsets to the grid; subsets on axes that are not georeferenced are kept as they are
+
+            Arguments:
+                self: self@GridTranslator
+                coverage_id (str): coverage id
+                axis_subsets (list): list of AxisSubset objects
+                mode (str): "index" for integer grid subsets (Lat:"CRS:1"(i:j)),
+                            "coordinate" for the coordinates of the selected cell centers
+        '''
+        if mode not in ("index", "coordinate"):
+            raise ValueError("Mode must be one of: index, coordinate")
+
+        references = self.references(coverage_id)
+        translated = []
+        for axis_subset in axis_subsets:
+            reference = references.get(axis_subset.axis)
+            indices = grid_indices(reference, axis_subset.values) if reference else None
+            if indices is None:
+                translated.append(axis_subset)
+            elif mode == "index":
+                # New subsets are built with the class of the given ones
+                translated.append(type(axis_subset)(f'{axis_subset.axis}:"CRS:1"', *indices))
+            else:
+                values = [from_coordinate(cell_coordinate(reference, index), value)
+                          for index, value in zip(indices, axis_subset.values)]
+                translated.append(type(axis_subset)(axis_subset.axis, *values))
+        return translated
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS units (
+    target TEXT PRIMARY KEY,
+    query_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    checksum TEXT,
+    bytes INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated REAL NOT NULL
+)
+'''
+
+
+def checksum(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_durably(path: str, data: bytes):
+    '''
+        Write a file under a temporary name, flushed to disk and renamed when complete, so that
+        a crash leaves either the previous file or the whole new one, never a truncated one
+
+        Arguments:
+            path (str): path of the file
+            data (bytes): content of the file
+    '''
+    temporary = f"{path}.part"
+    with open(temporary, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    replace_durably(temporary, path)
+
+
+def replace_durably(temporary: str, path: str):
+    '''
+        Rename a complete temporary file, already flushed to disk, into place
+
+        Arguments:
+            temporary (str): path of the temporary file
+            path (str): path of the file
+    '''
+    os.replace(temporary, path)
+    if hasattr(os, "O_DIRECTORY"):
+        # The rename itself is durable once the directory is flushed
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+class JobJournal:
+    '''
+        JobJournal records the units of work of a long-running job in SQLite: the query hash,
+        target file, status, checksum and size of every unit. Running the same job again skips
+        the completed units and retries the others. A unit moves from running to writing (with
+        the checksum of its result) before its file is renamed into place, and to done after,
+        so a crash between the two is recovered without fetching the result again.
+    '''
+
+    def __init__(self, path: str):
+        '''
+            Open a journal, creating it if it does not exist
+
+            Arguments:
+                self: self@JobJournal
+                path (str): path of the SQLite database
+        '''
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.__connection.execute("PRAGMA journal_mode=WAL")
+        self.__connection.execute(SCHEMA)
+
+    def __execute(self, statement: str, parameters: tuple = ()) -> list:
+        with self.__lock:
+            return self.__connection.execute(statement, parameters).fetchall()
+
+    def unit(self, target: str) -> dict:
+        '''
+            Journal record of a unit, None if it was never planned
+
+            Arguments:
+                self: self@JobJournal
+                target (str): path of the output file of the unit
+        '''
+        rows = self.__execute("SELECT target, query_hash, status, checksum, bytes, attempts, error, updated "
+                              "FROM units WHERE target = ?", (target,))
+        if not rows:
+            return None
+        return dict(zip(("target", "query_hash", "status", "checksum", "bytes", "attempts", "error", "updated"),
+                        rows[0]))
+
+    def completed(self, target: str, query: str, verify: bool = False) -> bool:
+        '''
+            Whether a unit is done and its output is in place, so that it can be skipped
+
+            Arguments:
+                self: self@JobJournal
+                target (str): path of the output file of the unit
+                query (str): query of the unit; a unit recorded for another query is not done
+                verify (bool): compare the checksum of the output instead of its size only
+        '''
+        unit = self.unit(target)
+        if unit is None or unit["query_hash"] != checksum(query.encode()) or unit["status"] not in ("done", "writing"):
+            return False
+        if not os.path.exists(target) or os.path.getsize(target) != unit["bytes"]:
+            return False
+        if unit["status"] == "writing" or verify:
+            # A crash after the rename and before the journal update left a complete file
+            if file_checksum(target) != unit["checksum"]:
+                return False
+            if unit["status"] == "writing":
+                self.__set(target, "done")
+        return True
+
+    def begin(self, target: str, query: str):
+        '''
+            Record that a unit is being fetched
+
+            Arguments:
+                self: self@JobJournal
+                target (str): path of the output file of the unit
+                query (str): query of the unit
+        '''
+        self.__execute("INSERT INTO units (target, query_hash, status, attempts, updated) VALUES (?, ?, 'running', 1, ?) "
+                       "ON CONFLICT(target) DO UPDATE SET query_hash = excluded.query_hash, status = 'running', "
+                       "checksum = NULL, bytes = NULL, error = NULL, attempts = attempts + 1, updated = excluded.updated",
+                       (target, checksum(query.encode()), time.time()))
+
+    def write(self, target: str, data: bytes):
+        '''
+            Write the output of a unit once and mark the unit done
+
+            Arguments:
+                self: self@JobJournal
+                target (str): path of the output file of the unit
+                data (bytes): output of the unit
+        '''
+        self.__execute("UPDATE units SET status = 'writing', checksum = ?, bytes = ?, updated = ? WHERE target = ?",
+                       (checksum(data), len(data), time.time(), target))
+        write_durably(target, data)
+        self.__set(target, "done")
+
+    def commit(self, target: str, temporary: str):
+        '''
+            Rename the output of a unit, streamed to a temporary file flushed to disk, into
+            place and mark the unit done
+
+            Arguments:
+                self: self@JobJournal
+                target (str): path of the output file of the unit
+                temporary (str): path of the complete output
+        '''
+        self.__execute("UPDATE units SET status = 'writing', checksum = ?, bytes = ?, updated = ? WHERE target = ?",
+                       (file_checksum(temporary), os.path.getsize(temporary), time.time(), target))
+        replace_durably(temporary, target)
+        self.__set(target, "done")
+
+    def fail(self, target: str, error: str):
+        '''
+            Record that a unit failed, it is retried by the next run
+
+            Arguments:
+                self: self@JobJournal
+                target (str): path of the output file of the unit
+                error (str): reason of the failure
+        '''
+        self.__execute("UPDATE units SET status = 'failed', error = ?, updated = ? WHERE target = ?",
+                       (error, time.time(), target))
+
+    def __set(self, target: str, status: str):
+        self.__execute("UPDATE units SET status = ?, updated = ? WHERE target = ?", (status, time.time(), target))
+
+    def summary(self) -> dict:
+        '''
+            Number of units per status
+
+            Arguments:
+                self: self@JobJournal
+        '''
+        return dict(self.__execute("SELECT status, COUNT(*) FROM units GROUP BY status"))
+
+    def close(self):
+        with self.__lock:
+            self.__connection.close()
+
+    def __enter__(self) -> 'JobJournal':
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
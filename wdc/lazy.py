@@ -0,0 +1,54 @@
+import importlib
+import sys
+
+
+class LazyModule:
+    '''
+        LazyModule stands for a module that is imported on first attribute access. The module
+        global holding it is then rebound to the real module, so later accesses cost nothing.
+    '''
+
+    def __init__(self, name: str, namespace: dict = None, alias: str = None):
+        '''
+            Initialization of the lazy module
+
+            Arguments:
+                self: self@LazyModule
+                name (str): name of the module, e.g. "numpy"
+                namespace (dict): globals of the importing module, rebound on first access
+                alias (str): name of the global holding the lazy module
+        '''
+        self.__name = name
+        self.__namespace = namespace
+        self.__alias = alias
+
+    def load(self):
+        '''
+            Import the module and rebind the global holding the lazy module
+
+            Arguments:
+                self: self@LazyModule
+        '''
+        module = importlib.import_module(self.__name)
+        if self.__namespace is not None and self.__namespace.get(self.__alias) is self:
+            self.__namespace[self.__alias] = module
+        return module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self.load(), attribute)
+
+    def __repr__(self) -> str:
+        loaded = "loaded" if self.__name in sys.modules else "not loaded"
+        return f"<lazy module '{self.__name}' ({loaded})>"
+
+
+def lazy_import(name: str, namespace: dict = None, alias: str = None) -> LazyModule:
+    '''
+        Module imported on first use, e.g. np = lazy_import("numpy", globals(), "np")
+
+        Arguments:
+            name (str): name of the module
+            namespace (dict): globals of the importing module
+            alias (str): name of the global the lazy module is assigned to
+    '''
+    return LazyModule(name, namespace, alias)
@@ -0,0 +1,606 @@
+import bisect
+import math
+import threading
+import time
+import weakref
+from urllib.parse import urlencode
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def label_key(label_names: tuple, labels: dict) -> tuple:
+    '''
+        Values of the labels of a metric in the order of its label names
+
+        Arguments:
+            label_names (tuple): label names of the metric
+            labels (dict): label values by name
+    '''
+    if set(labels) != set(label_names):
+        raise ValueError(f"Expected labels {', '.join(label_names) or 'none'}, got {', '.join(labels) or 'none'}")
+    return tuple(str(labels[name]) for name in label_names)
+
+
+def format_labels(label_names: tuple, values: tuple, extra: str = "") -> str:
+    '''
+        Labels in the Prometheus text format, e.g. {operation="execute",outcome="ok"}
+    '''
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(label_names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Metric:
+    '''
+        Metric is a named value per combination of label values. Every metric has its own
+        lock held only to update a number, so metrics updated by different threads do not
+        contend with each other.
+    '''
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: tuple = (), function=None):
+        '''
+            Initialization of the metric
+
+            Arguments:
+                self: self@Metric
+                name (str): metric name
+                description (str): help text
+                label_names (tuple): names of the labels
+                function: callable returning the current value, or values by label values,
+                          for metrics read from another object when collected
+        '''
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.function = function
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def values(self) -> dict:
+        '''
+            Current values by tuple of label values
+
+            Arguments:
+                self: self@Metric
+        '''
+        if self.function is not None:
+            value = self.function()
+            if value is None:
+                return {}
+            return {tuple(key) if isinstance(key, tuple) else (key,): number for key, number in value.items()} \
+                if isinstance(value, dict) else {(): value}
+        with self._lock:
+            return dict(self._values)
+
+    def snapshot(self):
+        values = self.values()
+        if not self.label_names:
+            return values.get((), None if self.function is not None else 0)
+        return {",".join(f"{name}={value}" for name, value in zip(self.label_names, key)): number
+                for key, number in sorted(values.items())}
+
+    def exposition(self) -> list:
+        return [f"{self.name}{format_labels(self.label_names, key)} {format_number(value)}"
+                for key, value in sorted(self.values().items())]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        '''
+            Increase the counter
+
+            Arguments:
+                self: self@Counter
+                amount (float): non-negative increment
+                labels: label values
+        '''
+        key = label_key(self.label_names, labels) if labels or self.label_names else ()
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = label_key(self.label_names, labels) if labels or self.label_names else ()
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = label_key(self.label_names, labels) if labels or self.label_names else ()
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    '''
+        Histogram counts observations in buckets of fixed upper bounds, with their sum
+    '''
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, label_names: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        '''
+            Record an observation
+
+            Arguments:
+                self: self@Histogram
+                value (float): observed value, e.g. a latency in seconds
+                labels: label values
+        '''
+        key = label_key(self.label_names, labels) if labels or self.label_names else ()
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Counts per bucket, the last one for values above every bound, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def values(self) -> dict:
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+    def quantile(self, counts: list, count: int, quantile: float) -> float:
+        '''
+            Quantile estimated by linear interpolation within the bucket holding it
+
+            Arguments:
+                self: self@Histogram
+                counts (list): observations per bucket
+                count (int): number of observations
+                quantile (float): quantile between 0 and 1
+        '''
+        if not count:
+            return None
+        rank = quantile * count
+        cumulative = 0
+        for index, number in enumerate(counts):
+            if number and cumulative + number >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1] if self.buckets else None
+                low = self.buckets[index - 1] if index else 0.0
+                return low + (self.buckets[index] - low) * (rank - cumulative) / number
+            cumulative += number
+        return self.buckets[-1]
+
+    def snapshot(self):
+        summaries = {}
+        for key, (counts, total, count) in self.values().items():
+            summaries[key] = {"count": count, "sum": total,
+                              "p50": self.quantile(counts, count, 0.5), "p95": self.quantile(counts, count, 0.95),
+                              "p99": self.quantile(counts, count, 0.99)}
+        if not self.label_names:
+            return summaries.get((), {"count": 0, "sum": 0.0, "p50": None, "p95": None, "p99": None})
+        return {",".join(f"{name}={value}" for name, value in zip(self.label_names, key)): summary
+                for key, summary in sorted(summaries.items())}
+
+    def exposition(self) -> list:
+        lines = []
+        for key, (counts, total, count) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, number in zip(self.buckets + (math.inf,), counts):
+                cumulative += number
+                labels = format_labels(self.label_names, key, f'le="{format_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {format_number(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    '''
+        MetricsRegistry holds named metrics and exposes them as a snapshot dictionary or in
+        the Prometheus text format, optionally over a local HTTP endpoint
+    '''
+
+    def __init__(self):
+        self.__metrics = {}
+        self.__shared = {}
+        self.__lock = threading.Lock()
+
+    def __register(self, metric: Metric) -> Metric:
+        with self.__lock:
+            existing = self.__metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                    raise ValueError(f"Metric {metric.name} is already registered with another type or labels")
+                # A metric read from a function cannot be read from another one as well
+                if existing.function != metric.function:
+                    raise ValueError(f"Metric {metric.name} is already registered with another function")
+                return existing
+            self.__metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, description: str, label_names: tuple = (), function=None) -> Counter:
+        '''
+            Counter of the given name, registered on first use
+
+            Arguments:
+                self: self@MetricsRegistry
+                name (str): metric name
+                description (str): help text
+                label_names (tuple): names of the labels
+                function: callable returning the value when collected, see Metric
+        '''
+        return self.__register(Counter(name, description, label_names, function))
+
+    def gauge(self, name: str, description: str, label_names: tuple = (), function=None) -> Gauge:
+        '''
+            Gauge of the given name, registered on first use
+
+            Arguments:
+                self: self@MetricsRegistry
+                name (str): metric name
+                description (str): help text
+                label_names (tuple): names of the labels
+                function: callable returning the value when collected, see Metric
+        '''
+        return self.__register(Gauge(name, description, label_names, function))
+
+    def histogram(self, name: str, description: str, label_names: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        '''
+            Histogram of the given name, registered on first use
+
+            Arguments:
+                self: self@MetricsRegistry
+                name (str): metric name
+                description (str): help text
+                label_names (tuple): names of the labels
+                buckets (tuple): upper bounds of the buckets
+        '''
+        return self.__register(Histogram(name, description, label_names, buckets))
+
+    def shared(self, name: str, factory):
+        '''
+            Object shared by every user of the registry, e.g. the state behind function-backed
+            metrics that several connectors report to, created on first use
+
+            Arguments:
+                self: self@MetricsRegistry
+                name (str): name of the object
+                factory: callable without arguments creating the object
+        '''
+        with self.__lock:
+            if name not in self.__shared:
+                self.__shared[name] = factory()
+            return self.__shared[name]
+
+    def metrics(self) -> list:
+        with self.__lock:
+            return list(self.__metrics.values())
+
+    def snapshot(self) -> dict:
+        '''
+            Current value of every metric; labelled values are keyed by "label=value,..." and
+            histograms are summarized by count, sum and estimated p50, p95 and p99
+
+            Arguments:
+                self: self@MetricsRegistry
+        '''
+        return {metric.name: metric.snapshot() for metric in self.metrics()}
+
+    def exposition(self) -> str:
+        '''
+            Every metric in the Prometheus text exposition format
+
+            Arguments:
+                self: self@MetricsRegistry
+        '''
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.exposition())
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> 'MetricsServer':
+        '''
+            Expose the metrics at http://host:port/metrics in a background thread
+
+            Arguments:
+                self: self@MetricsRegistry
+                host (str): interface to listen on, the loopback interface by default
+                port (int): port to listen on, 0 for a free one
+        '''
+        return MetricsServer(self, host, port)
+
+
+class MetricsServer:
+    '''
+        MetricsServer serves the Prometheus text format of a registry until stopped
+    '''
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 0):
+        registry_of_server = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry_of_server.exposition().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *arguments):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}/metrics"
+        self.__thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.__thread.join()
+
+    def __enter__(self) -> 'MetricsServer':
+        return self
+
+    def __exit__(self, *exception):
+        self.stop()
+
+
+class RateWindow:
+    '''
+        RateWindow counts events per second over a sliding window of whole seconds
+    '''
+
+    def __init__(self, seconds: int = 60):
+        self.seconds = seconds
+        self.__counts = [0] * seconds
+        self.__stamps = [0] * seconds  # Second each count belongs to
+        self.__lock = threading.Lock()
+
+    def add(self, count: int = 1):
+        second = int(time.monotonic())
+        index = second % self.seconds
+        with self.__lock:
+            if self.__stamps[index] != second:
+                self.__stamps[index] = second
+                self.__counts[index] = 0
+            self.__counts[index] += count
+
+    def rate(self) -> float:
+        '''
+            Events per second over the window
+
+            Arguments:
+                self: self@RateWindow
+        '''
+        now = int(time.monotonic())
+        with self.__lock:
+            total = sum(count for count, stamp in zip(self.__counts, self.__stamps) if now - stamp < self.seconds)
+        return total / self.seconds
+
+
+class _Request:
+    '''
+        Measurement of one request of a connector, see ClientMetrics.request
+    '''
+
+    def __init__(self, metrics: 'ClientMetrics', operation: str, query: str = None):
+        self.metrics = metrics
+        self.operation = operation
+        self.query = query
+        self.received = 0
+        self.ok = True
+
+    def result(self, value):
+        '''
+            Record the result of the request, None for a failure, and return it
+
+            Arguments:
+                self: self@_Request
+                value: result of the request, or its size in bytes when it was streamed to a file
+        '''
+        self.ok = value is not None
+        if isinstance(value, (bytes, bytearray)):
+            self.received = len(value)
+        elif isinstance(value, int):
+            self.received = value
+        return value
+
+    def response(self, response):
+        '''
+            Record an HTTP response, failed unless its status is 200, and return it
+
+            Arguments:
+                self: self@_Request
+                response: HTTP response
+        '''
+        self.ok = response is not None and response.status_code == 200
+        content = getattr(response, "content", None)
+        if isinstance(content, (bytes, bytearray)):
+            self.received = len(content)
+        return response
+
+    def __enter__(self) -> '_Request':
+        self.started = time.perf_counter()
+        self.metrics.in_flight.inc(operation=self.operation)
+        return self
+
+    def __exit__(self, kind, error, traceback):
+        self.metrics.finish(self, time.perf_counter() - self.started, error is None and self.ok)
+        return False
+
+
+class _NullRequest:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+    def result(self, value):
+        return value
+
+    def response(self, response):
+        return response
+
+
+class NullMetrics:
+    '''
+        NullMetrics is the metrics of connectors without metrics; its requests record nothing
+    '''
+
+    _request = _NullRequest()
+
+    def request(self, operation: str, query: str = None) -> _NullRequest:
+        return self._request
+
+
+NULL_METRICS = NullMetrics()
+
+
+class ClientMetrics:
+    '''
+        ClientMetrics are the operational metrics of a connector: requests and latencies per
+        operation, requests in flight, bytes sent and received, request rate, and the state of
+        its result cache and scheduler, read from the connector when collected
+    '''
+
+    def __init__(self, dbc, registry: MetricsRegistry = None, window: int = 60):
+        '''
+            Initialization of the metrics
+
+            Arguments:
+                self: self@ClientMetrics
+                dbc: connector whose cache and scheduler are reported
+                registry (MetricsRegistry): registry holding the metrics, a new one by default
+                window (int): seconds over which the request rate is averaged
+        '''
+        self.registry = registry if registry is not None else MetricsRegistry()
+        # The connectors of a registry share the rate window and the gauges read from them
+        self.__connectors = self.registry.shared("wdc_connectors", lambda: _Connectors(window))
+        self.__connectors.add(dbc)
+        operation = ("operation",)
+        self.requests = self.registry.counter("wdc_requests_total", "Requests sent by operation and outcome",
+                                              ("operation", "outcome"))
+        self.latency = self.registry.histogram("wdc_request_duration_seconds",
+                                               "Request latency seen by the client, by operation", operation)
+        self.in_flight = self.registry.gauge("wdc_requests_in_flight", "Requests in progress by operation", operation)
+        self.bytes_sent = self.registry.counter("wdc_bytes_sent_total", "Request body bytes sent", operation)
+        self.bytes_received = self.registry.counter("wdc_bytes_received_total", "Response body bytes received",
+                                                    operation)
+        connectors = self.__connectors
+        self.registry.gauge("wdc_request_rate",
+                            f"Requests per second over the last {connectors.rate_window.seconds} seconds",
+                            function=connectors.rate_window.rate)
+        self.registry.gauge("wdc_cache_hit_ratio", "Share of the queries answered from the result caches",
+                            function=connectors.cache_hit_ratio)
+        self.registry.gauge("wdc_cache_bytes", "Size of the cached results", function=connectors.cache_bytes)
+        self.registry.gauge("wdc_scheduler_utilization", "Share of the scheduler slots in use",
+                            function=connectors.scheduler_utilization)
+        self.registry.gauge("wdc_scheduler_queued", "Queries waiting for a scheduler slot by priority class",
+                            ("priority",), function=connectors.scheduler_queued)
+
+    def request(self, operation: str, query: str = None) -> _Request:
+        '''
+            Context manager measuring a request of the connector
+
+            Arguments:
+                self: self@ClientMetrics
+                operation (str): operation, e.g. execute, get_subset_coverage or describe_coverage
+                query (str): WCPS query posted by the request, if any
+        '''
+        return _Request(self, operation, query)
+
+    def finish(self, request: _Request, seconds: float, ok: bool):
+        operation = request.operation
+        self.in_flight.dec(operation=operation)
+        self.requests.inc(operation=operation, outcome="ok" if ok else "error")
+        self.latency.observe(seconds, operation=operation)
+        if request.query is not None:
+            self.bytes_sent.inc(len(urlencode({'query': request.query})), operation=operation)
+        if request.received:
+            self.bytes_received.inc(request.received, operation=operation)
+        self.__connectors.rate_window.add()
+
+    def snapshot(self) -> dict:
+        return self.registry.snapshot()
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> MetricsServer:
+        return self.registry.serve(host, port)
+
+
+class _Connectors:
+    '''
+        Connectors reporting to one registry, with their shared request rate; the cache and
+        scheduler gauges are summed over the connectors that have a cache or a scheduler
+    '''
+
+    def __init__(self, window: int = 60):
+        self.rate_window = RateWindow(window)
+        self.__connectors = weakref.WeakSet()  # A connector that is no longer used stops reporting
+
+    def add(self, dbc):
+        self.__connectors.add(dbc)
+
+    def caches(self) -> list:
+        return [dbc.cache for dbc in list(self.__connectors) if dbc.cache is not None]
+
+    def schedulers(self) -> list:
+        return [dbc.scheduler for dbc in list(self.__connectors) if dbc.scheduler is not None]
+
+    def cache_hit_ratio(self) -> float:
+        caches = self.caches()
+        lookups = sum(cache.hits + cache.misses for cache in caches)
+        if not lookups:
+            return None
+        return sum(cache.hits for cache in caches) / lookups
+
+    def cache_bytes(self) -> int:
+        caches = self.caches()
+        return sum(cache.size for cache in caches) if caches else None
+
+    def scheduler_utilization(self) -> float:
+        schedulers = self.schedulers()
+        if not schedulers:
+            return None
+        return sum(scheduler.running for scheduler in schedulers) / sum(scheduler.max_concurrency
+                                                                        for scheduler in schedulers)
+
+    def scheduler_queued(self) -> dict:
+        schedulers = self.schedulers()
+        if not schedulers:
+            return None
+        queued = {}
+        for scheduler in schedulers:
+            for name, stats in scheduler.stats().items():
+                queued[name] = queued.get(name, 0) + stats["queued"]
+        return queued
@@ -0,0 +1,88 @@
+import re
+
+
+def get_boundary(content_type: str) -> str:
+    '''
+        Return the boundary of a multipart Content-Type header, or None if the response is not multipart
+
+        Arguments:
+            content_type (str): value of the Content-Type header
+    '''
+    if not content_type or not content_type.lower().startswith("multipart/"):
+        return None
+    match = re.search(r'boundary="?([^";]+)"?', content_type, re.IGNORECASE)
+    return match.group(1) if match else None
+
+
+def parse_headers(block: bytes) -> dict:
+    '''
+        Parse the headers of a part into a dictionary with lower-case names
+
+        Arguments:
+            block (bytes): raw header lines of the part
+    '''
+    headers = {}
+    for line in block.decode("latin-1").split("\r\n"):
+        name, separator, value = line.partition(":")
+        if separator:
+            headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def part_name(headers: dict) -> str:
+    '''
+        Name of a part taken from its Content-ID or Content-Disposition header, None if it has none
+
+        Arguments:
+            headers (dict): headers of the part
+    '''
+    if "content-id" in headers:
+        return headers["content-id"].strip("<>")
+    match = re.search(r'(?:file)?name="?([^";]+)"?', headers.get("content-disposition", ""))
+    return match.group(1) if match else None
+
+
+def iter_parts(chunks, boundary: str):
+    '''
+        Split a multipart body into (headers, payload) pairs while it is being received;
+        a part is yielded as soon as its closing boundary arrives
+
+        Arguments:
+            chunks: iterable of bytes chunks of the body
+            boundary (str): boundary of the multipart body
+    '''
+    delimiter = b"--" + boundary.encode()
+    separator = b"\r\n" + delimiter
+    # A bytearray is extended and trimmed in place, so large parts are not copied per chunk
+    buffer = bytearray()
+    started = False  # The preamble before the first delimiter has been skipped
+    searched = 0  # Position up to which the buffer has been searched without a match
+
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            if not started:
+                index = buffer.find(delimiter, searched)
+                if index == -1:
+                    searched = max(len(buffer) - len(delimiter), 0)
+                    break
+                del buffer[:index + len(delimiter)]
+                started = True
+                searched = 0
+
+            # The closing delimiter is followed by "--"
+            if buffer[:2] == b"--":
+                return
+            headers_end = buffer.find(b"\r\n\r\n")
+            if headers_end == -1:
+                break
+            body_end = buffer.find(separator, max(searched, headers_end + 4))
+            if body_end == -1:
+                # Keep the end of the buffer that may hold the start of the separator
+                searched = max(len(buffer) - len(separator), headers_end + 4)
+                break
+
+            headers = parse_headers(bytes(buffer[:headers_end]).lstrip(b"\r\n"))
+            yield headers, bytes(buffer[headers_end + 4:body_end])
+            del buffer[:body_end + len(separator)]
+            searched = 0
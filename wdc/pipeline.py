@@ -0,0 +1,192 @@
+import multiprocessing
+import os
+import sys
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing.shared_memory import SharedMemory
+from decoders import decode
+
+# Outcome of one query of a pipeline: the decoded array, or None and the reason it failed
+PipelineResult = namedtuple("PipelineResult", ["index", "query", "value", "error"])
+
+# Payload of a fetched result: its bytes for results decoded in the pipeline thread, or the
+# name of the shared memory block holding them for results decoded by the process pool
+_Fetched = namedtuple("_Fetched", ["data", "memory", "size"])
+
+
+def attach(name: str) -> SharedMemory:
+    '''
+        Shared memory block created by another process, left to that process to unlink
+
+        Arguments:
+            name (str): name of the block
+    '''
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    return SharedMemory(name=name)
+
+
+def decode_shared(name: str, size: int, format: str):
+    '''
+        Decode a result held in a shared memory block, run in the worker processes; the bytes
+        are read in place instead of being pickled to the worker
+
+        Arguments:
+            name (str): name of the shared memory block
+            size (int): size of the result, the block may be larger
+            format (str): format the result was encoded in
+    '''
+    memory = attach(name)
+    view = memory.buf[:size]
+    try:
+        return decode(view, format)
+    finally:
+        view.release()
+        memory.close()
+
+
+class DecodePipeline:
+    '''
+        DecodePipeline overlaps downloading with decoding: threads fetch the results of the
+        queries and put them in shared memory, a process pool decodes them into NumPy arrays
+        on every core. The fetched but not yet delivered bytes are bounded, so a slow decoder
+        or consumer stops the downloads instead of filling the memory. Downloads in flight are
+        counted once they complete, so the memory held is at most max_buffered_bytes plus
+        fetchers times the largest result, that result twice while it is copied into shared memory.
+    '''
+
+    def __init__(self, dbc, format: str, fetchers: int = 8, decoders: int = None,
+                 max_buffered_bytes: int = 256 * 1024 * 1024, inline_bytes: int = 16 * 1024, context: str = None):
+        '''
+            Initialization of the pipeline
+
+            Arguments:
+                self: self@DecodePipeline
+                dbc: database connector fetching the results
+                format (str): format the queries encode their result in, see decoders.DECODERS
+                fetchers (int): number of queries downloaded at once
+                decoders (int): number of decoding processes, one per core by default
+                max_buffered_bytes (int): bytes fetched and not yet delivered above which no new
+                                          download starts; a download in flight may exceed it
+                inline_bytes (int): results up to this size are decoded in the pipeline thread,
+                                    where handing them to a process costs more than decoding
+                context (str): start method of the processes, forkserver where available, since
+                               forking a process with running download threads is unsafe
+        '''
+        self.dbc = dbc
+        self.format = format
+        self.fetchers = fetchers
+        self.decoders = decoders or os.cpu_count() or 1
+        self.max_buffered_bytes = max_buffered_bytes
+        self.inline_bytes = inline_bytes
+        if context is None:
+            context = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.context = multiprocessing.get_context(context)
+        self.buffered = 0  # Bytes fetched and not yet delivered
+        self.max_buffered = 0  # Largest number of buffered bytes seen
+
+    def __fetch(self, query: str) -> _Fetched:
+        data = self.dbc.execute_query(query)
+        if data is None or len(data) <= self.inline_bytes:
+            return _Fetched(data, None, 0 if data is None else len(data))
+        # The copy into shared memory happens in the download thread, not the pipeline thread
+        memory = SharedMemory(create=True, size=len(data))
+        memory.buf[:len(data)] = data
+        return _Fetched(None, memory, len(data))
+
+    def run(self, queries, ordered: bool = False):
+        '''
+            Fetch and decode the results of queries, yielding a PipelineResult per query
+
+            Arguments:
+                self: self@DecodePipeline
+                queries: iterable of WCPS queries, read as the pipeline has room for them
+                ordered (bool): yield the results in the order of the queries instead of as
+                                soon as they are decoded
+        '''
+        queries = enumerate(queries)
+        exhausted = False
+        fetching = {}  # Download future: (index, query)
+        decoding = {}  # Decoding future: (index, query, shared memory, size)
+        ready = {}  # Results waiting for their turn when ordered
+        following = 0  # Index of the next result to yield when ordered
+        with ThreadPoolExecutor(max_workers=self.fetchers) as threads, \
+                ProcessPoolExecutor(max_workers=self.decoders, mp_context=self.context) as processes:
+            try:
+                while True:
+                    # Backpressure: no new download while the buffered bytes are over the bound
+                    while not exhausted and len(fetching) < self.fetchers and self.buffered < self.max_buffered_bytes:
+                        entry = next(queries, None)
+                        if entry is None:
+                            exhausted = True
+                            break
+                        fetching[threads.submit(self.__fetch, entry[1])] = entry
+                    if not fetching and not decoding:
+                        break
+
+                    done, _ = wait(list(fetching) + list(decoding), return_when=FIRST_COMPLETED)
+                    results = []
+                    for future in done:
+                        if future in fetching:
+                            index, query = fetching.pop(future)
+                            try:
+                                fetched = future.result()
+                            except Exception as e:
+                                results.append((PipelineResult(index, query, None, f"{type(e).__name__}: {e}"), 0))
+                                continue
+                            self.buffered += fetched.size
+                            self.max_buffered = max(self.max_buffered, self.buffered)
+                            if fetched.memory is not None:
+                                decoding[processes.submit(decode_shared, fetched.memory.name, fetched.size,
+                                                          self.format)] = (index, query, fetched.memory, fetched.size)
+                            elif fetched.data is None:
+                                results.append((PipelineResult(index, query, None, "query failed"), 0))
+                            else:
+                                results.append((self.__decode_inline(index, query, fetched.data), fetched.size))
+                        else:
+                            index, query, memory, size = decoding.pop(future)
+                            memory.close()
+                            memory.unlink()
+                            try:
+                                results.append((PipelineResult(index, query, future.result(), None), size))
+                            except Exception as e:
+                                results.append((PipelineResult(index, query, None, f"{type(e).__name__}: {e}"), size))
+
+                    for result, size in results:
+                        if not ordered:
+                            self.buffered -= size
+                            yield result
+                            continue
+                        ready[result.index] = (result, size)
+                        while following in ready:
+                            result, size = ready.pop(following)
+                            self.buffered -= size
+                            following += 1
+                            yield result
+            finally:
+                # Results abandoned by the consumer or left by a failure must not leak shared memory
+                for future in fetching:
+                    future.cancel()
+                for future in list(fetching):
+                    try:
+                        fetched = future.result()
+                    except Exception:
+                        continue
+                    if fetched.memory is not None:
+                        fetched.memory.close()
+                        fetched.memory.unlink()
+                for future, (_, _, memory, _) in decoding.items():
+                    future.cancel()
+                    try:
+                        future.result()
+                    except Exception:
+                        pass
+                    memory.close()
+                    memory.unlink()
+                self.buffered = 0
+
+    def __decode_inline(self, index: int, query: str, data: bytes) -> PipelineResult:
+        try:
+            return PipelineResult(index, query, decode(data, self.format), None)
+        except Exception as e:
+            return PipelineResult(index, query, None, f"{type(e).__name__}: {e}")
@@ -0,0 +1,168 @@
+import math
+from collections import namedtuple
+from grid import axis_references, base_axis, grid_indices
+
+# Grid range selected on one axis; sliced axes are dropped from the result
+AxisPlan = namedtuple("AxisPlan", ["axis", "low", "high", "sliced"])
+
+# Estimated size of a query before it is sent
+QueryEstimate = namedtuple("QueryEstimate", ["coverage_id", "axes", "cells", "bytes", "format"])
+
+# Result of one tile of a split query; tile maps each split axis to its (low, high) grid range
+TileResult = namedtuple("TileResult", ["tile", "result"])
+
+# Approximate encoded bytes per cell, formats not listed use the size of a raw cell
+ENCODED_BYTES_PER_CELL = {
+    "image/png": 1.0,
+    "image/jpeg": 0.25,
+    "text/csv": 12.0,
+    "application/json": 12.0,
+}
+
+# Size of the response of a condensed (scalar) query
+SCALAR_BYTES = 32
+
+class QueryPlanner:
+    '''
+        QueryPlanner estimates the cells and encoded bytes of a query from the coverage
+        description and the AxisSubset ranges, enforces per-query budgets and splits
+        oversized queries into grid tiles that fit them
+    '''
+
+    def __init__(self, dbc, max_cells: int = None, max_bytes: int = None, cell_size: int = 4):
+        '''
+            Initialization of the planner
+
+            Arguments:
+                self: self@QueryPlanner
+                dbc: database connector used to describe coverages
+                max_cells (int): maximum number of cells a query may touch
+                max_bytes (int): maximum number of encoded bytes a query may return
+                cell_size (int): size in bytes of a raw cell
+        '''
+        self.dbc = dbc
+        self.max_cells = max_cells
+        self.max_bytes = max_bytes
+        self.cell_size = cell_size
+        self.__descriptions = {}  # Coverage descriptions, by coverage id
+        self.__references = {}  # Axis georeferencing, by coverage id
+
+    def describe(self, coverage_id: str) -> dict:
+        '''
+            Coverage description, requested from the server once per coverage
+
+            Arguments:
+                self: self@QueryPlanner
+                coverage_id (str): coverage id
+        '''
+        if coverage_id not in self.__descriptions:
+            description = self.dbc.describe_coverage(coverage_id)
+            if description is None:
+                raise ValueError(f"Coverage {coverage_id} could not be described")
+            self.__descriptions[coverage_id] = description
+            self.__references[coverage_id] = axis_references(description)
+        return self.__descriptions[coverage_id]
+
+    def __axis_plan(self, coverage_id: str, index: int, axis_subset) -> AxisPlan:
+        '''
+            Grid range selected on one axis by a subset (None means the whole axis)
+
+            Arguments:
+                self: self@QueryPlanner
+                coverage_id (str): coverage id, already described
+                index (int): position of the axis in the description
+                axis_subset: AxisSubset on this axis or None
+        '''
+        description = self.__descriptions[coverage_id]
+        axis = description["axis_labels"][index]
+        low, high = int(description["low_limits"][index]), int(description["high_limits"][index])
+        if axis_subset is None:
+            return AxisPlan(axis, low, high, False)
+
+        sliced = len(axis_subset.values) == 1
+        # Grid coordinates are used as they are
+        if axis_subset.axis.endswith('"CRS:1"'):
+            indices = [int(value) for value in axis_subset.values]
+        else:
+            indices = grid_indices(self.__references[coverage_id][axis], axis_subset.values)
+            if indices is None:
+                # Without georeferencing, a trim is bounded by the whole axis
+                return AxisPlan(axis, low, low, True) if sliced else AxisPlan(axis, low, high, False)
+
+        start, end = max(min(indices), low), min(max(indices), high)
+        return AxisPlan(axis, start, max(start, end), sliced)
+
+    def plan(self, coverage_id: str, axis_subsets: list, format: str = None, condensed: bool = False) -> QueryEstimate:
+        '''
+            Estimate the cells touched and bytes returned by a subset query
+
+            Arguments:
+                self: self@QueryPlanner
+                coverage_id (str): coverage id
+                axis_subsets (list): list of AxisSubset objects of the query
+                format (str): output format, None for raw cells
+                condensed (bool): True if the query returns a single aggregated value
+        '''
+        description = self.describe(coverage_id)
+        subsets = {base_axis(axis_subset.axis): axis_subset for axis_subset in axis_subsets}
+        axes = [self.__axis_plan(coverage_id, index, subsets.get(axis))
+                for index, axis in enumerate(description["axis_labels"])]
+
+        cells = 1
+        for axis_plan in axes:
+            cells *= axis_plan.high - axis_plan.low + 1
+        if condensed:
+            size = SCALAR_BYTES
+        else:
+            size = int(math.ceil(cells * ENCODED_BYTES_PER_CELL.get(format, self.cell_size)))
+        return QueryEstimate(coverage_id, axes, cells, size, format)
+
+    def has_budget(self) -> bool:
+        '''
+            Check if the planner enforces any budget
+
+            Arguments:
+                self: self@QueryPlanner
+        '''
+        return self.max_cells is not None or self.max_bytes is not None
+
+    def within_budget(self, estimate: QueryEstimate) -> bool:
+        '''
+            Check an estimate against the budgets of the planner
+
+            Arguments:
+                self: self@QueryPlanner
+                estimate (QueryEstimate): estimate of the query
+        '''
+        if self.max_cells is not None and estimate.cells > self.max_cells:
+            return False
+        return self.max_bytes is None or estimate.bytes <= self.max_bytes
+
+    def split(self, estimate: QueryEstimate) -> list:
+        '''
+            Split a query into grid tiles that fit the budgets; every tile is a dictionary
+            mapping each split axis to its (low, high) grid range
+
+            Arguments:
+                self: self@QueryPlanner
+                estimate (QueryEstimate): estimate of the query
+        '''
+        bytes_per_cell = estimate.bytes / estimate.cells if estimate.cells else 0
+        tiles = []
+        pending = [{axis_plan.axis: (axis_plan.low, axis_plan.high) for axis_plan in estimate.axes
+                    if not axis_plan.sliced}]
+        while pending:
+            tile = pending.pop()
+            cells = 1
+            for low, high in tile.values():
+                cells *= high - low + 1
+            tile_estimate = estimate._replace(cells=cells, bytes=int(math.ceil(cells * bytes_per_cell)))
+            # Halve the longest axis until the tile fits or cannot be split any more
+            axis, (low, high) = max(tile.items(), key=lambda item: item[1][1] - item[1][0], default=(None, (0, 0)))
+            if self.within_budget(tile_estimate) or high == low:
+                tiles.append(tile)
+                continue
+            middle = (low + high) // 2
+            pending.append({**tile, axis: (middle + 1, high)})
+            pending.append({**tile, axis: (low, middle)})
+        return tiles
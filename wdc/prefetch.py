@@ -0,0 +1,185 @@
+import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+MONTH = re.compile(r"^(\d{4})-(\d{2})$")
+
+
+def to_step_value(value):
+    '''
+        Numeric position of a subset value, None if stepping over it cannot be predicted;
+        "YYYY-MM" months are counted in months
+
+        Arguments:
+            value: raw value of an AxisSubset
+    '''
+    if isinstance(value, (int, float)):
+        return value
+    match = MONTH.match(str(value))
+    if match:
+        return int(match.group(1)) * 12 + int(match.group(2)) - 1
+    return None
+
+
+def from_step_value(position, template):
+    '''
+        Subset value at a numeric position, written like the template value
+
+        Arguments:
+            position: numeric position
+            template: raw value the position was computed from
+    '''
+    if isinstance(template, str):
+        return f"{int(position) // 12:04d}-{int(position) % 12 + 1:02d}"
+    # Round away the floating point noise of repeated steps
+    return round(position, 9) if isinstance(position, float) else position
+
+
+class Prefetcher:
+    '''
+        Prefetcher watches the subsets of recent queries, detects sequential or spatial stepping
+        (the same query moved by the same offset every time) and fetches the predicted next
+        subsets in the background into the result cache of the connector
+    '''
+
+    def __init__(self, dbc, depth: int = 2, confirmations: int = 2, workers: int = 2):
+        '''
+            Initialization of the prefetcher
+
+            Arguments:
+                self: self@Prefetcher
+                dbc: database connector, its result cache is enabled if needed
+                depth (int): number of steps fetched ahead, bounds the prefetch budget
+                confirmations (int): number of identical consecutive steps needed to predict
+                workers (int): number of background fetches at the same time
+        '''
+        if dbc.cache is None:
+            dbc.enable_cache()
+        self.dbc = dbc
+        self.depth = depth
+        self.confirmations = confirmations
+        self.prefetched = 0  # Number of predicted queries sent
+        self.cancelled = 0  # Number of predicted queries cancelled before they were sent
+        self.__history = deque(maxlen=confirmations + 1)  # Recent (key, axes, positions, values)
+        self.__pending = {}  # Predicted query mapped to its future
+        self.__lock = threading.RLock()  # Done callbacks of finished or cancelled futures run while it is held
+        self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wdc-prefetch")
+
+    def observe(self, key, axis_subsets: list, build):
+        '''
+            Record a query about to be executed and prefetch its predicted successors
+
+            Arguments:
+                self: self@Prefetcher
+                key: identifies everything in the query except its subsets
+                axis_subsets (list): AxisSubset objects of the query
+                build: callable returning the query for a list of AxisSubset objects
+        '''
+        axes = tuple((axis_subset.axis, len(axis_subset.values)) for axis_subset in axis_subsets)
+        values = [value for axis_subset in axis_subsets for value in axis_subset.values]
+        positions = [to_step_value(value) for value in values]
+
+        with self.__lock:
+            self.__history.append((key, axes, positions, values))
+            step = self.__step()
+            if step is None:
+                # The pattern is broken, predictions not sent yet are useless
+                self.__cancel()
+                return
+
+            predicted = []
+            for ahead in range(1, self.depth + 1):
+                shifted = [from_step_value(position + ahead * delta, value) if delta else value
+                           for position, delta, value in zip(positions, step, values)]
+                subsets, index = [], 0
+                for axis_subset in axis_subsets:
+                    count = len(axis_subset.values)
+                    subsets.append(type(axis_subset)(axis_subset.axis, *shifted[index:index + count]))
+                    index += count
+                predicted.append(build(subsets))
+
+            # Drop predictions that no longer match the pattern
+            for query in list(self.__pending):
+                if query not in predicted and self.__pending[query].cancel():
+                    self.cancelled += 1
+                    self.__pending.pop(query, None)
+            for query in predicted:
+                if query not in self.__pending and query not in self.dbc.cache:
+                    self.prefetched += 1
+                    future = self.__executor.submit(self.dbc.execute_query, query)
+                    self.__pending[query] = future
+                    future.add_done_callback(lambda _, query=query: self.__done(query))
+
+    def __step(self) -> list:
+        '''
+            Offset between the last queries if it repeated enough times, None otherwise
+
+            Arguments:
+                self: self@Prefetcher
+        '''
+        if len(self.__history) < self.confirmations + 1:
+            return None
+        history = list(self.__history)
+        key, axes = history[-1][0], history[-1][1]
+        if any(entry[0] != key or entry[1] != axes for entry in history):
+            return None
+
+        steps = []
+        for previous, current in zip(history, history[1:]):
+            step = []
+            for before, after, value_before, value_after in zip(previous[2], current[2], previous[3], current[3]):
+                if before is None or after is None:
+                    # Values that cannot be stepped over must stay the same
+                    if value_before != value_after:
+                        return None
+                    step.append(0)
+                else:
+                    step.append(round(after - before, 9))
+            steps.append(step)
+
+        if any(step != steps[0] for step in steps) or not any(steps[0]):
+            return None
+        return steps[0]
+
+    def __done(self, query: str):
+        with self.__lock:
+            self.__pending.pop(query, None)
+
+    def __cancel(self):
+        for query, future in list(self.__pending.items()):
+            if future.cancel():
+                self.cancelled += 1
+                self.__pending.pop(query, None)
+
+    def cancel(self):
+        '''
+            Cancel every prediction that has not been sent yet
+
+            Arguments:
+                self: self@Prefetcher
+        '''
+        with self.__lock:
+            self.__cancel()
+
+    def wait(self, timeout: float = None):
+        '''
+            Wait until the predictions being fetched are in the cache
+
+            Arguments:
+                self: self@Prefetcher
+                timeout (float): maximum number of seconds to wait
+        '''
+        with self.__lock:
+            futures = list(self.__pending.values())
+        wait(futures, timeout)
+
+    def close(self):
+        '''
+            Cancel pending predictions and stop the background workers
+
+            Arguments:
+                self: self@Prefetcher
+        '''
+        self.cancel()
+        self.__executor.shutdown(wait=True)
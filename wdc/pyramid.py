@@ -0,0 +1,284 @@
+from __future__ import annotations
+from collections import namedtuple
+from lazy import lazy_import
+from decoders import decode
+
+np = lazy_import("numpy", globals(), "np")
+
+# Summary statistics of a block of cells, count is the number of valid cells
+Summary = namedtuple("Summary", ["min", "max", "sum", "count"])
+
+EMPTY = Summary(float("inf"), float("-inf"), 0.0, 0)
+
+
+def merge_summaries(summaries) -> Summary:
+    '''
+        Combine summaries of disjoint blocks into the summary of their union
+
+        Arguments:
+            summaries: iterable of Summary objects
+    '''
+    result = EMPTY
+    for summary in summaries:
+        result = Summary(min(result.min, summary.min), max(result.max, summary.max),
+                         result.sum + summary.sum, result.count + summary.count)
+    return result
+
+
+def summarize(values: np.ndarray, nodata: float = None) -> Summary:
+    '''
+        Compute the summary of an array, ignoring NaN and nodata cells
+
+        Arguments:
+            values (np.ndarray): block of cells
+            nodata (float): value of cells to ignore
+    '''
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    if nodata is not None:
+        valid &= values != nodata
+    values = values[valid]
+    if values.size == 0:
+        return EMPTY
+    return Summary(float(values.min()), float(values.max()), float(values.sum()), int(values.size))
+
+
+class SummaryPyramid:
+    '''
+        SummaryPyramid stores per-tile, per-time-step summary statistics of a 2D coverage
+        at several levels of detail. A tile of level L covers 2^L x 2^L tiles of level 0.
+        Range aggregates combine the largest stored tiles inside the range and only fetch
+        the cells of partial edge tiles, so their cost grows with the perimeter of the range.
+    '''
+
+    def __init__(self, shape: tuple, tile_size: tuple = (64, 64), levels: int = 4, nodata: float = None):
+        '''
+            Initialization of the pyramid
+
+            Arguments:
+                self: self@SummaryPyramid
+                shape (tuple): number of grid cells of the coverage along its two axes
+                tile_size (tuple): number of grid cells of a level 0 tile along each axis
+                levels (int): number of levels of detail
+                nodata (float): value of cells excluded from the statistics
+        '''
+        self.shape = tuple(shape)
+        self.tile_size = tuple(tile_size)
+        self.levels = levels
+        self.nodata = nodata
+        # One dictionary per level: (time key, tile row, tile column) -> Summary
+        self.tiles = [{} for _ in range(levels)]
+
+    def __tile_bounds(self, level: int, row: int, column: int) -> tuple:
+        '''
+            Grid bounds (row start, row end, column start, column end) of a tile, clipped to the coverage
+
+            Arguments:
+                self: self@SummaryPyramid
+                level (int): level of the tile
+                row (int): tile row
+                column (int): tile column
+        '''
+        height, width = (size << level for size in self.tile_size)
+        return (row * height, min((row + 1) * height, self.shape[0]),
+                column * width, min((column + 1) * width, self.shape[1]))
+
+    def __tile_count(self, level: int) -> tuple:
+        height, width = (size << level for size in self.tile_size)
+        return -(-self.shape[0] // height), -(-self.shape[1] // width)
+
+    def add(self, time_key, values: np.ndarray, origin: tuple = (0, 0)):
+        '''
+            Index the complete tiles contained in a fetched block of cells
+
+            Arguments:
+                self: self@SummaryPyramid
+                time_key: key of the time step of the block (e.g. "2015-05")
+                values (np.ndarray): fetched 2D block of cells
+                origin (tuple): grid index of the first cell of the block
+        '''
+        values = np.asarray(values, dtype=float)
+        row_start, column_start = origin
+        row_end, column_end = row_start + values.shape[0], column_start + values.shape[1]
+        tile_height, tile_width = self.tile_size
+
+        # Level 0 tiles fully covered by the block
+        for row in range(-(-row_start // tile_height), row_end // tile_height + 1):
+            for column in range(-(-column_start // tile_width), column_end // tile_width + 1):
+                top, bottom, left, right = self.__tile_bounds(0, row, column)
+                if top >= bottom or left >= right or bottom > row_end or right > column_end:
+                    continue
+                block = values[top - row_start:bottom - row_start, left - column_start:right - column_start]
+                self.tiles[0][(time_key, row, column)] = summarize(block, self.nodata)
+                self.__build_parents(time_key, row, column)
+
+    def __build_parents(self, time_key, row: int, column: int):
+        '''
+            Build the coarser tiles above a level 0 tile once all of their children are known
+
+            Arguments:
+                self: self@SummaryPyramid
+                time_key: key of the time step
+                row (int): level 0 tile row
+                column (int): level 0 tile column
+        '''
+        for level in range(1, self.levels):
+            row, column = row // 2, column // 2
+            rows, columns = self.__tile_count(level - 1)
+            children = []
+            for child_row in (2 * row, 2 * row + 1):
+                for child_column in (2 * column, 2 * column + 1):
+                    # Children outside of the coverage do not exist and are empty
+                    if child_row >= rows or child_column >= columns:
+                        continue
+                    child = self.tiles[level - 1].get((time_key, child_row, child_column))
+                    if child is None:
+                        return
+                    children.append(child)
+            self.tiles[level][(time_key, row, column)] = merge_summaries(children)
+
+    def summarize(self, time_keys: list, rows: tuple, columns: tuple, fetch=None) -> Summary:
+        '''
+            Summary of a grid range over several time steps. Per time step, at most four
+            perimeter strips and one block bounding the interior tiles not indexed yet are fetched.
+
+            Arguments:
+                self: self@SummaryPyramid
+                time_keys (list): keys of the time steps in the range
+                rows (tuple): grid row range (start, end), end excluded
+                columns (tuple): grid column range (start, end), end excluded
+                fetch: callable fetch(time_key, rows, columns) returning the 2D block of a grid range,
+                       used for edge tiles and tiles not indexed yet
+        '''
+        inner_rows = self.__inner_range(rows, 0)
+        inner_columns = self.__inner_range(columns, 1)
+        summaries = []
+        for time_key in time_keys:
+            if inner_rows[0] >= inner_rows[1] or inner_columns[0] >= inner_columns[1]:
+                # No complete tile in the range, it is fetched as a single block
+                summaries.append(self.__fetch_summary(fetch, time_key, rows, columns))
+                continue
+
+            # Perimeter strips covering the partial edge tiles
+            strips = [((rows[0], inner_rows[0]), columns), ((inner_rows[1], rows[1]), columns),
+                      (inner_rows, (columns[0], inner_columns[0])), (inner_rows, (inner_columns[1], columns[1]))]
+            for strip_rows, strip_columns in strips:
+                if strip_rows[0] < strip_rows[1] and strip_columns[0] < strip_columns[1]:
+                    summaries.append(self.__fetch_summary(fetch, time_key, strip_rows, strip_columns))
+
+            pending = []
+            top_rows, top_columns = self.__tile_count(self.levels - 1)
+            for row in range(top_rows):
+                for column in range(top_columns):
+                    self.__collect(time_key, self.levels - 1, row, column, inner_rows, inner_columns,
+                                   summaries, pending)
+            if not pending:
+                continue
+
+            # A single block bounding the missing interior tiles is fetched and indexed
+            bounds = [self.__tile_bounds(0, row, column) for row, column in pending]
+            block_rows = (min(bound[0] for bound in bounds), max(bound[1] for bound in bounds))
+            block_columns = (min(bound[2] for bound in bounds), max(bound[3] for bound in bounds))
+            if fetch is None:
+                raise ValueError("The range is not indexed and no fetch function was given")
+            self.add(time_key, fetch(time_key, block_rows, block_columns), (block_rows[0], block_columns[0]))
+            summaries.extend(self.tiles[0][(time_key, row, column)] for row, column in pending)
+        return merge_summaries(summaries)
+
+    def __inner_range(self, grid_range: tuple, axis: int) -> tuple:
+        '''
+            Part of a grid range made of complete level 0 tiles along one axis
+
+            Arguments:
+                self: self@SummaryPyramid
+                grid_range (tuple): grid range (start, end), end excluded
+                axis (int): 0 for rows, 1 for columns
+        '''
+        size = self.tile_size[axis]
+        start = -(-grid_range[0] // size) * size
+        # The last tile of the coverage is complete even if it is smaller
+        end = grid_range[1] if grid_range[1] >= self.shape[axis] else grid_range[1] // size * size
+        return start, max(start, end)
+
+    def __fetch_summary(self, fetch, time_key, rows: tuple, columns: tuple) -> Summary:
+        if fetch is None:
+            raise ValueError("The range is not indexed and no fetch function was given")
+        block = fetch(time_key, rows, columns)
+        # Complete tiles contained in the block are indexed for the next queries
+        self.add(time_key, block, (rows[0], columns[0]))
+        return summarize(block, self.nodata)
+
+    def __collect(self, time_key, level, row, column, rows, columns, summaries, pending):
+        '''
+            Descend from a tile to the largest stored tiles inside the range and the level 0 tiles to fetch
+
+            Arguments:
+                self: self@SummaryPyramid
+                time_key: key of the time step
+                level (int): level of the tile
+                row (int): tile row
+                column (int): tile column
+                rows (tuple): grid row range of complete tiles
+                columns (tuple): grid column range of complete tiles
+                summaries (list): summaries of the stored tiles, filled by the call
+                pending (list): (row, column) of the level 0 tiles to fetch, filled by the call
+        '''
+        top, bottom, left, right = self.__tile_bounds(level, row, column)
+        overlap_rows = (max(top, rows[0]), min(bottom, rows[1]))
+        overlap_columns = (max(left, columns[0]), min(right, columns[1]))
+        if overlap_rows[0] >= overlap_rows[1] or overlap_columns[0] >= overlap_columns[1]:
+            return
+
+        inside = overlap_rows == (top, bottom) and overlap_columns == (left, right)
+        stored = self.tiles[level].get((time_key, row, column))
+        if inside and stored is not None:
+            summaries.append(stored)
+        elif level > 0:
+            for child_row in (2 * row, 2 * row + 1):
+                for child_column in (2 * column, 2 * column + 1):
+                    self.__collect(time_key, level - 1, child_row, child_column, rows, columns, summaries, pending)
+        else:
+            pending.append((row, column))
+
+    def aggregate(self, operation: str, time_keys: list, rows: tuple, columns: tuple, fetch=None) -> float:
+        '''
+            Range aggregate over several time steps
+
+            Arguments:
+                self: self@SummaryPyramid
+                operation (str): aggregate (available: min, max, avg, count, sum)
+                time_keys (list): keys of the time steps in the range
+                rows (tuple): grid row range (start, end), end excluded
+                columns (tuple): grid column range (start, end), end excluded
+                fetch: see summarize
+        '''
+        summary = self.summarize(time_keys, rows, columns, fetch)
+        if operation == "avg":
+            return summary.sum / summary.count if summary.count else float("nan")
+        if operation == "count":
+            return summary.count
+        if operation not in ("min", "max", "sum"):
+            raise ValueError(f"Unsupported aggregate '{operation}'")
+        return getattr(summary, operation)
+
+
+def coverage_fetcher(dbc, coverage_id: str, time_axis: str, row_axis: str, column_axis: str):
+    '''
+        Build a fetch function for SummaryPyramid that requests grid ranges of a coverage
+
+        Arguments:
+            dbc: database connector
+            coverage_id (str): coverage id
+            time_axis (str): label of the time axis, sliced with the time key
+            row_axis (str): label of the axis indexed by pyramid rows
+            column_axis (str): label of the axis indexed by pyramid columns
+    '''
+    def fetch(time_key, rows: tuple, columns: tuple) -> np.ndarray:
+        subsets = [f'{time_axis}("{time_key}")',
+                   f'{row_axis}:"CRS:1"({rows[0]}:{rows[1] - 1})',
+                   f'{column_axis}:"CRS:1"({columns[0]}:{columns[1] - 1})']
+        query = f'for $c in ({coverage_id})\nreturn encode($c[{", ".join(subsets)}], "application/json")'
+        block = decode(dbc.execute_query(query), "application/json")
+        return np.asarray(block).reshape(rows[1] - rows[0], columns[1] - columns[0])
+
+    return fetch
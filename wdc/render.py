@@ -0,0 +1,133 @@
+from __future__ import annotations
+import struct
+import zlib
+from lazy import lazy_import
+
+np = lazy_import("numpy", globals(), "np")
+
+
+def encode_png(pixels: np.ndarray, compression: int = 6) -> bytes:
+    '''
+        Encode an 8-bit RGB or RGBA pixel array of shape (height, width, channels) as PNG
+
+        Arguments:
+            pixels (np.ndarray): pixel array with 3 or 4 channels
+            compression (int): zlib compression level
+    '''
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width, channels = pixels.shape
+    color_type = {3: 2, 4: 6}[channels]
+
+    # Every row starts with filter type 0 (no filtering)
+    rows = np.zeros((height, width * channels + 1), dtype=np.uint8)
+    rows[:, 1:] = pixels.reshape(height, width * channels)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), compression)) + chunk(b"IEND", b""))
+
+
+class Style:
+    '''
+        Style maps numeric values to colors with a lookup table.
+        A value v gets the color of the first class whose upper break is greater than v,
+        values above the last break get the last color.
+    '''
+
+    def __init__(self, breaks: list, colors: list, nodata: float = None, nodata_color: tuple = (0, 0, 0, 0)):
+        '''
+            Initialization of the style
+
+            Arguments:
+                self: self@Style
+                breaks (list): ascending class breaks
+                colors (list): RGB or RGBA colors, one more than there are breaks
+                nodata (float): value rendered with the nodata color (NaN always is)
+                nodata_color (tuple): RGB or RGBA color of nodata cells
+        '''
+        if len(colors) != len(breaks) + 1:
+            raise ValueError("A style needs exactly one color more than it has breaks")
+
+        self.breaks = np.asarray(breaks, dtype=float)
+        # The lookup table holds every class color, always as RGBA
+        self.table = np.array([tuple(color) + (255,) * (4 - len(color)) for color in colors], dtype=np.uint8)
+        self.nodata = nodata
+        self.nodata_color = np.array(tuple(nodata_color) + (255,) * (4 - len(nodata_color)), dtype=np.uint8)
+
+    @classmethod
+    def linear(cls, minimum: float, maximum: float, colors: list, steps: int = 256, **kwargs) -> 'Style':
+        '''
+            Build a continuous style interpolating the given colors between minimum and maximum
+
+            Arguments:
+                cls: Style
+                minimum (float): value mapped to the first color
+                maximum (float): value mapped to the last color
+                colors (list): RGB or RGBA anchor colors, evenly spaced
+                steps (int): number of entries in the lookup table
+        '''
+        anchors = np.array([tuple(color) + (255,) * (4 - len(color)) for color in colors], dtype=float)
+        positions = np.linspace(0, 1, len(anchors))
+        samples = np.linspace(0, 1, steps)
+        table = np.stack([np.interp(samples, positions, anchors[:, channel]) for channel in range(4)], axis=1)
+        breaks = np.linspace(minimum, maximum, steps + 1)[1:-1]
+        return cls(breaks, [tuple(color) for color in np.rint(table).astype(int)], **kwargs)
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        '''
+            Color the given values, returns an RGBA array of shape values.shape + (4,)
+
+            Arguments:
+                self: self@Style
+                values (np.ndarray): numeric values to color
+        '''
+        values = np.asarray(values, dtype=float)
+        pixels = self.table[np.searchsorted(self.breaks, values, side="right")]
+
+        mask = np.isnan(values)
+        if self.nodata is not None:
+            mask |= values == self.nodata
+        pixels[mask] = self.nodata_color
+        return pixels
+
+
+class Layer:
+    '''
+        Layer keeps a fetched numeric subset so it can be restyled locally without new queries
+    '''
+
+    def __init__(self, values: np.ndarray):
+        '''
+            Initialization of the layer
+
+            Arguments:
+                self: self@Layer
+                values (np.ndarray): 2D numeric subset
+        '''
+        self.values = np.asarray(values, dtype=float)
+        if self.values.ndim != 2:
+            raise ValueError("Only 2D subsets can be rendered")
+
+    def render(self, style: Style) -> np.ndarray:
+        '''
+            Apply a style to the layer and return the RGBA pixels
+
+            Arguments:
+                self: self@Layer
+                style (Style): style to apply
+        '''
+        return style.apply(self.values)
+
+    def to_png(self, style: Style, compression: int = 6) -> bytes:
+        '''
+            Apply a style to the layer and encode the result as PNG
+
+            Arguments:
+                self: self@Layer
+                style (Style): style to apply
+                compression (int): zlib compression level
+        '''
+        return encode_png(self.render(style), compression)
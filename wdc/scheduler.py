@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PriorityClass:
+    '''
+        PriorityClass describes one class of traffic sharing a connector
+    '''
+
+    def __init__(self, name: str, weight: float = 1.0, max_concurrency: int = None):
+        '''
+            Initialization of the priority class
+
+            Arguments:
+                self: self@PriorityClass
+                name (str): name of the class, e.g. "interactive"
+                weight (float): share of the slots the class gets while other classes are waiting
+                max_concurrency (int): maximum number of queries of the class running at once, None for no cap
+        '''
+        if weight <= 0:
+            raise ValueError("Weight must be positive")
+        self.name = name
+        self.weight = weight
+        self.max_concurrency = max_concurrency
+        self.queue = deque()  # Events of the waiting queries, first come first served
+        self.running = 0
+        self.started = 0
+        self.completed = 0
+        self.max_queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.virtual_time = 0.0  # Slots granted so far divided by the weight
+
+
+class PriorityScheduler:
+    '''
+        PriorityScheduler queues queries by priority class and grants the slots of a connector
+        with weighted fair sharing: among the classes with waiting queries and below their cap,
+        the class that received the smallest share relative to its weight goes next
+    '''
+
+    def __init__(self, max_concurrency: int = 8, classes: list = None, default: str = "interactive"):
+        '''
+            Initialization of the scheduler
+
+            Arguments:
+                self: self@PriorityScheduler
+                max_concurrency (int): maximum number of queries running at once over all classes
+                classes (list): PriorityClass objects; by default interactive queries get eight times
+                                the share of batch queries, which may use at most half of the slots
+                default (str): class of queries without a priority
+        '''
+        if classes is None:
+            classes = [PriorityClass("interactive", weight=8),
+                       PriorityClass("batch", weight=1, max_concurrency=max(1, max_concurrency // 2))]
+        self.max_concurrency = max_concurrency
+        self.classes = {priority_class.name: priority_class for priority_class in classes}
+        if default not in self.classes:
+            raise ValueError(f"Unknown priority class '{default}'")
+        self.default = default
+        self.running = 0
+        self.__lock = threading.Lock()
+
+    def __class_of(self, priority: str) -> PriorityClass:
+        name = self.default if priority is None else priority
+        if name not in self.classes:
+            raise ValueError(f"Unknown priority class '{name}'")
+        return self.classes[name]
+
+    def acquire(self, priority: str = None, timeout: float = None):
+        '''
+            Wait for a slot of the given class
+
+            Arguments:
+                self: self@PriorityScheduler
+                priority (str): priority class, None for the default class
+                timeout (float): maximum number of seconds to wait, raises TimeoutError when exceeded
+        '''
+        priority_class = self.__class_of(priority)
+        event = threading.Event()
+        queued = time.perf_counter()
+        with self.__lock:
+            if not priority_class.queue and not priority_class.running:
+                # A class coming back from idle does not get credit for the time it was idle
+                active = [other.virtual_time for other in self.classes.values() if other.queue or other.running]
+                priority_class.virtual_time = max(priority_class.virtual_time, min(active, default=0))
+            priority_class.queue.append(event)
+            priority_class.max_queued = max(priority_class.max_queued, len(priority_class.queue))
+            self.__dispatch()
+
+        if not event.wait(timeout):
+            with self.__lock:
+                if event in priority_class.queue:
+                    priority_class.queue.remove(event)
+                    raise TimeoutError(f"No {priority_class.name} slot within {timeout} seconds")
+            # The slot was granted while timing out, keep it
+
+        waited = time.perf_counter() - queued
+        with self.__lock:
+            priority_class.started += 1
+            priority_class.wait_total += waited
+            priority_class.wait_max = max(priority_class.wait_max, waited)
+
+    def release(self, priority: str = None):
+        '''
+            Give back a slot of the given class
+
+            Arguments:
+                self: self@PriorityScheduler
+                priority (str): priority class, None for the default class
+        '''
+        priority_class = self.__class_of(priority)
+        with self.__lock:
+            priority_class.running -= 1
+            priority_class.completed += 1
+            self.running -= 1
+            self.__dispatch()
+
+    def __dispatch(self):
+        '''
+            Grant free slots to waiting queries, the lock must be held
+
+            Arguments:
+                self: self@PriorityScheduler
+        '''
+        while self.running < self.max_concurrency:
+            eligible = [priority_class for priority_class in self.classes.values()
+                        if priority_class.queue and (priority_class.max_concurrency is None
+                                                     or priority_class.running < priority_class.max_concurrency)]
+            if not eligible:
+                return
+            priority_class = min(eligible, key=lambda candidate: candidate.virtual_time)
+            priority_class.virtual_time += 1 / priority_class.weight
+            priority_class.running += 1
+            self.running += 1
+            priority_class.queue.popleft().set()
+
+    @contextmanager
+    def slot(self, priority: str = None, timeout: float = None):
+        '''
+            Context manager holding a slot of the given class
+
+            Arguments:
+                self: self@PriorityScheduler
+                priority (str): priority class, None for the default class
+                timeout (float): maximum number of seconds to wait for the slot
+        '''
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def stats(self) -> dict:
+        '''
+            Queue depth, running queries and wait times of every class
+
+            Arguments:
+                self: self@PriorityScheduler
+        '''
+        with self.__lock:
+            return {
+                name: {
+                    "queued": len(priority_class.queue),
+                    "max_queued": priority_class.max_queued,
+                    "running": priority_class.running,
+                    "completed": priority_class.completed,
+                    "wait_avg": priority_class.wait_total / priority_class.started if priority_class.started else 0.0,
+                    "wait_max": priority_class.wait_max,
+                }
+                for name, priority_class in self.classes.items()
+            }
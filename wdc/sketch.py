@@ -0,0 +1,121 @@
+from __future__ import annotations
+from lazy import lazy_import
+
+np = lazy_import("numpy", globals(), "np")
+
+
+class KLLSketch:
+    '''
+        KLLSketch is a mergeable quantile sketch with bounded memory.
+        Values are kept in compactors; a value stored at level h stands for 2^h values.
+        When a compactor is full it is sorted and every other value is promoted to the next level.
+    '''
+
+    def __init__(self, k: int = 200, seed: int = None):
+        '''
+            Initialization of the sketch
+
+            Arguments:
+                self: self@KLLSketch
+                k (int): capacity of the top compactor, the rank error is roughly 1.7 / k
+                seed (int): seed of the random offsets used by the compactions
+        '''
+        self.k = k
+        self.count = 0  # Number of values folded into the sketch
+        self.compactors = [np.empty(0)]
+        self.__random = np.random.default_rng(seed)
+
+    def __capacity(self, level: int) -> int:
+        '''
+            Capacity of a compactor; lower levels get geometrically smaller capacities
+
+            Arguments:
+                self: self@KLLSketch
+                level (int): level of the compactor
+        '''
+        depth = len(self.compactors) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def update(self, values: np.ndarray) -> 'KLLSketch':
+        '''
+            Fold values into the sketch, NaN values are ignored
+
+            Arguments:
+                self: self@KLLSketch
+                values (np.ndarray): values of any shape
+        '''
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        self.count += values.size
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self.__compress()
+        return self
+
+    def merge(self, other: 'KLLSketch') -> 'KLLSketch':
+        '''
+            Fold another sketch into this one
+
+            Arguments:
+                self: self@KLLSketch
+                other (KLLSketch): sketch to merge
+        '''
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0))
+        for level, compactor in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], compactor])
+        self.count += other.count
+        self.__compress()
+        return self
+
+    def __compress(self):
+        '''
+            Compact every compactor above its capacity until the sketch fits
+
+            Arguments:
+                self: self@KLLSketch
+        '''
+        level = 0
+        while level < len(self.compactors):
+            compactor = self.compactors[level]
+            if compactor.size > self.__capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0))
+                compactor = np.sort(compactor)
+                # An odd value out stays at this level
+                kept = compactor[-1:] if compactor.size % 2 else compactor[:0]
+                paired = compactor[:compactor.size - kept.size]
+                promoted = paired[self.__random.integers(2)::2]
+                self.compactors[level] = kept
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+                # Capacities changed if a level was added, start over from the bottom
+                level = 0
+                continue
+            level += 1
+
+    def size(self) -> int:
+        '''
+            Number of values stored in the sketch
+
+            Arguments:
+                self: self@KLLSketch
+        '''
+        return sum(compactor.size for compactor in self.compactors)
+
+    def quantiles(self, quantiles: list) -> np.ndarray:
+        '''
+            Estimate quantiles of all values folded into the sketch
+
+            Arguments:
+                self: self@KLLSketch
+                quantiles (list): quantiles between 0 and 1 (0.5 is the median)
+        '''
+        values = np.concatenate(self.compactors)
+        if values.size == 0:
+            return np.full(len(quantiles), np.nan)
+        weights = np.concatenate([np.full(compactor.size, 2.0 ** level)
+                                  for level, compactor in enumerate(self.compactors)])
+        order = np.argsort(values, kind="stable")
+        values, ranks = values[order], np.cumsum(weights[order])
+        targets = np.asarray(quantiles, dtype=float) * ranks[-1]
+        positions = np.minimum(np.searchsorted(ranks, targets, side="left"), values.size - 1)
+        return values[positions]
@@ -0,0 +1,189 @@
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Quoted strings or numbers outside of them; strings holding only a date, time or number are
+# subset values, other strings such as formats and encoding options belong to the shape
+LITERAL = re.compile(r'"(?:[^"\\]|\\.)*"|(?<![\w$.])[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+VALUE_STRING = re.compile(r'"[\d\-:T.Z+ ]*"')
+PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,?\s*\?)+')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_query(query: str) -> str:
+    '''
+        Shape of a query: the query with the literal values of subsets, polygons and
+        conditions replaced by "?", so that the same query over other values has the same shape
+
+        Arguments:
+            query (str): WCPS query
+    '''
+    def replace(match):
+        literal = match.group(0)
+        if literal.startswith('"') and not VALUE_STRING.fullmatch(literal):
+            return literal
+        return "?"
+
+    shape = LITERAL.sub(replace, WHITESPACE.sub(" ", query).strip())
+    # Coordinate lists of any length, e.g. polygon vertices, have the same shape
+    return PLACEHOLDER_LIST.sub("?", shape)
+
+
+def shape_hash(shape: str) -> str:
+    return hashlib.sha256(shape.encode()).hexdigest()[:16]
+
+
+def percentile(ordered: list, percent: float) -> float:
+    '''
+        Nearest-rank percentile of sorted values, None without values
+
+        Arguments:
+            ordered (list): sorted values
+            percent (float): percentile between 0 and 100
+    '''
+    if not ordered:
+        return None
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+class QueryShape:
+    '''
+        QueryShape aggregates the logged queries of one shape; latencies are kept in a bounded
+        reservoir sample, so the percentiles stay representative however many queries are logged
+    '''
+
+    def __init__(self, shape: str, example: str, max_samples: int):
+        self.shape = shape
+        self.example = example  # First logged query of the shape
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.seconds = 0.0  # Total latency of the logged queries
+        self.last_seen = None
+        self.max_samples = max_samples
+        self.samples = []
+
+    def add(self, seconds: float, received: int, ok: bool, generator: random.Random):
+        self.count += 1
+        self.errors += not ok
+        self.bytes += received
+        self.seconds += seconds
+        self.last_seen = time.time()
+        if len(self.samples) < self.max_samples:
+            self.samples.append(seconds)
+        else:
+            index = generator.randrange(self.count)
+            if index < self.max_samples:
+                self.samples[index] = seconds
+
+    def summary(self) -> dict:
+        ordered = sorted(self.samples)
+
+        def milliseconds(percent):
+            value = percentile(ordered, percent)
+            return None if value is None else value * 1000
+
+        return {"shape": self.shape, "hash": shape_hash(self.shape), "count": self.count, "errors": self.errors,
+                "total_ms": self.seconds * 1000, "p50_ms": milliseconds(50), "p95_ms": milliseconds(95),
+                "p99_ms": milliseconds(99), "bytes": self.bytes, "mean_bytes": self.bytes / self.count,
+                "example": self.example, "last_seen": self.last_seen}
+
+
+class SlowQueryLog:
+    '''
+        SlowQueryLog keeps the queries slower than a threshold, and the failed ones, grouped by
+        query shape. Slow queries can be sampled, the number of shapes is bounded by evicting
+        the least recently seen one, and only the most recent entries are kept verbatim.
+    '''
+
+    def __init__(self, threshold: float = 1.0, sample_rate: float = 1.0, max_shapes: int = 200,
+                 max_samples: int = 1000, max_entries: int = 100, seed: int = None):
+        '''
+            Initialization of the log
+
+            Arguments:
+                self: self@SlowQueryLog
+                threshold (float): seconds from which a successful query is logged
+                sample_rate (float): share of the slow queries logged; failed queries always are
+                max_shapes (int): maximum number of shapes aggregated
+                max_samples (int): latencies kept per shape for the percentiles
+                max_entries (int): most recent logged queries kept verbatim
+                seed (int): seed of the sampling, for reproducible logs
+        '''
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.max_shapes = max_shapes
+        self.max_samples = max_samples
+        self.evicted = 0  # Shapes dropped to stay within max_shapes
+        self.__shapes = OrderedDict()  # QueryShape by shape, least recently seen first
+        self.__entries = deque(maxlen=max_entries)
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+
+    def record(self, query: str, seconds: float, result=None):
+        '''
+            Log a query if it failed or was slow and sampled
+
+            Arguments:
+                self: self@SlowQueryLog
+                query (str): WCPS query
+                seconds (float): latency of the query
+                result: result of the query or its size in bytes, None when it failed
+        '''
+        ok = result is not None
+        if ok and seconds < self.threshold:
+            return
+        with self.__lock:
+            if ok and self.sample_rate < 1 and self.__random.random() >= self.sample_rate:
+                return
+        if isinstance(result, (bytes, bytearray)):
+            received = len(result)
+        else:
+            received = result if isinstance(result, int) else 0
+        shape = normalize_query(query)
+        with self.__lock:
+            aggregate = self.__shapes.get(shape)
+            if aggregate is None:
+                aggregate = self.__shapes[shape] = QueryShape(shape, query, self.max_samples)
+                if len(self.__shapes) > self.max_shapes:
+                    self.__shapes.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self.__shapes.move_to_end(shape)
+            aggregate.add(seconds, received, ok, self.__random)
+            self.__entries.append({"time": time.time(), "hash": shape_hash(shape), "ms": seconds * 1000,
+                                   "bytes": received, "ok": ok, "query": query})
+
+    def report(self, order: str = "total_ms") -> list:
+        '''
+            Summary of every shape: count, errors, total and p50/p95/p99 latency in milliseconds,
+            bytes and an example query, the shapes costing the most first
+
+            Arguments:
+                self: self@SlowQueryLog
+                order (str): summary key the shapes are sorted by, e.g. total_ms, count, p99_ms or bytes
+        '''
+        with self.__lock:
+            summaries = [aggregate.summary() for aggregate in self.__shapes.values()]
+        return sorted(summaries, key=lambda summary: summary[order] or 0, reverse=True)
+
+    def entries(self) -> list:
+        '''
+            Most recent logged queries, oldest first
+
+            Arguments:
+                self: self@SlowQueryLog
+        '''
+        with self.__lock:
+            return list(self.__entries)
+
+    def clear(self):
+        with self.__lock:
+            self.__shapes.clear()
+            self.__entries.clear()
+            self.evicted = 0
@@ -0,0 +1,1363 @@
+from __future__ import annotations
+import argparse
+import itertools
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+from xml.sax.saxutils import escape
+from lazy import lazy_import
+from grid import AxisReference, cell_coordinate, from_coordinate, grid_indices, to_coordinate
+from render import encode_png
+
+np = lazy_import("numpy", globals(), "np")
+
+# Values of a coverage subset together with the labels and the first grid index of its axes,
+# and the mask of its null (nodata) cells or None; a multiband value (a {red: ..; green: ..}
+# struct) has one more trailing dimension than axes
+Array = namedtuple("Array", ["data", "axes", "lows", "nulls", "bands"])
+
+# Grid index domain of one axis, returned by imageCrsDomain
+Domain = namedtuple("Domain", ["lo", "hi"])
+
+# Vertices of a POLYGON, in the order of the axes of the clipped coverage
+Polygon = namedtuple("Polygon", ["vertices"])
+
+# Encoded result of a query
+Encoded = namedtuple("Encoded", ["payload", "content_type"])
+
+# Accepted format names of encode and GetCoverage and the content types they stand for
+FORMATS = {
+    "text/csv": "text/csv",
+    "csv": "text/csv",
+    "application/json": "application/json",
+    "json": "application/json",
+    "application/octet-stream": "application/octet-stream",
+    "binary": "application/octet-stream",
+    "image/png": "image/png",
+    "png": "image/png",
+}
+
+CONDENSERS = ("avg", "max", "min", "sum", "add", "count", "cellcount", "some", "all")
+
+FUNCTIONS = {
+    "abs": "absolute",
+    "sqrt": "sqrt",
+    "exp": "exp",
+    "ln": "log",
+    "log": "log10",
+    "sin": "sin",
+    "cos": "cos",
+}
+
+# Binary operators of the query language and the NumPy functions evaluating them
+OPERATORS = {
+    "+": "add",
+    "-": "subtract",
+    "*": "multiply",
+    "/": "true_divide",
+    "=": "equal",
+    "!=": "not_equal",
+    "<": "less",
+    ">": "greater",
+    "<=": "less_equal",
+    ">=": "greater_equal",
+    "and": "logical_and",
+    "or": "logical_or",
+    "max": "maximum",
+    "min": "minimum",
+}
+
+# Start value of the general condensers (condense <operator> over ...)
+IDENTITIES = {"+": 0, "*": 1, "max": float("-inf"), "min": float("inf"), "and": True, "or": False}
+
+TOKENS = re.compile(r'\s*(?:(?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?)|(?P<string>"(?:[^"\\]|\\.)*")'
+                    r'|(?P<name>\$?[A-Za-z_]\w*)|(?P<operator>>=|<=|!=|[-+*/()\[\]{},:;=<>.]))')
+
+KVP_SUBSET = re.compile(r'^\s*(\w+)(?:,([^()]*))?\((.*)\)\s*$')
+
+BOUNDARY = "wcps-stand-in-part"
+
+WCS = "http://www.opengis.net/wcs/2.0"
+OWS = "http://www.opengis.net/ows/2.0"
+GML = "http://www.opengis.net/gml/3.2"
+GMLCOV = "http://www.opengis.net/gmlcov/1.0"
+RGRID = "http://www.opengis.net/gml/3.3/rgrid"
+
+
+class WCPSError(Exception):
+    '''
+        Raised for a query the stand-in cannot evaluate; it is answered with an OWS exception report
+    '''
+
+    def __init__(self, message: str, status: int = 400, code: str = "InvalidRequest"):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+class _Pointwise(Exception):
+    '''
+        Raised when an expression cannot be evaluated for all points of a coverage constructor at once
+    '''
+
+
+def regular_axis(label: str, origin: float, resolution: float, size: int) -> AxisReference:
+    '''
+        Regular axis with cells of the same size
+
+        Arguments:
+            label (str): axis label, e.g. "Lat"
+            origin (float): coordinate of the center of the first cell
+            resolution (float): distance between cell centers, negative for descending axes
+            size (int): number of cells
+    '''
+    return AxisReference(label, 0, size - 1, float(origin), float(resolution), None)
+
+
+def monthly_axis(label: str, start: str, size: int) -> AxisReference:
+    '''
+        Irregular time axis with one cell per month, like the ansi axis of AvgLandTemp
+
+        Arguments:
+            label (str): axis label, e.g. "ansi"
+            start (str): first month, e.g. "2000-01"
+            size (int): number of months
+    '''
+    year, month = (int(part) for part in start.split("-")[:2])
+    first = year * 12 + month - 1
+    coordinates = [to_coordinate(f"{(first + step) // 12:04d}-{(first + step) % 12 + 1:02d}") for step in range(size)]
+    return AxisReference(label, 0, size - 1, coordinates[0], 1.0, coordinates)
+
+
+class SyntheticCoverage:
+    '''
+        SyntheticCoverage is a coverage whose cell values are computed from their grid indices,
+        so that any subset is produced without holding the whole coverage in memory and the
+        same cells always have the same values
+    '''
+
+    MULTIPLIERS = (7, 13, 3, 11, 5)
+
+    def __init__(self, coverage_id: str, axes: list, dtype: str = "float32", nodata: float = None, seed: int = 0):
+        '''
+            Initialization of the coverage
+
+            Arguments:
+                self: self@SyntheticCoverage
+                coverage_id (str): coverage id
+                axes (list): AxisReference of every axis, see regular_axis and monthly_axis
+                dtype (str): NumPy data type of the cells
+                nodata (float): value of every 23rd cell, skipped by the condensers; None for no such cells
+                seed (int): offset of the generated values
+        '''
+        self.coverage_id = coverage_id
+        self.axes = list(axes)
+        self.dtype = dtype
+        self.nodata = nodata
+        self.seed = seed
+
+    @property
+    def shape(self) -> tuple:
+        return tuple(axis.high - axis.low + 1 for axis in self.axes)
+
+    def axis(self, label: str) -> AxisReference:
+        for axis in self.axes:
+            if axis.axis == label:
+                return axis
+        raise WCPSError(f"Axis {label} is not an axis of coverage {self.coverage_id}")
+
+    def read(self, ranges: list = None) -> np.ndarray:
+        '''
+            Values of the cells between the given grid indices
+
+            Arguments:
+                self: self@SyntheticCoverage
+                ranges (list): first and last grid index of every axis, None for the whole coverage
+        '''
+        if ranges is None:
+            ranges = [(axis.low, axis.high) for axis in self.axes]
+        shape = tuple(high - low + 1 for low, high in ranges)
+        total = np.full(shape, self.seed, dtype=np.int64)
+        for position, (low, high) in enumerate(ranges):
+            indices = np.arange(low, high + 1, dtype=np.int64).reshape(
+                [-1 if other == position else 1 for other in range(len(ranges))])
+            total += indices * SyntheticCoverage.MULTIPLIERS[position % len(SyntheticCoverage.MULTIPLIERS)]
+
+        dtype = np.dtype(self.dtype)
+        values = total % 251
+        if dtype.kind == "b":
+            data = values % 2 == 1
+        elif dtype.kind in "iu":
+            data = values.astype(dtype)
+        else:
+            data = (values * 0.1 - 5.0).astype(dtype)
+        if self.nodata is not None:
+            data[total % 23 == 0] = self.nodata
+        return data
+
+
+def default_coverages() -> list:
+    '''
+        Coverages served when none are given, shaped like the rasdaman demo coverages used in main.py
+    '''
+    return [
+        SyntheticCoverage("AvgLandTemp", [monthly_axis("ansi", "2000-01", 192),
+                                          regular_axis("Lat", 89.75, -0.5, 360),
+                                          regular_axis("Long", -179.75, 0.5, 720)], nodata=99999),
+        SyntheticCoverage("AverageChloroColor", [regular_axis("Lat", 89.75, -0.5, 360),
+                                                 regular_axis("Long", -179.75, 0.5, 720)], dtype="uint8"),
+        SyntheticCoverage("mean_summer_airtemp", [regular_axis("Lat", -10.025, -0.05, 700),
+                                                  regular_axis("Long", 112.025, 0.05, 850)]),
+    ]
+
+
+def tokenize(text: str) -> list:
+    '''
+        Split a WCPS query into (kind, text) tokens
+
+        Arguments:
+            text (str): query
+    '''
+    tokens = []
+    text = text.rstrip()
+    position = 0
+    while position < len(text):
+        match = TOKENS.match(text, position)
+        if match is None:
+            raise WCPSError(f"Unexpected character at position {position}: {text[position:position + 20]!r}")
+        tokens.append((match.lastgroup, match.group(match.lastgroup)))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    '''
+        Parser turns the tokens of a WCPS query into a tree of tuples, ("kind", ...).
+        It covers the part of the language the connector emits: for clauses, subsets,
+        arithmetic and comparisons, condensers, switch, coverage constructors, general
+        condensers, scale, imageCrsDomain and encode.
+    '''
+
+    def __init__(self, text: str):
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> tuple:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def at(self, *texts) -> bool:
+        kind, text = self.peek()
+        return text is not None and (text.lower() if kind == "name" else text) in texts
+
+    def take(self, *texts) -> str:
+        kind, text = self.peek()
+        if text is None:
+            raise WCPSError(f"Unexpected end of query, expected {' or '.join(texts) or 'more'}")
+        if texts and not self.at(*texts):
+            raise WCPSError(f"Unexpected '{text}', expected {' or '.join(texts)}")
+        self.position += 1
+        return text
+
+    def take_kind(self, kind: str) -> str:
+        if self.peek()[0] != kind:
+            raise WCPSError(f"Unexpected '{self.peek()[1]}', expected a {kind}")
+        return self.take()
+
+    def query(self) -> tuple:
+        '''
+            Parse a whole query: ("query", [(variable, [coverage ids])], return expression)
+
+            Arguments:
+                self: self@Parser
+        '''
+        self.take("for")
+        bindings = []
+        while True:
+            variable = self.take_kind("name")
+            self.take("in")
+            self.take("(")
+            coverage_ids = [self.take_kind("name")]
+            while self.at(","):
+                self.take(",")
+                coverage_ids.append(self.take_kind("name"))
+            self.take(")")
+            bindings.append((variable, coverage_ids))
+            if not self.at(","):
+                break
+            self.take(",")
+        self.take("return")
+        expression = self.expression()
+        if self.peek()[1] is not None:
+            raise WCPSError(f"Unexpected '{self.peek()[1]}' after the return expression")
+        return ("query", bindings, expression)
+
+    def expression(self) -> tuple:
+        node = self.conjunction()
+        while self.at("or"):
+            self.take()
+            node = ("binary", "or", node, self.conjunction())
+        return node
+
+    def conjunction(self) -> tuple:
+        node = self.comparison()
+        while self.at("and"):
+            self.take()
+            node = ("binary", "and", node, self.comparison())
+        return node
+
+    def comparison(self) -> tuple:
+        node = self.additive()
+        if self.at("=", "!=", "<", ">", "<=", ">="):
+            node = ("binary", self.take(), node, self.additive())
+        return node
+
+    def additive(self) -> tuple:
+        node = self.term()
+        while self.at("+", "-"):
+            node = ("binary", self.take(), node, self.term())
+        return node
+
+    def term(self) -> tuple:
+        node = self.unary()
+        while self.at("*", "/"):
+            node = ("binary", self.take(), node, self.unary())
+        return node
+
+    def unary(self) -> tuple:
+        if self.at("-"):
+            self.take()
+            return ("negate", self.unary())
+        if self.at("not"):
+            self.take()
+            return ("not", self.unary())
+        return self.postfix()
+
+    def postfix(self) -> tuple:
+        node = self.primary()
+        while self.at("[", "."):
+            if self.take() == "[":
+                items = [self.subset_item()]
+                while self.at(","):
+                    self.take(",")
+                    items.append(self.subset_item())
+                self.take("]")
+                node = ("subset", node, items)
+            else:
+                node = ("attribute", node, self.take_kind("name").lower())
+        return node
+
+    def subset_item(self) -> tuple:
+        '''
+            Parse an axis subset: (axis, crs, [bounds]), "*" stands for the end of the axis
+
+            Arguments:
+                self: self@Parser
+        '''
+        axis = self.take_kind("name")
+        crs = None
+        if self.at(":"):
+            self.take(":")
+            crs = self.take_kind("string")[1:-1]
+        self.take("(")
+        bounds = [self.bound()]
+        if self.at(":"):
+            self.take(":")
+            bounds.append(self.bound())
+        self.take(")")
+        return (axis, crs, bounds)
+
+    def bound(self):
+        if self.at("*"):
+            self.take()
+            return "*"
+        return self.expression()
+
+    def iterators(self) -> list:
+        iterators = [self.iterator()]
+        while self.at(","):
+            self.take(",")
+            iterators.append(self.iterator())
+        return iterators
+
+    def iterator(self) -> tuple:
+        variable = self.take_kind("name")
+        axis = self.take_kind("name")
+        self.take("(")
+        low = self.expression()
+        self.take(":")
+        high = self.expression()
+        self.take(")")
+        return (variable, axis, low, high)
+
+    def primary(self) -> tuple:
+        kind, text = self.peek()
+        if kind == "number":
+            self.take()
+            return ("constant", float(text) if any(char in text for char in ".eE") else int(text))
+        if kind == "string":
+            self.take()
+            return ("constant", text[1:-1].replace('\\"', '"'))
+        if self.at("("):
+            self.take()
+            node = self.expression()
+            self.take(")")
+            return node
+        if self.at("{"):
+            return self.braces()
+        if kind != "name":
+            raise WCPSError(f"Unexpected '{text}'" if text is not None else "Unexpected end of query")
+
+        keyword = text.lower()
+        if keyword == "switch":
+            return self.switch()
+        if keyword == "coverage":
+            self.take()
+            name = self.take_kind("name")
+            self.take("over")
+            iterators = self.iterators()
+            self.take("values")
+            return ("coverage", name, iterators, self.expression())
+        if keyword == "polygon":
+            self.take()
+            self.take("(")
+            self.take("(")
+            vertices = [self.vertex()]
+            while self.at(","):
+                self.take(",")
+                vertices.append(self.vertex())
+            self.take(")")
+            self.take(")")
+            return ("polygon", vertices)
+        if keyword == "condense":
+            self.take()
+            operator = self.take("+", "*", "max", "min", "and", "or").lower()
+            self.take("over")
+            iterators = self.iterators()
+            where = None
+            if self.at("where"):
+                self.take()
+                where = self.expression()
+            self.take("using")
+            return ("condense", operator, iterators, where, self.expression())
+
+        self.take()
+        if self.at("("):
+            self.take("(")
+            arguments = []
+            if not self.at(")"):
+                arguments.append(self.expression())
+                while self.at(","):
+                    self.take(",")
+                    arguments.append(self.expression())
+            self.take(")")
+            return ("call", keyword, arguments)
+        return ("variable", text)
+
+    def vertex(self) -> tuple:
+        coordinates = []
+        while not self.at(",", ")"):
+            sign = 1
+            if self.at("-"):
+                self.take()
+                sign = -1
+            coordinates.append(sign * float(self.take_kind("number")))
+        return tuple(coordinates)
+
+    def switch(self) -> tuple:
+        self.take("switch")
+        cases = []
+        while self.at("case"):
+            self.take()
+            condition = self.expression()
+            self.take("return")
+            cases.append((condition, self.expression()))
+        self.take("default")
+        self.take("return")
+        return ("switch", cases, self.expression())
+
+    def braces(self) -> tuple:
+        '''
+            Parse a scale domain {Lat:"CRS:1"(0:9), ...} or a struct {red: ..; green: ..}
+
+            Arguments:
+                self: self@Parser
+        '''
+        self.take("{")
+        # A domain item is followed by "(" or by a CRS string, a struct field by an expression
+        if self.peek(1)[1] == "(" or (self.peek(1)[1] == ":" and self.peek(2)[0] == "string" and self.peek(3)[1] == "("):
+            items = [self.subset_item()]
+            while self.at(","):
+                self.take(",")
+                items.append(self.subset_item())
+            self.take("}")
+            return ("domain", items)
+        fields = []
+        while True:
+            name = self.take_kind("name")
+            self.take(":")
+            fields.append((name, self.expression()))
+            if not self.at(";"):
+                break
+            self.take(";")
+        self.take("}")
+        return ("struct", fields)
+
+
+def data_of(value):
+    return value.data if isinstance(value, Array) else value
+
+
+def is_bands(value) -> bool:
+    return isinstance(value, Array) and value.bands
+
+
+def null_mask(data, nodata) -> np.ndarray:
+    '''
+        Mask of the cells holding the nodata value, None without nodata value
+    '''
+    return None if nodata is None else np.asarray(data) == nodata
+
+
+def like(data, *operands):
+    '''
+        Wrap a result like the first operand that is a coverage subset; like rasdaman, a cell
+        is null in the result if it is null in any operand
+    '''
+    bands = any(is_bands(operand) for operand in operands)
+    nulls = None
+    for operand in operands:
+        if not isinstance(operand, Array) or operand.nulls is None:
+            continue
+        mask = operand.nulls
+        if bands and not operand.bands:
+            # A single band value applies to every band
+            mask = mask[..., np.newaxis]
+        mask = np.broadcast_to(mask, np.shape(data))
+        nulls = mask if nulls is None else nulls | mask
+    for operand in operands:
+        if isinstance(operand, Array):
+            return Array(data, operand.axes, operand.lows, nulls, bands)
+    return Array(data, (), (), None, True) if bands else data
+
+
+def format_values(data) -> np.ndarray:
+    '''
+        Text of every value, numbers written in their shortest form
+    '''
+    data = np.asarray(data)
+    if data.dtype.kind == "b":
+        data = data.astype(np.uint8)
+    return data.astype(str)
+
+
+def nested(strings, opening: str, closing: str, outer: bool) -> str:
+    '''
+        Join the values of every dimension, the inner dimensions enclosed in brackets
+
+        Arguments:
+            strings: array of value texts
+            opening (str): opening bracket
+            closing (str): closing bracket
+            outer (bool): whether the outermost dimension is enclosed as well
+    '''
+    if strings.ndim == 0:
+        return str(strings)
+    if strings.ndim == 1:
+        body = ",".join(strings.tolist())
+    else:
+        body = ",".join(nested(row, opening, closing, True) for row in strings)
+    return f"{opening}{body}{closing}" if outer else body
+
+
+def encode(value, format: str) -> Encoded:
+    '''
+        Encode a value like rasdaman: CSV with inner dimensions in braces, nested JSON lists,
+        the raw cell bytes, or an 8-bit PNG of a 2-D or RGB result
+
+        Arguments:
+            value: value to encode
+            format (str): format name or content type
+    '''
+    content_type = FORMATS.get(str(format).lower())
+    if content_type is None:
+        raise WCPSError(f"Format {format} is not supported by the stand-in server", code="NoSuchFormat")
+    data = np.asarray(data_of(value))
+
+    if content_type == "text/csv":
+        return Encoded(nested(format_values(data), "{", "}", False).encode(), content_type)
+    if content_type == "application/json":
+        return Encoded(nested(format_values(data), "[", "]", True).encode(), content_type)
+    if content_type == "application/octet-stream":
+        return Encoded(data.tobytes(), content_type)
+
+    bands = is_bands(value)
+    pixels = data.astype(np.uint8) * 255 if data.dtype.kind == "b" else np.clip(np.nan_to_num(data), 0, 255)
+    if bands:
+        rows = [size for size in pixels.shape[:-1] if size != 1] or [1]
+        pixels = pixels.reshape(([1] if len(rows) == 1 else []) + rows + [pixels.shape[-1]])
+    else:
+        pixels = np.squeeze(pixels)
+        if pixels.ndim == 1:
+            pixels = pixels[np.newaxis]
+        if pixels.ndim != 2:
+            raise WCPSError(f"PNG encoding needs a 2-D result, got {pixels.ndim} dimensions")
+        pixels = np.repeat(pixels[..., np.newaxis], 3, axis=2)
+    if pixels.ndim != 3 or pixels.shape[2] not in (3, 4):
+        raise WCPSError("PNG encoding needs a 2-D result with 1, 3 or 4 bands")
+    return Encoded(encode_png(pixels.astype(np.uint8)), content_type)
+
+
+class Evaluator:
+    '''
+        Evaluator computes the parse tree of a query over synthetic coverages with NumPy
+    '''
+
+    def __init__(self, coverages: dict):
+        self.coverages = coverages
+
+    def evaluate(self, node, scope: dict):
+        kind = node[0]
+        if kind == "constant":
+            return node[1]
+        if kind == "variable":
+            if node[1] not in scope:
+                raise WCPSError(f"Variable {node[1]} is not defined")
+            value = scope[node[1]]
+            if isinstance(value, SyntheticCoverage):
+                data = value.read()
+                return Array(data, tuple(axis.axis for axis in value.axes),
+                             tuple(axis.low for axis in value.axes), null_mask(data, value.nodata), False)
+            return value
+        if kind == "subset":
+            return self.subset(node, scope)
+        if kind == "attribute":
+            value = self.evaluate(node[1], scope)
+            if not isinstance(value, Domain) or node[2] not in ("lo", "hi"):
+                raise WCPSError(f"Attribute .{node[2]} is not supported")
+            return getattr(value, node[2])
+        if kind == "binary":
+            return self.binary(node[1], self.evaluate(node[2], scope), self.evaluate(node[3], scope))
+        if kind == "negate":
+            value = self.evaluate(node[1], scope)
+            return like(np.negative(data_of(value)), value)
+        if kind == "not":
+            value = self.evaluate(node[1], scope)
+            return like(np.logical_not(data_of(value)), value)
+        if kind == "call":
+            return self.call(node[1], node[2], scope)
+        if kind == "switch":
+            return self.switch(node, scope)
+        if kind == "struct":
+            values = [np.asarray(data_of(self.evaluate(field, scope)), dtype=float) for _, field in node[1]]
+            return Array(np.stack(np.broadcast_arrays(*values), axis=-1), (), (), None, True)
+        if kind == "coverage":
+            return self.construct(node, scope)
+        if kind == "condense":
+            return self.condense(node, scope)
+        if kind == "polygon":
+            return Polygon(node[1])
+        if kind == "domain":
+            raise WCPSError("A domain is only allowed as the second argument of scale")
+        raise WCPSError(f"Unsupported expression {kind}")
+
+    def scalar(self, node, scope: dict):
+        '''
+            Value of an expression that has to be a single number, e.g. a subset bound
+        '''
+        value = data_of(self.evaluate(node, scope))
+        if np.ndim(value) > 0:
+            if np.size(value) == 1:
+                return np.asarray(value).item()
+            raise _Pointwise()
+        return value.item() if hasattr(value, "item") else value
+
+    def window(self, node, scope: dict) -> tuple:
+        '''
+            Coverage of a subset node, the first and last grid index selected on every axis
+            and whether the axis is kept (trimmed) or dropped (sliced)
+        '''
+        _, target, items = node
+        if target[0] != "variable" or not isinstance(scope.get(target[1]), SyntheticCoverage):
+            raise WCPSError("Subsets are only supported on coverage variables")
+        coverage = scope[target[1]]
+
+        requested = {}
+        for axis, crs, bounds in items:
+            coverage.axis(axis)
+            requested[axis] = (crs, [bound if bound == "*" else self.scalar(bound, scope) for bound in bounds])
+
+        ranges, kept = [], []
+        for axis in coverage.axes:
+            if axis.axis not in requested:
+                ranges.append((axis.low, axis.high))
+                kept.append(True)
+                continue
+            crs, values = requested.pop(axis.axis)
+            indices = resolve(axis, crs, values)
+            ranges.append((indices[0], indices[-1]))
+            kept.append(len(values) > 1)
+        return coverage, ranges, kept
+
+    def subset(self, node, scope: dict) -> Array:
+        coverage, ranges, kept = self.window(node, scope)
+        data = coverage.read(ranges)
+        data = data[tuple(slice(None) if keep else 0 for keep in kept)]
+        axes = tuple(axis.axis for axis, keep in zip(coverage.axes, kept) if keep)
+        lows = tuple(low for (low, _), keep in zip(ranges, kept) if keep)
+        if not axes:
+            return data[()]
+        return Array(data, axes, lows, null_mask(data, coverage.nodata), False)
+
+    def binary(self, operator: str, left, right):
+        left_data, right_data = data_of(left), data_of(right)
+        if is_bands(left) != is_bands(right):
+            # A single band value applies to every band
+            if not is_bands(left):
+                left_data = np.asarray(left_data)[..., np.newaxis]
+            else:
+                right_data = np.asarray(right_data)[..., np.newaxis]
+        return like(getattr(np, OPERATORS[operator])(left_data, right_data), left, right)
+
+    def call(self, name: str, arguments: list, scope: dict):
+        if name == "encode":
+            if len(arguments) < 2:
+                raise WCPSError("encode needs a value and a format")
+            return encode(self.evaluate(arguments[0], scope), self.evaluate(arguments[1], scope))
+        if name == "scale":
+            return self.scale(arguments, scope)
+        if name == "clip":
+            return self.clip(arguments, scope)
+        if name == "imagecrsdomain":
+            if len(arguments) != 2 or arguments[1][0] != "variable":
+                raise WCPSError("imageCrsDomain needs a coverage subset and an axis")
+            axis = arguments[1][1]
+            if arguments[0][0] == "subset":
+                # The domain of a subset is known without reading its cells
+                coverage, ranges, kept = self.window(arguments[0], scope)
+                labels = [reference.axis for reference, keep in zip(coverage.axes, kept) if keep]
+                ranges = [window for window, keep in zip(ranges, kept) if keep]
+                if axis not in labels:
+                    raise WCPSError(f"Axis {axis} is not an axis of the subset")
+                return Domain(*ranges[labels.index(axis)])
+            value = self.evaluate(arguments[0], scope)
+            if not isinstance(value, Array) or axis not in value.axes:
+                raise WCPSError(f"Axis {axis} is not an axis of the subset")
+            position = value.axes.index(axis)
+            return Domain(value.lows[position], value.lows[position] + value.data.shape[position] - 1)
+        if name in CONDENSERS:
+            if len(arguments) != 1:
+                raise WCPSError(f"{name} needs one argument")
+            return condense_cells(name, self.evaluate(arguments[0], scope))
+        if name in FUNCTIONS:
+            value = self.evaluate(arguments[0], scope)
+            return like(getattr(np, FUNCTIONS[name])(data_of(value)), value)
+        raise WCPSError(f"Function {name} is not supported by the stand-in server")
+
+    def scale(self, arguments: list, scope: dict) -> Array:
+        value = self.evaluate(arguments[0], scope)
+        if not isinstance(value, Array) or value.bands:
+            raise WCPSError("scale needs a coverage subset")
+        shape = value.data.shape
+        if arguments[1][0] == "domain":
+            sizes = list(shape)
+            for axis, _, bounds in arguments[1][1]:
+                if axis not in value.axes:
+                    raise WCPSError(f"Axis {axis} is not an axis of the subset")
+                low, high = (self.scalar(bound, scope) for bound in (bounds * 2)[:2])
+                sizes[value.axes.index(axis)] = int(high) - int(low) + 1
+        else:
+            factor = float(self.scalar(arguments[1], scope))
+            sizes = [max(1, round(size * factor)) for size in shape]
+        # Nearest neighbour resampling of every axis
+        indices = [np.minimum(((np.arange(size) + 0.5) * old / size).astype(np.int64), old - 1)
+                   for size, old in zip(sizes, shape)]
+        return value._replace(data=value.data[np.ix_(*indices)],
+                              nulls=None if value.nulls is None else value.nulls[np.ix_(*indices)])
+
+    def clip(self, arguments: list, scope: dict) -> Array:
+        '''
+            Clip a 2-D coverage to the bounding box of a polygon; cells whose center is outside
+            of the polygon are set to 0
+        '''
+        target = arguments[0] if arguments else ("constant", None)
+        variable = target[1] if target[0] == "subset" else target
+        coverage = scope.get(variable[1]) if variable[0] == "variable" else None
+        polygon = self.evaluate(arguments[1], scope) if len(arguments) == 2 else None
+        if not isinstance(coverage, SyntheticCoverage) or not isinstance(polygon, Polygon):
+            raise WCPSError("clip needs a coverage and a POLYGON")
+        value = self.evaluate(target, scope)
+        vertices = np.array(polygon.vertices, dtype=float)
+        if not isinstance(value, Array) or len(value.axes) != 2 or vertices.ndim != 2 or vertices.shape[1] != 2:
+            raise WCPSError("clip needs a 2-D coverage and a polygon with 2-D vertices")
+
+        windows, centers = [], []
+        for position, label in enumerate(value.axes):
+            axis = coverage.axis(label)
+            low = value.lows[position]
+            first, last = resolve(axis, None, [vertices[:, position].min(), vertices[:, position].max()])
+            first, last = max(first, low), min(last, low + value.data.shape[position] - 1)
+            if first > last:
+                raise WCPSError("The polygon does not intersect the coverage")
+            windows.append((first, last))
+            centers.append(np.array([cell_coordinate(axis, index) for index in range(first, last + 1)]))
+
+        window = tuple(slice(first - low, last - low + 1) for (first, last), low in zip(windows, value.lows))
+        data = value.data[window].copy()
+        data[~inside_polygon(centers[0][:, np.newaxis], centers[1][np.newaxis, :], vertices)] = 0
+        nulls = None if value.nulls is None else value.nulls[window]
+        return Array(data, value.axes, tuple(first for first, _ in windows), nulls, False)
+
+    def switch(self, node, scope: dict):
+        _, cases, default = node
+        conditions = [self.evaluate(condition, scope) for condition, _ in cases]
+        values = [self.evaluate(value, scope) for _, value in cases] + [self.evaluate(default, scope)]
+        condition_data = [data_of(condition) for condition in conditions]
+        value_data = [data_of(value) for value in values]
+        if any(is_bands(value) for value in values):
+            # Conditions and single band values apply to every band
+            condition_data = [np.asarray(data)[..., np.newaxis] for data in condition_data]
+            value_data = [data if is_bands(value) else np.asarray(data)[..., np.newaxis]
+                          for data, value in zip(value_data, values)]
+        result = like(np.select(condition_data, value_data[:-1], value_data[-1]), *conditions, *values)
+        return result[()] if isinstance(result, np.ndarray) and result.ndim == 0 else result
+
+    def construct(self, node, scope: dict) -> Array:
+        '''
+            Evaluate a coverage constructor; the values are computed for all points at once
+            with the iterators bound to index arrays, or point by point when they cannot be
+        '''
+        _, _, iterators, values = node
+        domains = [(variable, axis, int(self.scalar(low, scope)), int(self.scalar(high, scope)))
+                   for variable, axis, low, high in iterators]
+        shape = tuple(high - low + 1 for _, _, low, high in domains)
+        axes = tuple(axis for _, axis, _, _ in domains)
+        lows = tuple(low for _, _, low, _ in domains)
+
+        inner = dict(scope)
+        for position, (variable, _, low, high) in enumerate(domains):
+            inner[variable] = np.arange(low, high + 1).reshape([-1 if other == position else 1
+                                                                for other in range(len(domains))])
+        try:
+            result = self.evaluate(values, inner)
+            bands = is_bands(result)
+            data = np.asarray(data_of(result))
+            data = np.broadcast_to(data, shape + data.shape[-1:] if bands else shape).copy()
+        except _Pointwise:
+            points = []
+            for point in itertools.product(*(range(low, high + 1) for _, _, low, high in domains)):
+                inner.update({variable: index for (variable, _, _, _), index in zip(domains, point)})
+                points.append(self.evaluate(values, inner))
+            bands = is_bands(points[0])
+            data = np.array([data_of(point) for point in points])
+            data = data.reshape(shape + data.shape[1:])
+        return Array(data, axes, lows, None, bands)
+
+    def condense(self, node, scope: dict):
+        _, operator, iterators, where, using = node
+        domains = [(variable, range(int(self.scalar(low, scope)), int(self.scalar(high, scope)) + 1))
+                   for variable, _, low, high in iterators]
+        result = None
+        inner = dict(scope)
+        for point in itertools.product(*(indices for _, indices in domains)):
+            inner.update({variable: index for (variable, _), index in zip(domains, point)})
+            if where is not None:
+                keep = data_of(self.evaluate(where, inner))
+                if np.ndim(keep) > 0:
+                    raise _Pointwise()
+                if not keep:
+                    continue
+            value = data_of(self.evaluate(using, inner))
+            result = value if result is None else getattr(np, OPERATORS.get(operator, "multiply"))(result, value)
+        return IDENTITIES[operator] if result is None else result
+
+
+def condense_cells(name: str, value):
+    '''
+        Condense all cells of a value to one number; cells holding the nodata value are skipped
+
+        Arguments:
+            name (str): condenser (avg, max, min, sum, add, count, cellCount, some, all)
+            value: value to condense
+    '''
+    if is_bands(value):
+        raise WCPSError(f"{name} of a multiband value is not supported")
+    data = np.asarray(data_of(value))
+    if isinstance(value, Array) and value.nulls is not None:
+        data = data[~value.nulls]
+    else:
+        data = data.ravel()
+    if name == "cellcount":
+        return data.size
+    if name == "count":
+        return int(np.count_nonzero(data))
+    if name == "some":
+        return bool(np.any(data))
+    if name == "all":
+        return bool(np.all(data))
+    if name in ("sum", "add"):
+        return np.sum(data).item()
+    if data.size == 0:
+        raise WCPSError(f"{name} of an empty subset")
+    return {"avg": np.mean, "max": np.max, "min": np.min}[name](data).item()
+
+
+def inside_polygon(x, y, vertices) -> np.ndarray:
+    '''
+        Whether points are inside of a polygon, by counting the polygon edges a ray from them crosses
+
+        Arguments:
+            x: first coordinates of the points
+            y: second coordinates of the points
+            vertices: polygon vertices, one (x, y) row per vertex
+    '''
+    inside = np.zeros(np.broadcast(x, y).shape, dtype=bool)
+    for (x1, y1), (x2, y2) in zip(vertices, np.roll(vertices, 1, axis=0)):
+        crosses = (y1 > y) != (y2 > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            intersection = (x2 - x1) * (y - y1) / (y2 - y1) + x1
+        inside ^= crosses & (x < intersection)
+    return inside
+
+
+def resolve(axis: AxisReference, crs: str, values: list) -> list:
+    '''
+        Grid indices selected on an axis: one index for a slice, first and last index for a trim.
+        Coordinates are resolved with the same rules as the client snapping subsets to the grid.
+
+        Arguments:
+            axis (AxisReference): axis of the coverage
+            crs (str): CRS of the subset, "CRS:1" for grid indices
+            values (list): slice value or trim bounds, "*" for the end of the axis
+    '''
+    if crs == "CRS:1":
+        indices = [int(axis.low if value == "*" and position == 0 else axis.high if value == "*" else value)
+                   for position, value in enumerate(values)]
+        if not all(axis.low <= index <= axis.high for index in indices) or indices[0] > indices[-1]:
+            raise WCPSError(f"Grid subset {':'.join(map(str, values))} is outside of axis {axis.axis} "
+                            f"({axis.low}:{axis.high})")
+        return indices
+    values = [cell_coordinate(axis, axis.low if position == 0 else axis.high) if value == "*" else value
+              for position, value in enumerate(values)]
+    try:
+        return grid_indices(axis, values)
+    except ValueError as e:
+        raise WCPSError(str(e)) from e
+
+
+def exception_report(message: str, code: str = "InvalidRequest") -> bytes:
+    return (f'<?xml version="1.0" encoding="UTF-8"?>\n<ows:ExceptionReport version="2.0.0" xmlns:ows="{OWS}">'
+            f'<ows:Exception exceptionCode="{code}"><ows:ExceptionText>{escape(message)}</ows:ExceptionText>'
+            f'</ows:Exception></ows:ExceptionReport>').encode()
+
+
+class StandInServer:
+    '''
+        StandInServer is a local HTTP server standing in for rasdaman. It serves synthetic
+        coverages through GetCapabilities, DescribeCoverage, GetCoverage and WCPS queries, so
+        that the connector can be tested and benchmarked offline and reproducibly. Latency,
+        bandwidth limits and errors can be injected.
+    '''
+
+    def __init__(self, coverages: list = None, latency: float = 0.0, bandwidth: float = None,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = 0,
+                 host: str = "127.0.0.1", port: int = 0, path: str = "/rasdaman/ows"):
+        '''
+            Initialization of the server, see start
+
+            Arguments:
+                self: self@StandInServer
+                coverages (list): SyntheticCoverage objects served, see default_coverages when None
+                latency (float): seconds every request waits, or (low, high) for a uniformly random wait
+                bandwidth (float): bytes per second every response is sent at, None for no limit
+                error_rate (float): share of requests answered with error_status
+                error_status (int): HTTP status of injected errors
+                seed (int): seed of the random latencies and errors
+                host (str): address the server listens on
+                port (int): port the server listens on, 0 for any free port
+                path (str): path of the endpoint
+        '''
+        self.coverages = {coverage.coverage_id: coverage for coverage in (coverages or default_coverages())}
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.host = host
+        self.port = port
+        self.path = path
+        self.requests = 0  # number of requests received
+        self.errors = 0  # number of injected errors
+        self.bytes_sent = 0  # number of response body bytes sent
+        self.__random = random.Random(seed)
+        self.__failures = []  # statuses of the next requests to fail, see fail_next
+        self.__lock = threading.Lock()
+        self.__server = None
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}{self.path}"
+
+    def add_coverage(self, coverage: SyntheticCoverage):
+        self.coverages[coverage.coverage_id] = coverage
+
+    def start(self) -> 'StandInServer':
+        '''
+            Start serving in a background thread
+
+            Arguments:
+                self: self@StandInServer
+        '''
+        if self.__server is None:
+            self.__server = ThreadingHTTPServer((self.host, self.port), _Handler)
+            self.__server.daemon_threads = True
+            self.__server.stand_in = self
+            self.port = self.__server.server_address[1]
+            self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+            self.__thread.start()
+        return self
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__thread.join()
+            self.__server = None
+
+    def __enter__(self) -> 'StandInServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def fail_next(self, count: int = 1, status: int = 503):
+        '''
+            Answer the next requests with an error status
+
+            Arguments:
+                self: self@StandInServer
+                count (int): number of requests to fail
+                status (int): HTTP status of the errors
+        '''
+        with self.__lock:
+            self.__failures.extend([status] * count)
+
+    def __fault(self) -> int:
+        with self.__lock:
+            self.requests += 1
+            if self.__failures:
+                status = self.__failures.pop(0)
+            elif self.error_rate and self.__random.random() < self.error_rate:
+                status = self.error_status
+            else:
+                return None
+            self.errors += 1
+            return status
+
+    def __delay(self) -> float:
+        if isinstance(self.latency, (tuple, list)):
+            with self.__lock:
+                return self.__random.uniform(*self.latency)
+        return self.latency
+
+    def record_sent(self, size: int):
+        with self.__lock:
+            self.bytes_sent += size
+
+    def handle(self, method: str, target: str, body: bytes = b"") -> tuple:
+        '''
+            Answer a request with (status, content type, body), without the network
+
+            Arguments:
+                self: self@StandInServer
+                method (str): GET or POST
+                target (str): path and query string of the request
+                body (bytes): form encoded body of a POST request
+        '''
+        delay = self.__delay()
+        if delay:
+            time.sleep(delay)
+        status = self.__fault()
+        if status is not None:
+            return status, "application/xml", exception_report("Injected error of the stand-in server",
+                                                               "ServiceUnavailable")
+
+        path, _, query_string = target.partition("?")
+        # The connector appends "&request=..." to the endpoint without a "?"
+        if not query_string and "&" in path:
+            path, _, query_string = path.partition("&")
+        if path.rstrip("/") != self.path.rstrip("/"):
+            return 404, "application/xml", exception_report(f"No endpoint at {path}", "NotFound")
+
+        parameters = {}
+        pairs = parse_qsl(query_string, keep_blank_values=True)
+        if method == "POST" and body:
+            pairs += parse_qsl(body.decode("utf-8", "replace"), keep_blank_values=True)
+        for name, value in pairs:
+            parameters.setdefault(name.lower(), []).append(value)
+
+        try:
+            request = parameters.get("request", [""])[-1].lower()
+            if "query" in parameters:
+                return self.process(parameters["query"][-1])
+            if request in ("", "getcapabilities"):
+                return 200, "application/xml", self.capabilities()
+            if request == "describecoverage":
+                return 200, "application/xml", self.describe(parameters.get("coverageid", [""])[-1])
+            if request == "getcoverage":
+                return self.get_coverage(parameters)
+            raise WCPSError(f"Request {request} is not supported by the stand-in server", code="OperationNotSupported")
+        except WCPSError as e:
+            return e.status, "application/xml", exception_report(str(e), e.code)
+
+    def coverage(self, coverage_id: str) -> SyntheticCoverage:
+        if coverage_id not in self.coverages:
+            raise WCPSError(f"Coverage {coverage_id} does not exist", 404, "NoSuchCoverage")
+        return self.coverages[coverage_id]
+
+    def process(self, query: str) -> tuple:
+        '''
+            Evaluate a WCPS query; a query iterating over several coverages is answered with
+            a multipart body holding one part per combination, in the order of the for clause
+
+            Arguments:
+                self: self@StandInServer
+                query (str): WCPS query
+        '''
+        tree = Parser(query).query()
+        _, bindings, expression = tree
+        evaluator = Evaluator(self.coverages)
+        variables = [variable for variable, _ in bindings]
+        results = []
+        for coverage_ids in itertools.product(*(ids for _, ids in bindings)):
+            scope = {variable: self.coverage(coverage_id) for variable, coverage_id in zip(variables, coverage_ids)}
+            try:
+                value = evaluator.evaluate(expression, scope)
+            except _Pointwise:
+                raise WCPSError("A condition must be a single value") from None
+            except (TypeError, ValueError, IndexError) as e:
+                raise WCPSError(f"Query could not be evaluated: {e}") from e
+            results.append((" ".join(coverage_ids), *serialize(value)))
+
+        if len(results) == 1:
+            return 200, results[0][2], results[0][1]
+        body = bytearray()
+        for name, payload, content_type in results:
+            body += f"--{BOUNDARY}\r\nContent-Type: {content_type}\r\nContent-ID: <{name}>\r\n\r\n".encode()
+            body += payload + b"\r\n"
+        body += f"--{BOUNDARY}--\r\n".encode()
+        return 200, f'multipart/related; boundary="{BOUNDARY}"', bytes(body)
+
+    def get_coverage(self, parameters: dict) -> tuple:
+        '''
+            Answer a GetCoverage request with its SUBSET, FORMAT, SCALEFACTOR and SCALESIZE parameters
+
+            Arguments:
+                self: self@StandInServer
+                parameters (dict): request parameters by lower-case name
+        '''
+        coverage = self.coverage(parameters.get("coverageid", [""])[-1])
+        items = []
+        for subset in parameters.get("subset", []):
+            match = KVP_SUBSET.match(subset)
+            if match is None:
+                raise WCPSError(f"Invalid subset {subset}", code="InvalidSubsetting")
+            axis, crs, values = match.groups()
+            bounds = [("constant", parse_value(value)) if value.strip() != "*" else "*" for value in values.split(",")]
+            crs = "CRS:1" if crs and crs.strip().endswith("CRS:1") else None
+            items.append((axis, crs, bounds))
+        node = ("subset", ("variable", "$c"), items) if items else ("variable", "$c")
+
+        scale = parameters.get("scalefactor", [None])[-1]
+        if scale is not None:
+            node = ("call", "scale", [node, ("constant", float(scale))])
+        sizes = parameters.get("scalesize", [None])[-1]
+        if sizes is not None:
+            domain = [(axis, "CRS:1", [("constant", 0), ("constant", int(size) - 1)])
+                      for axis, size in re.findall(r"(\w+)\((\d+)\)", sizes)]
+            node = ("call", "scale", [node, ("domain", domain)])
+
+        format = parameters.get("format", ["application/octet-stream"])[-1]
+        value = Evaluator(self.coverages).evaluate(node, {"$c": coverage})
+        payload, content_type = encode(value, format)
+        return 200, content_type, payload
+
+    def capabilities(self) -> bytes:
+        summaries = "".join(f"<wcs:CoverageSummary><wcs:CoverageId>{escape(coverage_id)}</wcs:CoverageId>"
+                            f"<wcs:CoverageSubtype>{subtype(coverage)}</wcs:CoverageSubtype></wcs:CoverageSummary>"
+                            for coverage_id, coverage in self.coverages.items())
+        operations = "".join(f'<ows:Operation name="{name}"><ows:DCP><ows:HTTP><ows:Get xlink:href="{escape(self.url)}"/>'
+                             f'<ows:Post xlink:href="{escape(self.url)}"/></ows:HTTP></ows:DCP></ows:Operation>'
+                             for name in ("GetCapabilities", "DescribeCoverage", "GetCoverage", "ProcessCoverages"))
+        formats = "".join(f"<wcs:formatSupported>{format}</wcs:formatSupported>" for format in sorted(set(FORMATS.values())))
+        return (f'<?xml version="1.0" encoding="UTF-8"?>\n<wcs:Capabilities version="2.0.1" xmlns:wcs="{WCS}" '
+                f'xmlns:ows="{OWS}" xmlns:xlink="http://www.w3.org/1999/xlink">'
+                f'<ows:ServiceIdentification><ows:Title>rasdaman stand-in</ows:Title>'
+                f'<ows:ServiceType>OGC WCS</ows:ServiceType><ows:ServiceTypeVersion>2.0.1</ows:ServiceTypeVersion>'
+                f'</ows:ServiceIdentification><ows:ServiceProvider><ows:ProviderName>wdc</ows:ProviderName>'
+                f'</ows:ServiceProvider><ows:OperationsMetadata>{operations}</ows:OperationsMetadata>'
+                f'<wcs:ServiceMetadata>{formats}</wcs:ServiceMetadata>'
+                f'<wcs:Contents>{summaries}</wcs:Contents></wcs:Capabilities>').encode()
+
+    def describe(self, coverage_id: str) -> bytes:
+        '''
+            DescribeCoverage document; coverages with an irregular axis are described as
+            ReferenceableGridByVectors with coefficients, the others as RectifiedGrid
+
+            Arguments:
+                self: self@StandInServer
+                coverage_id (str): coverage id
+        '''
+        coverage = self.coverage(coverage_id)
+        axes = coverage.axes
+        labels = " ".join(axis.axis for axis in axes)
+        low = " ".join(str(axis.low) for axis in axes)
+        high = " ".join(str(axis.high) for axis in axes)
+        origin = " ".join(position(axis, axis.origin) for axis in axes)
+        lower = " ".join(position(axis, cell_coordinate(axis, axis.low)) for axis in axes)
+        upper = " ".join(position(axis, cell_coordinate(axis, axis.high)) for axis in axes)
+
+        def offset(index, axis):
+            return " ".join(repr(axis.resolution) if other == index else "0" for other in range(len(axes)))
+
+        limits = (f'<gml:limits><gml:GridEnvelope><gml:low>{low}</gml:low><gml:high>{high}</gml:high>'
+                  f'</gml:GridEnvelope></gml:limits><gml:axisLabels>{labels}</gml:axisLabels>')
+        if any(axis.coordinates for axis in axes):
+            general = "".join(
+                f'<gmlrgrid:generalGridAxis><gmlrgrid:GeneralGridAxis><gmlrgrid:offsetVector>{offset(index, axis)}'
+                f'</gmlrgrid:offsetVector><gmlrgrid:coefficients>'
+                f'{" ".join(position(axis, value) for value in axis.coordinates or [])}</gmlrgrid:coefficients>'
+                f'<gmlrgrid:gridAxesSpanned>{axis.axis}</gmlrgrid:gridAxesSpanned><gmlrgrid:sequenceRule '
+                f'axisOrder="+1">Linear</gmlrgrid:sequenceRule></gmlrgrid:GeneralGridAxis></gmlrgrid:generalGridAxis>'
+                for index, axis in enumerate(axes))
+            domain = (f'<gmlrgrid:ReferenceableGridByVectors dimension="{len(axes)}" gml:id="{coverage_id}-grid">'
+                      f'{limits}<gmlrgrid:origin><gml:Point gml:id="{coverage_id}-origin"><gml:pos>{origin}</gml:pos>'
+                      f'</gml:Point></gmlrgrid:origin>{general}</gmlrgrid:ReferenceableGridByVectors>')
+        else:
+            vectors = "".join(f"<gml:offsetVector>{offset(index, axis)}</gml:offsetVector>"
+                              for index, axis in enumerate(axes))
+            domain = (f'<gml:RectifiedGrid dimension="{len(axes)}" gml:id="{coverage_id}-grid">{limits}'
+                      f'<gml:origin><gml:Point gml:id="{coverage_id}-origin"><gml:pos>{origin}</gml:pos></gml:Point>'
+                      f'</gml:origin>{vectors}</gml:RectifiedGrid>')
+        nil = "" if coverage.nodata is None else (f'<swe:nilValues><swe:NilValues><swe:nilValue reason="">'
+                                                  f'{coverage.nodata}</swe:nilValue></swe:NilValues></swe:nilValues>')
+        return (f'<?xml version="1.0" encoding="UTF-8"?>\n<wcs:CoverageDescriptions xmlns:wcs="{WCS}" '
+                f'xmlns:gml="{GML}" xmlns:gmlcov="{GMLCOV}" xmlns:gmlrgrid="{RGRID}" '
+                f'xmlns:swe="http://www.opengis.net/swe/2.0">'
+                f'<wcs:CoverageDescription gml:id="{coverage_id}"><gml:boundedBy>'
+                f'<gml:Envelope axisLabels="{labels}" srsDimension="{len(axes)}"><gml:lowerCorner>{lower}'
+                f'</gml:lowerCorner><gml:upperCorner>{upper}</gml:upperCorner></gml:Envelope></gml:boundedBy>'
+                f'<wcs:CoverageId>{coverage_id}</wcs:CoverageId><gml:domainSet>{domain}</gml:domainSet>'
+                f'<gmlcov:rangeType><swe:DataRecord><swe:field name="value"><swe:Quantity definition="{coverage.dtype}">'
+                f'{nil}</swe:Quantity></swe:field></swe:DataRecord></gmlcov:rangeType>'
+                f'<wcs:ServiceParameters><wcs:CoverageSubtype>{subtype(coverage)}</wcs:CoverageSubtype>'
+                f'<wcs:nativeFormat>application/octet-stream</wcs:nativeFormat></wcs:ServiceParameters>'
+                f'</wcs:CoverageDescription></wcs:CoverageDescriptions>').encode()
+
+
+def subtype(coverage: SyntheticCoverage) -> str:
+    return "ReferenceableGridCoverage" if any(axis.coordinates for axis in coverage.axes) else "RectifiedGridCoverage"
+
+
+def position(axis: AxisReference, coordinate: float) -> str:
+    '''
+        Coordinate written like rasdaman: quoted ISO dates on time axes, numbers on the others
+    '''
+    if axis.coordinates:
+        return f'"{from_coordinate(coordinate, "date")}"'
+    return repr(round(coordinate, 9))
+
+
+def parse_value(text: str):
+    text = text.strip()
+    if text.startswith('"'):
+        return text.strip('"')
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def serialize(value) -> tuple:
+    '''
+        Body and content type of a query result: encoded results as they are, numbers as text
+        and unencoded arrays as their raw cell bytes
+    '''
+    if isinstance(value, Encoded):
+        return value.payload, value.content_type
+    if isinstance(value, Domain):
+        return f"{value.lo}:{value.hi}".encode(), "text/plain"
+    data = np.asarray(data_of(value))
+    if data.ndim == 0:
+        return str(format_values(data)).encode(), "text/plain"
+    return data.tobytes(), "application/octet-stream"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.respond(*self.server.stand_in.handle("GET", self.path))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.respond(*self.server.stand_in.handle("POST", self.path, body))
+
+    def respond(self, status: int, content_type: str, payload: bytes):
+        stand_in = self.server.stand_in
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if not stand_in.bandwidth:
+            self.wfile.write(payload)
+            stand_in.record_sent(len(payload))
+            return
+        # Send the body in chunks paced to the bandwidth limit
+        chunk_size = max(1024, int(stand_in.bandwidth / 50))
+        started = time.monotonic()
+        for sent in range(0, len(payload), chunk_size):
+            chunk = payload[sent:sent + chunk_size]
+            self.wfile.write(chunk)
+            stand_in.record_sent(len(chunk))
+            wait = started + (sent + len(chunk)) / stand_in.bandwidth - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(arguments: list = None) -> int:
+    '''
+        Serve the default coverages until interrupted
+
+        Arguments:
+            arguments (list): command line arguments, sys.argv when None
+    '''
+    parser = argparse.ArgumentParser(description="Local rasdaman stand-in serving synthetic coverages")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds every request waits")
+    parser.add_argument("--bandwidth", type=float, default=None, help="bytes per second of every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    options = parser.parse_args(arguments)
+
+    server = StandInServer(latency=options.latency, bandwidth=options.bandwidth, error_rate=options.error_rate,
+                           host=options.host, port=options.port).start()
+    # Benchmarks read the address of a server started with --port 0 from this line
+    print(f"Serving {', '.join(server.coverages)} at {server.url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,210 @@
+from __future__ import annotations
+import calendar
+from collections import namedtuple
+from lazy import lazy_import
+from decoders import decode_csv
+from exceptions.ErrorMessage import ErrorMessage
+
+np = lazy_import("numpy", globals(), "np")
+
+# Reduced series returned by the server together with the label of every value
+TemporalSeries = namedtuple("TemporalSeries", ["labels", "values"])
+
+# Condenser applied to the cells of one time step before they are grouped
+STEP_CONDENSERS = {
+    "avg": "avg",
+    "sum": "sum",
+    "min": "min",
+    "max": "max",
+    "count": "cellCount",
+}
+
+# Operator of the general condenser that folds the time steps of one group
+GROUP_CONDENSERS = {
+    "avg": "+",
+    "sum": "+",
+    "min": "min",
+    "max": "max",
+    "count": "+",
+}
+
+SEASONS = ["DJF", "MAM", "JJA", "SON"]
+
+
+class TemporalReduction:
+    '''
+        TemporalReduction describes a grouped or windowed reduction along a monthly time axis.
+        It compiles to a single WCPS coverage constructor whose values are general condensers,
+        so the whole reduced series is computed by the server in one request.
+    '''
+
+    def __init__(self, kind: str, operation: str = "avg", window: int = None, time_axis: str = "ansi"):
+        '''
+            Initialization of the temporal reduction
+
+            Arguments:
+                self: self@TemporalReduction
+                kind (str): month, season, year (grouped) or rolling (sliding window)
+                operation (str): reduction to apply (available: min, max, avg, count, sum)
+                window (int): number of time steps of a rolling window
+                time_axis (str): label of the time axis
+        '''
+        if kind not in ("month", "season", "year", "rolling"):
+            raise ValueError(ErrorMessage.invalid_period)
+        if operation not in STEP_CONDENSERS:
+            raise ValueError(ErrorMessage.invalid_operation)
+        if kind == "rolling" and (window is None or window < 1):
+            raise ValueError(ErrorMessage.invalid_operation)
+
+        self.kind = kind
+        self.operation = operation
+        self.window = window
+        self.time_axis = time_axis
+        self.start = None  # First month ("YYYY-MM") of the reduced range
+        self.steps = 0  # Number of monthly time steps in the reduced range
+
+    def bind(self, axis_subsets: list) -> list:
+        '''
+            Find the time range in the given subsets and return the remaining (spatial) subsets
+
+            Arguments:
+                self: self@TemporalReduction
+                axis_subsets (list): list of AxisSubset objects of the query
+        '''
+        time_subsets = [axis_subset for axis_subset in axis_subsets if axis_subset.axis == self.time_axis]
+        # A reduction needs a time interval, a single time slice cannot be grouped
+        if len(time_subsets) != 1 or len(time_subsets[0].values) != 2:
+            raise ValueError(ErrorMessage.time_range_not_defined)
+
+        start, end = (str(value)[:7] for value in time_subsets[0].values)
+        start_year, start_month = (int(part) for part in start.split("-"))
+        end_year, end_month = (int(part) for part in end.split("-"))
+
+        self.start = start
+        self.steps = (end_year - start_year) * 12 + end_month - start_month + 1
+        if self.steps < 1 or (self.kind == "rolling" and self.steps < self.window):
+            raise ValueError(ErrorMessage.time_range_not_defined)
+
+        return [axis_subset for axis_subset in axis_subsets if axis_subset.axis != self.time_axis]
+
+    def labels(self) -> list:
+        '''
+            Labels of the reduced series, in the same order as the returned values
+
+            Arguments:
+                self: self@TemporalReduction
+        '''
+        start_year, start_month = (int(part) for part in self.start.split("-"))
+        if self.kind in ("month", "season"):
+            names = [calendar.month_abbr[month] for month in range(1, 13)] if self.kind == "month" else SEASONS
+            first, groups = self.__members()
+            return [names[(first + group) % len(names)] for group in range(groups)]
+        if self.kind == "year":
+            return [str(start_year + year) for year in range(self.__layout()[0])]
+
+        # A rolling window is labelled with the month of its last time step
+        labels = []
+        for group in range(self.__layout()[0]):
+            month_index = start_month - 1 + group + self.window - 1
+            labels.append(f"{start_year + month_index // 12}-{month_index % 12 + 1:02d}")
+        return labels
+
+    def __members(self) -> tuple:
+        '''
+            First calendar group (month or season) and number of groups having members in the range.
+            A range shorter than a full cycle only has some of the groups, given in the order of the
+            range starting at its first group, so that no empty group is averaged.
+
+            Arguments:
+                self: self@TemporalReduction
+        '''
+        start_month = int(self.start.split("-")[1])
+        months = [(start_month - 1 + step) % 12 + 1 for step in range(min(self.steps, 12))]
+        if self.kind == "month":
+            groups = [month - 1 for month in months]
+        else:
+            # December belongs to the season of the following January
+            groups = [month % 12 // 3 for month in months]
+        count = len(set(groups))
+        return (0, count) if count == (12 if self.kind == "month" else 4) else (groups[0], count)
+
+    def __layout(self):
+        '''
+            Describe the time index of a group member as
+            group_coefficient * $group + constant + sum(coefficient * iterator)
+
+            Arguments:
+                self: self@TemporalReduction
+        '''
+        start_year, start_month = (int(part) for part in self.start.split("-"))
+        if self.kind in ("month", "season"):
+            first, groups = self.__members()
+        if self.kind == "month":
+            # Every 12th step starting from the first step that falls in the calendar month
+            constant = 1 - start_month - 12 + first
+            iterators = [("$year", "y", -(-(self.steps - 1 - constant) // 12) + 1, 12)]
+            return groups, 1, constant, iterators
+        if self.kind == "season":
+            # Three consecutive months per year, starting at December of the previous year
+            constant = -start_month - 12 + 3 * first
+            iterators = [("$year", "y", -(-(self.steps - 1 - constant) // 12) + 1, 12),
+                         ("$step", "s", 3, 1)]
+            return groups, 3, constant, iterators
+        if self.kind == "year":
+            # Twelve consecutive months starting at January of each calendar year
+            end_month_index = start_month - 1 + self.steps - 1
+            iterators = [("$step", "s", 12, 1)]
+            return end_month_index // 12 + 1, 12, 1 - start_month, iterators
+        # Rolling window of consecutive steps
+        return self.steps - self.window + 1, 1, 0, [("$step", "s", self.window, 1)]
+
+    def build(self, variable: str, axis_subsets: list) -> str:
+        '''
+            Build the WCPS coverage constructor computing the reduced series
+
+            Arguments:
+                self: self@TemporalReduction
+                variable (str): coverage variable of the query (e.g. $c)
+                axis_subsets (list): list of AxisSubset objects of the query
+        '''
+        spatial_subsets = self.bind(axis_subsets)
+        groups, group_coefficient, constant, iterators = self.__layout()
+
+        # Time index of the current member relative to the start of the range
+        terms = [f"{group_coefficient} * $group"]
+        terms += [f"{coefficient} * {name}" if coefficient != 1 else name
+                  for name, _, _, coefficient in iterators]
+        if constant:
+            terms.append(f"({constant})")
+        index = " + ".join(terms)
+
+        # Grid index of the first time step, resolved by the server
+        origin = f'imageCrsDomain({variable}[{self.time_axis}("{self.start}":"{self.start}")], {self.time_axis}).lo'
+        subsets = [axis_subset.query for axis_subset in spatial_subsets]
+        subsets.append(f'{self.time_axis}:"CRS:1"({origin} + {index})')
+        step = f"{variable}[{', '.join(subsets)}]"
+
+        # Slices on every spatial axis give a scalar, anything else has to be condensed first
+        is_point = spatial_subsets and all(len(axis_subset.values) == 1 for axis_subset in spatial_subsets)
+        if not is_point or self.operation == "count":
+            step = f"{STEP_CONDENSERS[self.operation]}({step})"
+
+        over = ", ".join(f"{name} {axis}(0:{count - 1})" for name, axis, count, _ in iterators)
+        # Members falling outside of the range are skipped, rolling windows never leave it
+        where = "" if self.kind == "rolling" else f" where ({index}) >= 0 and ({index}) < {self.steps}"
+        condenser = GROUP_CONDENSERS[self.operation]
+        values = f"condense {condenser} over {over}{where} using {step}"
+        if self.operation == "avg":
+            values = f"({values}) / (condense + over {over}{where} using 1)"
+
+        return f"coverage series over $group t(0:{groups - 1}) values {values}"
+
+    def decode(self, data: bytes) -> TemporalSeries:
+        '''
+            Decode the CSV returned for the reduced series
+
+            Arguments:
+                self: self@TemporalReduction
+                data (bytes): raw result returned by the server
+        '''
+        return TemporalSeries(self.labels(), np.atleast_1d(decode_csv(data)))
@@ -0,0 +1,337 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlencode
+
+
+def query_hash(query: str) -> str:
+    '''
+        Short stable hash of a query, to group spans of the same query without logging its text
+
+        Arguments:
+            query (str): WCPS query
+    '''
+    return hashlib.sha256(query.encode()).hexdigest()[:16]
+
+
+class Span:
+    '''
+        Span is the record of one traced operation: its start, duration, the time spent in each
+        phase and attributes such as the query hash, byte counts, cache outcome and retries
+    '''
+
+    def __init__(self, name: str, parent: 'Span' = None, attributes: dict = None):
+        '''
+            Initialization of the span, started now
+
+            Arguments:
+                self: self@Span
+                name (str): name of the operation
+                parent (Span): enclosing span of the same thread, if any
+                attributes (dict): initial attributes
+        '''
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()  # Epoch seconds, for tracing backends
+        self.duration = None
+        self.phases = {}  # Seconds spent per phase, summed over repeated phases
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.__started = time.perf_counter()
+
+    def set(self, key: str, value):
+        '''
+            Set an attribute of the span
+
+            Arguments:
+                self: self@Span
+                key (str): attribute name
+                value: attribute value
+        '''
+        self.attributes[key] = value
+
+    def add_phase(self, phase: str, seconds: float):
+        '''
+            Add time spent in a phase
+
+            Arguments:
+                self: self@Span
+                phase (str): phase name, e.g. build, queue, wait, transfer, backoff or decode
+                seconds (float): time spent
+        '''
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def phase(self, phase: str) -> '_Phase':
+        '''
+            Context manager adding the time spent in its block to a phase
+
+            Arguments:
+                self: self@Span
+                phase (str): phase name
+        '''
+        return _Phase(self, phase)
+
+    def query(self, query: str):
+        '''
+            Describe the query sent by the span: its hash and the size of the request body
+
+            Arguments:
+                self: self@Span
+                query (str): WCPS query
+        '''
+        self.attributes["query_hash"] = query_hash(query)
+        self.attributes["bytes_sent"] = len(urlencode({'query': query}))
+
+    def response(self, response, sent: float):
+        '''
+            Split the time of a fully read response into waiting for the headers and body transfer
+
+            Arguments:
+                self: self@Span
+                response: HTTP response, its elapsed time is the time until the headers arrived
+                sent (float): perf_counter value when the request was sent
+        '''
+        total = time.perf_counter() - sent
+        elapsed = getattr(response, "elapsed", None)
+        wait = min(elapsed.total_seconds(), total) if isinstance(elapsed, timedelta) else total
+        self.add_phase("wait", wait)
+        self.add_phase("transfer", total - wait)
+
+    def end(self, error: BaseException = None):
+        self.duration = time.perf_counter() - self.__started
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+                "start": self.start, "duration_ms": None if self.duration is None else self.duration * 1000,
+                "phases_ms": {phase: seconds * 1000 for phase, seconds in self.phases.items()},
+                "attributes": self.attributes, "error": self.error}
+
+
+class _Phase:
+    def __init__(self, span: Span, phase: str):
+        self.span = span
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.span.add_phase(self.phase, time.perf_counter() - self.started)
+        return False
+
+
+class _NullSpan:
+    '''
+        Span of a disabled tracer; every method does nothing
+    '''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+    def set(self, key, value):
+        pass
+
+    def add_phase(self, phase, seconds):
+        pass
+
+    def phase(self, phase):
+        return self
+
+    def query(self, query):
+        pass
+
+    def response(self, response, sent):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Scope:
+    def __init__(self, tracer: 'Tracer', name: str, attributes: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        self.span = self.tracer.start(self.name, self.attributes)
+        return self.span
+
+    def __exit__(self, kind, error, traceback):
+        self.tracer.end(self.span, error)
+        return False
+
+
+class Tracer:
+    '''
+        Tracer emits a span per traced operation to its hooks. A hook is a callable receiving
+        every finished span; a hook with a start method is also told when spans start, which
+        tracing backends need to link children to their parents.
+    '''
+
+    def __init__(self, *hooks):
+        '''
+            Initialization of the tracer
+
+            Arguments:
+                self: self@Tracer
+                hooks: hooks receiving the spans
+        '''
+        self.hooks = list(hooks)
+        self.__local = threading.local()  # Spans open in the current thread, innermost last
+
+    def add_hook(self, hook):
+        '''
+            Add a hook receiving the spans
+
+            Arguments:
+                self: self@Tracer
+                hook: callable receiving finished spans, optionally with a start method
+        '''
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def current(self) -> Span:
+        '''
+            Innermost span open in the current thread, None outside spans
+
+            Arguments:
+                self: self@Tracer
+        '''
+        stack = getattr(self.__local, "stack", None)
+        return stack[-1] if stack else None
+
+    def span(self, name: str, **attributes) -> _Scope:
+        '''
+            Context manager tracing its block as a span, a child of the current span of the thread
+
+            Arguments:
+                self: self@Tracer
+                name (str): name of the operation
+                attributes: initial attributes of the span
+        '''
+        return _Scope(self, name, attributes)
+
+    def start(self, name: str, attributes: dict = None) -> Span:
+        stack = getattr(self.__local, "stack", None)
+        if stack is None:
+            stack = self.__local.stack = []
+        span = Span(name, stack[-1] if stack else None, attributes)
+        stack.append(span)
+        for hook in self.hooks:
+            if hasattr(hook, "start"):
+                self.__call(hook.start, span)
+        return span
+
+    def end(self, span: Span, error: BaseException = None):
+        span.end(error)
+        stack = self.__local.stack
+        if span in stack:
+            stack.remove(span)
+        for hook in self.hooks:
+            self.__call(hook, span)
+
+    @staticmethod
+    def __call(hook, span: Span):
+        # A failing hook must not fail the traced query
+        try:
+            hook(span)
+        except Exception as e:
+            print(f"Error: tracing hook failed: {e}")
+
+
+class NullTracer:
+    '''
+        NullTracer is the tracer of connectors without tracing; its spans do nothing
+    '''
+
+    def span(self, name: str, **attributes) -> _NullSpan:
+        return NULL_SPAN
+
+    def current(self):
+        return None
+
+
+NULL_TRACER = NullTracer()
+
+
+class JsonLinesHook:
+    '''
+        JsonLinesHook writes every finished span as a JSON line, to a file or the standard error
+    '''
+
+    def __init__(self, file=None):
+        '''
+            Initialization of the hook
+
+            Arguments:
+                self: self@JsonLinesHook
+                file: writable text file, the standard error by default
+        '''
+        self.file = file
+        self.__lock = threading.Lock()
+
+    def __call__(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self.__lock:
+            file = self.file if self.file is not None else sys.stderr
+            file.write(line + "\n")
+            file.flush()
+
+
+class OpenTelemetryHook:
+    '''
+        OpenTelemetryHook forwards the spans to OpenTelemetry, and from there to any backend with
+        an exporter (Jaeger, Zipkin, OTLP collectors...). Phases become "wdc.phase.<name>_ms"
+        attributes, the other attributes are prefixed with "wdc.". Requires opentelemetry-api.
+    '''
+
+    def __init__(self, tracer=None):
+        '''
+            Initialization of the hook
+
+            Arguments:
+                self: self@OpenTelemetryHook
+                tracer: OpenTelemetry tracer, the one of the global tracer provider by default
+        '''
+        from opentelemetry import trace
+        self.__trace = trace
+        self.tracer = tracer if tracer is not None else trace.get_tracer("wdc")
+        self.__spans = {}  # OpenTelemetry spans of the open spans, by span id
+        self.__lock = threading.Lock()
+
+    def start(self, span: Span):
+        with self.__lock:
+            parent = self.__spans.get(span.parent_id)
+        context = self.__trace.set_span_in_context(parent) if parent is not None else None
+        exported = self.tracer.start_span(span.name, context=context, start_time=int(span.start * 1e9))
+        with self.__lock:
+            self.__spans[span.span_id] = exported
+
+    def __call__(self, span: Span):
+        with self.__lock:
+            exported = self.__spans.pop(span.span_id, None)
+        if exported is None:
+            return
+        for key, value in span.attributes.items():
+            if value is not None:
+                exported.set_attribute(f"wdc.{key}", value)
+        for phase, seconds in span.phases.items():
+            exported.set_attribute(f"wdc.phase.{phase}_ms", seconds * 1000)
+        if span.error is not None:
+            exported.set_status(self.__trace.Status(self.__trace.StatusCode.ERROR, span.error))
+        exported.end(end_time=int((span.start + span.duration) * 1e9))